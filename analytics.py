@@ -2,17 +2,21 @@ import json
 from datetime import datetime, timedelta
 from collections import defaultdict
 import statistics
+from config import get_config
+from rollups import parse_minutes, DAY_MINUTES
+from utilization import utilization_report, column_intervals
+from columnar import ACTIVE_STATUSES
 
 class StudyRoomAnalytics:
-    def __init__(self):
-        self.room_mapping = {
-            '1번 스터디룸': '2인 오피스룸',
-            '2번 스터디룸': '4인 스터디룸', 
-            '3번 스터디룸': '2인 스터디룸'
-        }
+    def __init__(self, room_mapping=None, config=None):
+        # 룸 매핑/운영 시간은 공용 설정에서 가져옴 (직접 지정 가능)
+        self.config = config or get_config()
+        self.room_mapping = dict(room_mapping if room_mapping is not None else self.config.room_mapping)
     
-    def analyze_reservations(self, reservations_data):
-        """예약 데이터 통계 분석"""
+    def analyze_reservations(self, reservations_data, date_str=None):
+        """예약 데이터 통계 분석 (date_str: 분석 날짜, 기본값 오늘)"""
+        date_str = date_str or datetime.now().strftime('%Y-%m-%d')
+        normalized = []
         stats = {
             'daily_usage': defaultdict(int),
             'hourly_usage': defaultdict(int),
@@ -40,18 +44,56 @@ class StudyRoomAnalytics:
             stats['room_usage'][room_name] += use_time
             stats['duration_stats'].append(use_time)
             
-            # 시간대별 사용량
-            start_hour = int(start_time.split(':')[0])
-            end_hour = int(end_time.split(':')[0])
+            # 시간대별 사용량 (분 단위로 걸치는 시간대, 자정 이후 부분은 다음 날짜에서 집계)
+            start_minute = parse_minutes(start_time)
+            end_minute = min(start_minute + use_time, DAY_MINUTES)
+            for hour in range(start_minute // 60, (end_minute - 1) // 60 + 1):
+                stats['hourly_usage'][hour] += 1
             
-            if end_hour < start_hour:  # 자정 넘어가는 경우
-                for hour in range(start_hour, 24):
-                    stats['hourly_usage'][hour] += 1
-                for hour in range(0, end_hour):
-                    stats['hourly_usage'][hour] += 1
-            else:
-                for hour in range(start_hour, end_hour):
-                    stats['hourly_usage'][hour] += 1
+            normalized.append({
+                'status': 'USED',
+                'room': reservation['sg_name'],
+                'user': reservation.get('m_nm', ''),
+                'start_time': start_time,
+                'end_time': end_time,
+                'hours': use_time
+            })
+        
+        # 운영 시간 기준 이용률
+        report = utilization_report([(date_str, normalized)], [date_str], self.config)
+        stats['utilization_rate'] = report['total']['utilization']
+        
+        return self._calculate_final_stats(stats)
+    
+    def analyze_columns(self, columns):
+        """컬럼 형식 이력(ReservationColumns/HistoryColumns) 통계 분석 (analyze_reservations와 같은 결과 형식)"""
+        stats = {
+            'daily_usage': defaultdict(int),
+            'hourly_usage': defaultdict(int),
+            'room_usage': defaultdict(int),
+            'duration_stats': [],
+            'peak_hours': [],
+            'utilization_rate': {}
+        }
+        
+        room_minutes = [0] * len(columns.rooms)
+        for room, status, start, minutes in zip(columns.room, columns.status, columns.start, columns.minutes):
+            if status not in ACTIVE_STATUSES or minutes <= 0:
+                continue
+            room_minutes[room] += minutes
+            stats['duration_stats'].append(minutes)
+            
+            end = min(start + minutes, DAY_MINUTES)
+            for hour in range(start // 60, (end - 1) // 60 + 1):
+                stats['hourly_usage'][hour] += 1
+        
+        for room, minutes in zip(columns.rooms, room_minutes):
+            if minutes:
+                stats['room_usage'][self.room_mapping.get(room, room)] += minutes
+        
+        # 운영 시간 기준 이용률 (컬럼에서 바로 구간 계산)
+        report = utilization_report(None, columns.dates, self.config, column_intervals(columns))
+        stats['utilization_rate'] = report['total']['utilization']
         
         return self._calculate_final_stats(stats)
     
@@ -74,11 +116,6 @@ class StudyRoomAnalytics:
         peak_hours = sorted(stats['hourly_usage'].items(), 
                           key=lambda x: x[1], reverse=True)[:3]
         
-        # 이용률 계산 (24시간 기준)
-        total_possible_hours = 24 * len(self.room_mapping)
-        total_used_hours = sum(stats['room_usage'].values()) / 60
-        utilization_rate = (total_used_hours / total_possible_hours) * 100
-        
         return {
             'summary': {
                 'total_reservations': len(stats['duration_stats']),
@@ -86,7 +123,7 @@ class StudyRoomAnalytics:
                 'total_usage_hours': sum(stats['duration_stats']) / 60,
                 'average_duration': statistics.mean(stats['duration_stats']),
                 'median_duration': statistics.median(stats['duration_stats']),
-                'utilization_rate': round(utilization_rate, 2)
+                'utilization_rate': stats['utilization_rate']
             },
             'room_analysis': {
                 room: {
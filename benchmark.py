@@ -0,0 +1,323 @@
+import json
+import sys
+import time
+import timeit
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+import serialization
+from calendar_dim import get_calendar
+from columnar import ACTIVE_STATUSES, ReservationColumns
+from dynamo_reader import from_item
+from revenue import TIME_BANDS, revenue_report
+from series import fold_days
+
+# 성능 측정: python benchmark.py [항목 ...] [--records N] [--days N] [--repeat N]
+#   항목을 생략하면 전체 측정, 입력은 실제 응답 구조를 흉내 낸 합성 데이터 (외부 호출 없음)
+DEFAULT_RECORDS = 2000
+DEFAULT_REPEAT = 5
+# 기간 조회 측정용 날짜 수와 하루 정규화 예약 수
+DEFAULT_DAYS = 365
+DAY_RESERVATIONS = 40
+# 스트리밍 추이 집계의 최대 메모리 (기간 길이와 관계없이 이 값 이하여야 함)
+MEMORY_CEILING_BYTES = 8 * 1024 * 1024
+# 측정 기간 배수 (기본 기간과 그 배수 기간의 최대 메모리 비교)
+MEMORY_RANGE_FACTOR = 5
+MEMORY_START = date(2015, 1, 1)
+
+ROOMS = [f"{i}번 스터디룸" for i in range(1, 13)]
+
+def synthetic_day(records, decimals=True):
+    """합성 예약 원본 (Comepass 응답 형식, decimals면 DynamoDB에서 읽은 것처럼 숫자를 Decimal로)"""
+    number = Decimal if decimals else int
+    rows = []
+    for i in range(records):
+        start = 9 * 60 + (i * 37) % (13 * 60)
+        rows.append({
+            's_idx': number(100000 + i),
+            'ord_no': f"ORD{20260000 + i}",
+            's_state': 'REFUND' if i % 17 == 0 else 'USED',
+            'm_nm': f"사용자{i % 400}",
+            'sg_name': ROOMS[i % len(ROOMS)],
+            's_s_time': f"{start // 60:02d}:{start % 60:02d}",
+            's_e_time': f"{(start + 120) // 60 % 24:02d}:{start % 60:02d}",
+            's_use_time': number(120),
+            'ord_pay_price': number(3000 + (i % 5) * 500),
+            'ord_price': number(4000),
+            'refund_price': number(0),
+            'memo': '',
+            'rate': Decimal('0.85') if decimals else 0.85
+        })
+    return {'result': 'success', 'list': rows}
+
+def _payload(records, decimals=True):
+    return {
+        'place_name': '스터디카페',
+        'date': '2026-10-19',
+        'reservations': synthetic_day(records, decimals),
+        'token_expires': 1790000000,
+        'token_cached': True
+    }
+
+def _legacy_default(value):
+    """이전 lambda_function.json_default"""
+    if isinstance(value, Decimal):
+        return int(value) if value % 1 == 0 else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _legacy_dumps(obj):
+    """이전 직렬화 경로 (표준 json, json_default, 한글 이스케이프)"""
+    return json.dumps(obj, default=_legacy_default)
+
+STALE_FIELDS = {'stale': True, 'cached_at': '2026-10-19T10:00:00', 'upstream_error': 'HTTP 502', 'circuit': 'open', 'processing_time': '0.01s'}
+
+def _measure(fn, repeat):
+    """최소 실행 시간(ms) (반복 횟수는 한 번에 0.2초 이상 걸리도록 자동 결정)"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number * 1000
+
+def bench_serialization(records, repeat):
+    """응답 본문 직렬화: 이전 경로 대비 표준 json(공백 없음)/orjson(공백 없음, 한글 그대로), 표준 json이 이전 경로보다 느리면 실패"""
+    payload = _payload(records)
+    cases = [
+        ('json (이전 경로)', lambda: _legacy_dumps(payload)),
+        ('json (serialization)', lambda: serialization.stdlib_dumps(payload))
+    ]
+    if serialization.orjson is not None:
+        cases.append(('orjson (serialization)', lambda: serialization.orjson_dumps(payload)))
+
+    rows = [(name, _measure(fn, repeat), len(fn().encode('utf-8'))) for name, fn in cases]
+    if json.loads(cases[1][1]()) != json.loads(cases[0][1]()):
+        raise AssertionError('직렬화 결과가 다릅니다')
+    # orjson이 없을 때 쓰는 표준 json 경로는 이전 경로보다 느리면 안 됨
+    if rows[1][1] > rows[0][1]:
+        raise AssertionError(f"표준 json 직렬화 {rows[1][1]:.3f} ms > 이전 경로 {rows[0][1]:.3f} ms")
+    return rows
+
+def bench_passthrough(records, repeat):
+    """대체 응답: 저장된 본문을 파싱 → 필드 추가 → 재직렬화 vs 문자열에 필드만 덧붙이기"""
+    stored = serialization.dumps(_payload(records))
+    cases = [
+        ('재직렬화', lambda: serialization.dumps(dict(serialization.loads(stored), **STALE_FIELDS))),
+        ('extend_object', lambda: serialization.extend_object(stored, STALE_FIELDS))
+    ]
+    return [(name, _measure(fn, repeat), len(fn().encode('utf-8'))) for name, fn in cases]
+
+def _typed(value):
+    """파이썬 값 → DynamoDB 저수준 응답 타입 표기"""
+    if isinstance(value, bool):
+        return {'BOOL': value}
+    if isinstance(value, (int, float, Decimal)):
+        return {'N': str(value)}
+    if isinstance(value, dict):
+        return {'M': {name: _typed(item) for name, item in value.items()}}
+    if isinstance(value, list):
+        return {'L': [_typed(item) for item in value]}
+    return {'S': value}
+
+def _typed_day(date_str, day):
+    """하루 Proxy DB 항목 (저수준 타입 표기, 정규화 예약 목록)"""
+    reservations = []
+    for i in range(DAY_RESERVATIONS):
+        start = 9 * 60 + (i * 37 + day) % (13 * 60)
+        reservations.append({
+            'status': 'USED',
+            'hours': 60 + (i % 4) * 30,
+            'revenue': 3000 + (i % 5) * 500,
+            'list_price': 4000,
+            'room': ROOMS[i % len(ROOMS)],
+            'user': f"사용자{(i + day) % 400}",
+            'start_time': f"{start // 60:02d}:{start % 60:02d}",
+            'end_time': ''
+        })
+    return _typed({'date': date_str, 'reservations': reservations})['M']
+
+def synthetic_range(days):
+    """기간 조회 응답 (저수준 타입 표기, 하루 한 항목에 정규화 예약 목록)"""
+    return [_typed_day(f"d{day}", day) for day in range(days)]
+
+def _decimal_attribute(value):
+    """resource API와 같은 변환 (숫자 → Decimal), boto3가 없을 때의 기준선"""
+    (tag, data), = value.items()
+    if tag == 'N':
+        return Decimal(data)
+    if tag == 'M':
+        return {name: _decimal_attribute(item) for name, item in data.items()}
+    if tag == 'L':
+        return [_decimal_attribute(item) for item in data]
+    return data
+
+def _summarize_decimal(items):
+    """이전 집계 루프 (Decimal → float()/int() 변환)"""
+    hours = 0
+    revenue = 0
+    for item in items:
+        for reservation in item['reservations']:
+            hours += float(reservation.get('hours', 0)) / 60
+            revenue += int(reservation.get('revenue', 0))
+    return hours, revenue
+
+def _summarize_native(items):
+    hours = 0
+    revenue = 0
+    for item in items:
+        for reservation in item['reservations']:
+            hours += reservation.get('hours', 0) / 60
+            revenue += reservation.get('revenue', 0)
+    return hours, revenue
+
+def bench_deserialization(records, repeat, days=DEFAULT_DAYS):
+    """기간 조회 항목 변환 + 일별 집계: resource API(Decimal) 대비 저수준 응답 직접 변환(int)"""
+    raw = synthetic_range(days)
+    try:
+        from boto3.dynamodb.types import TypeDeserializer
+        deserializer = TypeDeserializer()
+        decimal_name = 'boto3 TypeDeserializer + 변환'
+        decimal_item = lambda item: {name: deserializer.deserialize(value) for name, value in item.items()}
+    except ImportError:
+        decimal_name = 'Decimal 변환 (boto3 없음)'
+        decimal_item = lambda item: {name: _decimal_attribute(value) for name, value in item.items()}
+
+    cases = [
+        (decimal_name, lambda: _summarize_decimal([decimal_item(item) for item in raw])),
+        ('dynamo_reader.from_item', lambda: _summarize_native([from_item(item) for item in raw]))
+    ]
+    rows = [(name, _measure(fn, repeat), days * DAY_RESERVATIONS) for name, fn in cases]
+    if abs(cases[0][1]()[0] - cases[1][1]()[0]) > 1e-6:
+        raise AssertionError('변환 결과가 다릅니다')
+    return rows
+
+def _range_pages(dates, page_size=25):
+    """합성 기간 조회를 배치(25일) 단위로 생성 (dynamo_reader.batch_get_pages와 같은 흐름, 배치마다 새로 변환)"""
+    for i in range(0, len(dates), page_size):
+        yield [from_item(_typed_day(date_str, i + j)) for j, date_str in enumerate(dates[i:i+page_size])]
+
+def _stream_days(dates):
+    for page in _range_pages(dates):
+        for item in page:
+            yield item['date'], item['reservations']
+
+def _fold_streaming(calendar):
+    return fold_days(_stream_days(calendar.dates), calendar, set())
+
+def _fold_materialized(calendar):
+    """이전 방식 (기간 전체 항목을 dict로 모은 뒤 집계)"""
+    items = {date_str: reservations for date_str, reservations in _stream_days(calendar.dates)}
+    return fold_days(((date_str, items[date_str]) for date_str in calendar.dates if date_str in items), calendar, set())
+
+def _peak(fn):
+    """(실행 시간(ms), tracemalloc 최대 메모리(bytes))"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        fn()
+        return (time.perf_counter() - started) * 1000, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def bench_memory(records, repeat, days=DEFAULT_DAYS):
+    """추이 기간 집계 최대 메모리: 배치 단위 스트리밍은 기간 길이와 관계없이 MEMORY_CEILING_BYTES 이하"""
+    rows = []
+    for span in (days, days * MEMORY_RANGE_FACTOR):
+        calendar = get_calendar(MEMORY_START.isoformat(), (MEMORY_START + timedelta(days=span - 1)).isoformat())
+        rows.append((f"전체 조회 후 집계 {span}일", *_peak(lambda: _fold_materialized(calendar))))
+        rows.append((f"스트리밍 집계 {span}일", *_peak(lambda: _fold_streaming(calendar))))
+
+    streaming = [peak for name, ms, peak in rows if name.startswith('스트리밍')]
+    if max(streaming) > MEMORY_CEILING_BYTES:
+        raise AssertionError(f"스트리밍 집계 최대 메모리 {max(streaming):,} bytes > {MEMORY_CEILING_BYTES:,} bytes")
+    return rows
+
+def _revenue_day(day):
+    """하루 정규화 예약 (환불/자정을 넘기는 예약 포함)"""
+    return [{
+        'status': 'REFUND' if i % 17 == 0 else 'USED',
+        'start_time': f"{(i * 37 + day) % (24 * 60) // 60:02d}:{(i * 37 + day) % 60:02d}",
+        'hours': 60 + (i % 4) * 30,
+        'revenue': 3000 + (i % 5) * 500,
+        'list_price': 4000,
+        'refund': 4000 if i % 17 == 0 else 0,
+        'room': ROOMS[i % len(ROOMS)],
+        'user': f"사용자{(i + day) % 400}"
+    } for i in range(DAY_RESERVATIONS)]
+
+def _revenue_per_record(columns):
+    """이전 방식 (레코드마다 분기하며 룸별 매출/시간대별 배분 누적)"""
+    room_revenue = [0] * len(columns.rooms)
+    band_revenue = [0.0] * len(TIME_BANDS)
+    for room, status, start, minutes, revenue in zip(columns.room, columns.status, columns.start, columns.minutes, columns.revenue):
+        if status not in ACTIVE_STATUSES:
+            continue
+        room_revenue[room] += revenue
+        if minutes <= 0:
+            continue
+        end = start + minutes
+        for band, (_, first_hour, last_hour) in enumerate(TIME_BANDS):
+            low, high = first_hour * 60, last_hour * 60
+            overlap = max(0, min(end, high) - max(start, low)) + max(0, min(end - 24 * 60, high) - low)
+            if overlap:
+                band_revenue[band] += revenue * overlap / minutes
+    return room_revenue, [round(value) for value in band_revenue]
+
+def bench_revenue(records, repeat, days=DEFAULT_DAYS):
+    """매출 집계: 레코드별 파이썬 반복 대비 컬럼 단위 map/compress/sum (revenue_report는 룸·시간대 전체 지표)"""
+    columns = ReservationColumns.from_days((f"d{day}", _revenue_day(day)) for day in range(days))
+    cases = [
+        ('레코드별 반복 (룸 매출+시간대)', lambda: _revenue_per_record(columns)),
+        ('revenue_report', lambda: revenue_report(columns))
+    ]
+    rows = [(name, _measure(fn, repeat), len(columns)) for name, fn in cases]
+    report = revenue_report(columns)
+    room_revenue, band_revenue = _revenue_per_record(columns)
+    if [report['by_room'][room]['revenue'] for room in columns.rooms] != room_revenue or [band['revenue'] for band in report['by_band']] != band_revenue:
+        raise AssertionError('매출 집계 결과가 다릅니다')
+    return rows
+
+BENCHMARKS = {
+    'serialization': bench_serialization,
+    'passthrough': bench_passthrough,
+    'deserialization': bench_deserialization,
+    'revenue': bench_revenue,
+    'memory': bench_memory
+}
+
+def _print_rows(title, rows, unit='bytes'):
+    print(f"\n[{title}]")
+    baseline = rows[0][1]
+    for name, ms, size in rows:
+        print(f"  {name:<28} {ms:9.3f} ms  x{baseline / ms:6.2f}  {size:>10,} {unit}")
+
+def main(argv):
+    names = []
+    records = DEFAULT_RECORDS
+    repeat = DEFAULT_REPEAT
+    days = DEFAULT_DAYS
+    args = iter(argv[1:])
+    for arg in args:
+        if arg == '--records':
+            records = int(next(args))
+        elif arg == '--days':
+            days = int(next(args))
+        elif arg == '--repeat':
+            repeat = int(next(args))
+        elif arg in BENCHMARKS:
+            names.append(arg)
+        else:
+            print(f"알 수 없는 항목: {arg} ({', '.join(BENCHMARKS)})")
+            return 1
+
+    print(f"records={records} repeat={repeat} json backend={serialization.backend()}")
+    for name in names or BENCHMARKS:
+        if name == 'deserialization':
+            _print_rows(f"{name} ({days}일)", bench_deserialization(records, repeat, days), 'reservations')
+        elif name == 'revenue':
+            _print_rows(f"{name} ({days}일)", bench_revenue(records, repeat, days), 'reservations')
+        elif name == 'memory':
+            _print_rows(f"{name} (한도 {MEMORY_CEILING_BYTES:,} bytes)", bench_memory(records, repeat, days), 'peak bytes')
+        else:
+            _print_rows(name, BENCHMARKS[name](records, repeat))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
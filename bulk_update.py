@@ -1,60 +1,35 @@
-import json
-import urllib3
 import boto3
-import os
 import time
 from datetime import datetime, timedelta
+from comepass_client import login, fetch_studyroom, fetch_studyroom_dates
+from quality import validate_schema
 
 # AWS 리소스 초기화
 dynamodb = boto3.resource('dynamodb', region_name='ap-northeast-2')
-http = urllib3.PoolManager()
 
 def get_new_token():
     """새 토큰 발급"""
     comepass_id = "01067898449"
     comepass_pwd = "0000"
     
-    login_url = 'https://api.comepass.kr/login/admin'
-    login_headers = {
-        'Accept': 'application/json, text/plain, */*',
-        'Content-Type': 'application/json',
-        'Origin': 'https://place.comepass.kr',
-        'Referer': 'https://place.comepass.kr/',
-        'X-Dmon-Request-From': 'place_admin_web',
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-    }
-    
-    login_data = {"id": comepass_id, "pwd": comepass_pwd}
-    login_response = http.request('POST', login_url, body=json.dumps(login_data), headers=login_headers)
-    result = json.loads(login_response.data.decode('utf-8'))
-    return result
+    return login(comepass_id, comepass_pwd)
 
 def get_reservations_for_date(date_str, access_token, p_code):
-    """특정 날짜의 예약 데이터 가져오기"""
+    """특정 날짜의 예약 데이터 가져오기 (오류 시 None, 예약이 없는 날은 [])"""
     try:
-        studyroom_url = f'https://api.comepass.kr/place/studyroom?date={date_str}'
-        studyroom_headers = {
-            'Accept': 'application/json, text/plain, */*',
-            'Authorization': f'Bearer {access_token}',
-            'Origin': 'https://place.comepass.kr',
-            'Referer': 'https://place.comepass.kr/',
-            'X-Dmon-Place-Code': p_code,
-            'X-Dmon-Request-From': 'place_admin_web',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        studyroom_response = http.request('GET', studyroom_url, headers=studyroom_headers)
-        studyroom_data = json.loads(studyroom_response.data.decode('utf-8'))
-        
-        if studyroom_data.get('result') == 'success':
-            return studyroom_data.get('list', [])
-        else:
-            print(f"API error for {date_str}: {studyroom_data}")
-            return []
-            
+        studyroom_data = fetch_studyroom(date_str, access_token, p_code)
+        return parse_reservations(date_str, studyroom_data)
     except Exception as e:
         print(f"Error getting data for {date_str}: {e}")
-        return []
+        return None
+
+def parse_reservations(date_str, studyroom_data):
+    """API 응답에서 예약 목록 추출 (형식 검증 실패 시 None)"""
+    issues = validate_schema(studyroom_data)
+    if issues or studyroom_data.get('result') != 'success':
+        print(f"API error for {date_str}: {issues or studyroom_data}")
+        return None
+    return studyroom_data['list']
 
 def save_to_dynamodb(date_str, raw_data):
     """DynamoDB에 데이터 저장"""
@@ -93,30 +68,40 @@ def bulk_update_dynamodb():
     success_count = 0
     error_count = 0
     
-    for i in range(total_days):
-        current_date = end_date - timedelta(days=i)
-        date_str = current_date.strftime('%Y-%m-%d')
-        
-        print(f"Processing {date_str} ({i+1}/{total_days})")
+    dates = [(end_date - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(total_days)]
+    
+    # 10일 단위로 동시 조회 (동시 요청 수 제한으로 API 호출 제한 방지)
+    for i in range(0, total_days, 10):
+        batch_dates = dates[i:i+10]
+        print(f"Processing {batch_dates[0]} ~ {batch_dates[-1]} ({i+len(batch_dates)}/{total_days})")
         
-        # 데이터 가져오기
-        reservations = get_reservations_for_date(date_str, access_token, p_code)
+        fetched = fetch_studyroom_dates(batch_dates, access_token, p_code, concurrency=2)
         
-        if reservations:
-            # DynamoDB에 저장
-            if save_to_dynamodb(date_str, reservations):
-                success_count += 1
+        for date_str in batch_dates:
+            # 데이터 가져오기
+            if isinstance(fetched[date_str], Exception):
+                print(f"Error getting data for {date_str}: {fetched[date_str]}")
+                reservations = None
             else:
+                reservations = parse_reservations(date_str, fetched[date_str])
+            
+            if reservations is None:
+                # 오류는 빈 날짜로 저장하지 않음 (추이에서 0으로 보이지 않도록)
                 error_count += 1
-        else:
-            print(f"No data for {date_str}")
+            elif reservations:
+                # DynamoDB에 저장
+                if save_to_dynamodb(date_str, reservations):
+                    success_count += 1
+                else:
+                    error_count += 1
+            else:
+                print(f"No data for {date_str}")
         
         # API 호출 제한 방지
         time.sleep(0.5)
         
         # 진행상황 출력
-        if (i + 1) % 10 == 0:
-            print(f"Progress: {i+1}/{total_days} days processed, {success_count} successful, {error_count} errors")
+        print(f"Progress: {i+len(batch_dates)}/{total_days} days processed, {success_count} successful, {error_count} errors")
     
     print(f"\nBulk update completed!")
     print(f"Total days processed: {total_days}")
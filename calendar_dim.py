@@ -0,0 +1,85 @@
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+class CalendarDim:
+    """날짜 범위의 달력 차원 (날짜별 ISO 주, 월, 요일 인덱스를 병렬 배열로 보관)"""
+
+    def __init__(self, start, end):
+        first = start.toordinal()
+        count = end.toordinal() - first + 1
+        if count <= 0:
+            raise ValueError('start는 end보다 늦을 수 없습니다')
+
+        self.start = start
+        self.end = end
+        self.dates = [date.fromordinal(first + i).isoformat() for i in range(count)]
+        # date(1, 1, 1)은 월요일이므로 서수에서 바로 요일 계산
+        self.weekday = [(first + i - 1) % 7 for i in range(count)]
+
+        # ISO 주: 주 단위로 키를 한 번만 계산하고 해당 구간을 채움
+        self.week_keys = []
+        self.week_index = []
+        position = 0
+        monday = start - timedelta(days=self.weekday[0])
+        while position < count:
+            iso_year, iso_week, _ = monday.isocalendar()
+            span = min(7 - self.weekday[position], count - position)
+            self.week_index += [len(self.week_keys)] * span
+            self.week_keys.append(f"{iso_year}-W{iso_week:02d}")
+            position += span
+            monday += timedelta(days=7)
+
+        # 월: 월 단위로 구간을 채움
+        self.month_keys = []
+        self.month_index = []
+        position = 0
+        current = start
+        while position < count:
+            next_month = (current.replace(day=1) + timedelta(days=32)).replace(day=1)
+            span = min((next_month - current).days, count - position)
+            self.month_index += [len(self.month_keys)] * span
+            self.month_keys.append(f"{current.year}-{current.month:02d}")
+            position += span
+            current = next_month
+
+    def __len__(self):
+        return len(self.dates)
+
+    def index_of(self, date_str):
+        """날짜 문자열의 위치 (범위 밖이면 None)"""
+        offset = date.fromisoformat(date_str).toordinal() - self.start.toordinal()
+        return offset if 0 <= offset < len(self.dates) else None
+
+    def grouping(self, granularity):
+        """집계 단위별 (그룹 키 목록, 날짜별 그룹 인덱스)"""
+        if granularity == 'daily':
+            return self.dates, list(range(len(self.dates)))
+        if granularity == 'weekly':
+            return self.week_keys, self.week_index
+        if granularity == 'monthly':
+            return self.month_keys, self.month_index
+        raise ValueError(f"지원하지 않는 집계 단위: {granularity}")
+
+def group_sum(values, group_index, group_count):
+    """날짜별 값 배열을 그룹 인덱스 배열 기준으로 합산"""
+    totals = [0] * group_count
+    for group, value in zip(group_index, values):
+        totals[group] += value
+    return totals
+
+@lru_cache(maxsize=32)
+def _calendar(start_date, end_date):
+    return CalendarDim(date.fromisoformat(start_date), date.fromisoformat(end_date))
+
+def get_calendar(start_date, end_date):
+    """'YYYY-MM-DD' 범위의 달력 차원 (웜 컨테이너에서 캐시)"""
+    # 형식 검증 (잘못된 날짜는 기존과 같이 ValueError)
+    datetime.strptime(start_date, '%Y-%m-%d')
+    datetime.strptime(end_date, '%Y-%m-%d')
+    return _calendar(start_date, end_date)
+
+def iso_week_dates(period):
+    """'YYYY-Www' ISO 주의 월~일 날짜 문자열 목록"""
+    year, week = period.split('-W')
+    monday = date.fromisocalendar(int(year), int(week), 1)
+    return [(monday + timedelta(days=i)).isoformat() for i in range(7)]
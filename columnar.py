@@ -0,0 +1,63 @@
+from array import array
+from rollups import parse_minutes
+
+# 정규화 예약 레코드를 컬럼별 정수 배열로 보관 (집계 시 컬럼 단위로 합산)
+INT_COLUMNS = ('day', 'room', 'user', 'status', 'start', 'minutes', 'revenue', 'list_price', 'refund')
+STATUSES = ('USED', 'RESERVED', 'REFUND')
+ACTIVE_STATUSES = (0, 1)
+REFUND_STATUS = 2
+
+class ReservationColumns:
+    """정규화 예약 레코드의 컬럼 형식 (day/room/user/status는 목록 인덱스)"""
+
+    def __init__(self, rooms=None, users=None):
+        self.dates = []
+        self.rooms = list(rooms or [])
+        self.users = list(users or [])
+        self._room_index = {room: i for i, room in enumerate(self.rooms)}
+        self._user_index = {user: i for i, user in enumerate(self.users)}
+        for name in INT_COLUMNS:
+            setattr(self, name, array('i'))
+
+    def __len__(self):
+        return len(self.day)
+
+    def room_code(self, room):
+        if room not in self._room_index:
+            self._room_index[room] = len(self.rooms)
+            self.rooms.append(room)
+        return self._room_index[room]
+
+    def user_code(self, user):
+        if user not in self._user_index:
+            self._user_index[user] = len(self.users)
+            self.users.append(user)
+        return self._user_index[user]
+
+    def append_day(self, date_str, reservations):
+        """하루치 정규화 예약 목록 추가"""
+        day = len(self.dates)
+        self.dates.append(date_str)
+        for reservation in reservations or []:
+            status = reservation.get('status')
+            start = parse_minutes(reservation.get('start_time'))
+            if status not in STATUSES or start is None:
+                continue
+            revenue = int(reservation.get('revenue', 0))
+            self.day.append(day)
+            self.room.append(self.room_code(reservation.get('room', '')))
+            self.user.append(self.user_code(reservation.get('user', '')))
+            self.status.append(STATUSES.index(status))
+            self.start.append(start)
+            self.minutes.append(int(reservation.get('hours', 0)))
+            self.revenue.append(revenue)
+            self.list_price.append(int(reservation.get('list_price', revenue)))
+            self.refund.append(int(reservation.get('refund', 0)))
+
+    @classmethod
+    def from_days(cls, days, rooms=None, users=None):
+        """(날짜, 정규화 예약 목록) 반복자로 생성"""
+        columns = cls(rooms, users)
+        for date_str, reservations in days:
+            columns.append_day(date_str, reservations)
+        return columns
@@ -0,0 +1,319 @@
+import json
+import time
+import random
+import asyncio
+import threading
+from urllib.parse import urlsplit
+import urllib3
+from places import get_places, PLACE_CONCURRENCY
+
+API_BASE = 'https://api.comepass.kr'
+
+BASE_HEADERS = {
+    'Accept': 'application/json, text/plain, */*',
+    'Origin': 'https://place.comepass.kr',
+    'Referer': 'https://place.comepass.kr/',
+    'X-Dmon-Request-From': 'place_admin_web',
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+# 타임아웃 / 재시도 / 동시성 설정
+CONNECT_TIMEOUT = 3.0
+READ_TIMEOUT = 10.0
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 4.0
+REQUEST_DEADLINE = 12.0  # 재시도 포함 요청 1건의 최대 소요 시간 (Lambda 30초 예산 보호)
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+PER_HOST_CONCURRENCY = 4
+
+# 서킷 브레이커 설정
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30.0
+
+# 연결 재사용(keep-alive)을 위한 전역 커넥션 풀 (첫 요청 때 생성)
+#   모든 지점이 같은 호스트를 호출하므로 크기는 지점 수 × PLACE_CONCURRENCY (지점별 동시 요청이 서로의 연결을 기다리지 않음)
+#   슬롯은 풀 연결 수와 같고, 슬롯 대기를 요청 deadline으로 제한해 풀에서 무한정 기다리지 않음
+http = None
+http_slots = None
+_pool_lock = threading.Lock()
+
+def pool_size():
+    return max(PER_HOST_CONCURRENCY, len(get_places()) * PLACE_CONCURRENCY)
+
+def _connection_pool():
+    """(PoolManager, 연결 슬롯)"""
+    global http, http_slots
+    with _pool_lock:
+        if http is None:
+            size = pool_size()
+            http = urllib3.PoolManager(
+                maxsize=size,
+                block=True,
+                timeout=urllib3.Timeout(connect=CONNECT_TIMEOUT, read=READ_TIMEOUT),
+                retries=False
+            )
+            http_slots = threading.BoundedSemaphore(size)
+        return http, http_slots
+
+class ComepassError(Exception):
+    """Comepass API 호출 실패"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+class CircuitOpenError(ComepassError):
+    """서킷 브레이커가 열려 있어 호출하지 않음"""
+
+class InvalidResponseError(ComepassError):
+    """200 응답이지만 JSON이 아님 (upstream 장애로 간주)"""
+
+class CircuitBreaker:
+    """연속 실패 시 일정 시간 upstream 호출을 차단 (closed → open → half_open)
+
+    지점 스레드/asyncio.to_thread 작업이 함께 사용하므로 상태 변경은 lock 안에서만
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            now = time.time()
+            if self.state == 'open':
+                if now - self.opened_at >= self.reset_timeout:
+                    # 시험 호출 1건만 허용
+                    self.state = 'half_open'
+                    self.probe_started = now
+                    return True
+                return False
+            if self.state == 'half_open':
+                # 시험 호출이 진행 중이면 차단 (결과 없이 deadline이 지난 시험 호출은 새 시험 호출로 대체)
+                if now - self.probe_started >= REQUEST_DEADLINE:
+                    self.probe_started = now
+                    return True
+                return False
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                print("Comepass circuit closed")
+            self.state = 'closed'
+            self.failures = 0
+            self.opened_at = None
+            self.probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    print(f"Comepass circuit opened after {self.failures} failures")
+                    _count('circuit_opened')
+                self.state = 'open'
+                self.opened_at = time.time()
+                self.probe_started = None
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'opened_at': int(self.opened_at) if self.opened_at else None
+            }
+
+# 컨테이너 단위 upstream 지표
+metrics = {
+    'requests': 0,
+    'retries': 0,
+    'failures': 0,
+    'timeouts': 0,
+    'rejected_by_circuit': 0,
+    'circuit_opened': 0
+}
+
+metrics_lock = threading.Lock()
+
+breaker = CircuitBreaker()
+
+def _count(name):
+    with metrics_lock:
+        metrics[name] += 1
+
+def get_metrics():
+    """upstream 호출 지표와 서킷 브레이커 상태"""
+    with metrics_lock:
+        counts = dict(metrics)
+    return dict(counts, circuit=breaker.snapshot())
+
+def login_headers():
+    return dict(BASE_HEADERS, **{'Content-Type': 'application/json'})
+
+def studyroom_headers(access_token, p_code):
+    return dict(BASE_HEADERS, **{
+        'Authorization': f'Bearer {access_token}',
+        'X-Dmon-Place-Code': p_code
+    })
+
+def _retry_delay(attempt, response=None):
+    """재시도 대기 시간 (429의 Retry-After 우선, 그 외 지터를 적용한 지수 백오프)"""
+    if response is not None and response.status == 429:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+def _before_request(url):
+    if not breaker.allow():
+        _count('rejected_by_circuit')
+        raise CircuitOpenError(f"Circuit open, skipping {url}")
+    _count('requests')
+
+def _record_error(e, url):
+    """네트워크 예외를 ComepassError로 변환 (연결 풀 대기 초과도 타임아웃으로 집계)"""
+    if isinstance(e, (urllib3.exceptions.TimeoutError, urllib3.exceptions.EmptyPoolError)):
+        _count('timeouts')
+    return ComepassError(f"{type(e).__name__} calling {url}: {e}")
+
+def _record_result(error):
+    """최종 결과를 서킷 브레이커에 반영 (4xx 등 upstream 장애가 아닌 응답은 성공으로 간주, JSON이 아닌 200 응답은 실패)"""
+    if error is None or (not isinstance(error, InvalidResponseError)
+                         and error.status is not None and error.status not in RETRY_STATUSES):
+        breaker.record_success()
+    else:
+        _count('failures')
+        breaker.record_failure()
+
+def _remaining(deadline):
+    """요청 deadline까지 남은 시간 (지났으면 타임아웃)"""
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        raise urllib3.exceptions.TimeoutError(f"Request deadline of {REQUEST_DEADLINE}s exceeded")
+    return remaining
+
+def _send(method, url, headers, body, deadline):
+    """단일 HTTP 요청 (재시도 없음, 연결 대기와 연결+응답 시간을 합쳐 남은 deadline 안에서만 대기)"""
+    pool, slots = _connection_pool()
+    if not slots.acquire(timeout=_remaining(deadline)):
+        raise urllib3.exceptions.EmptyPoolError(None, f"No free connection for {url} before the request deadline")
+    try:
+        # 슬롯을 잡았으므로 풀에 빈 연결이 있음 (pool_timeout은 남은 시간까지만 기다리는 보호 장치)
+        remaining = _remaining(deadline)
+        return pool.request(method, url, headers=headers, body=body, preload_content=True,
+                            timeout=urllib3.Timeout(total=remaining, connect=CONNECT_TIMEOUT, read=READ_TIMEOUT),
+                            pool_timeout=remaining)
+    finally:
+        slots.release()
+
+def _parse(response, url):
+    if response.status != 200:
+        raise ComepassError(f"HTTP {response.status} from {url}: {response.data[:200]!r}", response.status)
+    try:
+        return json.loads(response.data.decode('utf-8'))
+    except ValueError:
+        raise InvalidResponseError(f"Invalid JSON from {url}: {response.data[:200]!r}", response.status)
+
+def request_json(method, path, headers, body=None):
+    """동기 JSON 요청 (타임아웃, 429/5xx 재시도, 서킷 브레이커 포함)"""
+    url = API_BASE + path
+    deadline = time.time() + REQUEST_DEADLINE
+    for attempt in range(MAX_RETRIES + 1):
+        _before_request(url)
+        response = None
+        try:
+            response = _send(method, url, headers, body, deadline)
+            if response.status not in RETRY_STATUSES:
+                result = _parse(response, url)
+                _record_result(None)
+                return result
+            error = ComepassError(f"HTTP {response.status} from {url}", response.status)
+        except ComepassError as e:
+            _record_result(e)
+            raise
+        except (urllib3.exceptions.TimeoutError, urllib3.exceptions.ProtocolError,
+                urllib3.exceptions.NewConnectionError, urllib3.exceptions.EmptyPoolError) as e:
+            error = _record_error(e, url)
+        delay = _retry_delay(attempt, response)
+        # 시험 호출(half_open)은 재시도하지 않고 바로 실패로 반영
+        if attempt == MAX_RETRIES or time.time() + delay >= deadline or breaker.state == 'half_open':
+            _record_result(error)
+            raise error
+        _count('retries')
+        print(f"Retrying {method} {path} in {delay:.1f}s ({attempt + 1}/{MAX_RETRIES}): {error}")
+        time.sleep(delay)
+
+def login(comepass_id, comepass_pwd):
+    """관리자 로그인 (토큰 발급)"""
+    body = json.dumps({"id": comepass_id, "pwd": comepass_pwd})
+    return request_json('POST', '/login/admin', login_headers(), body)
+
+def fetch_studyroom(date_str, access_token, p_code):
+    """특정 날짜의 스터디룸 예약 원본 응답 조회"""
+    return request_json('GET', f'/place/studyroom?date={date_str}', studyroom_headers(access_token, p_code))
+
+class AsyncComepassClient:
+    """asyncio 기반 Comepass 클라이언트 (호스트별 동시 요청 수 제한)"""
+
+    def __init__(self, concurrency=PER_HOST_CONCURRENCY):
+        self.concurrency = concurrency
+        self._semaphores = {}
+
+    def _semaphore(self, url):
+        host = urlsplit(url).netloc
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.concurrency)
+        return self._semaphores[host]
+
+    async def request_json(self, method, path, headers, body=None):
+        url = API_BASE + path
+        deadline = time.time() + REQUEST_DEADLINE
+        for attempt in range(MAX_RETRIES + 1):
+            response = None
+            try:
+                async with self._semaphore(url):
+                    _before_request(url)
+                    # 블로킹 I/O는 스레드에서 실행하여 네트워크 대기 시간을 겹침
+                    response = await asyncio.to_thread(_send, method, url, headers, body, deadline)
+                if response.status not in RETRY_STATUSES:
+                    result = _parse(response, url)
+                    _record_result(None)
+                    return result
+                error = ComepassError(f"HTTP {response.status} from {url}", response.status)
+            except CircuitOpenError:
+                raise
+            except ComepassError as e:
+                _record_result(e)
+                raise
+            except (urllib3.exceptions.TimeoutError, urllib3.exceptions.ProtocolError,
+                    urllib3.exceptions.NewConnectionError, urllib3.exceptions.EmptyPoolError) as e:
+                error = _record_error(e, url)
+            delay = _retry_delay(attempt, response)
+            if attempt == MAX_RETRIES or time.time() + delay >= deadline or breaker.state == 'half_open':
+                _record_result(error)
+                raise error
+            _count('retries')
+            await asyncio.sleep(delay)
+
+    async def fetch_studyroom(self, date_str, access_token, p_code):
+        return await self.request_json('GET', f'/place/studyroom?date={date_str}', studyroom_headers(access_token, p_code))
+
+    async def fetch_studyroom_many(self, dates, access_token, p_code):
+        """여러 날짜 동시 조회 {date: 응답 또는 예외}"""
+        results = await asyncio.gather(
+            *[self.fetch_studyroom(date_str, access_token, p_code) for date_str in dates],
+            return_exceptions=True
+        )
+        return dict(zip(dates, results))
+
+def fetch_studyroom_dates(dates, access_token, p_code, concurrency=PER_HOST_CONCURRENCY):
+    """동기 코드에서 여러 날짜를 동시에 조회하기 위한 래퍼 {date: 응답 또는 예외}"""
+    client = AsyncComepassClient(concurrency)
+    return asyncio.run(client.fetch_studyroom_many(list(dates), access_token, p_code))
@@ -0,0 +1,126 @@
+import json
+import os
+import hashlib
+
+# 기본 설정 (DynamoDB/환경변수에 설정이 없을 때 사용)
+DEFAULT_EXCLUDED_USERS = ['최은숙', '배준기']
+DEFAULT_ROOM_MAPPING = {
+    '1번 스터디룸': '2인 오피스룸',
+    '2번 스터디룸': '4인 스터디룸',
+    '3번 스터디룸': '2인 스터디룸'
+}
+
+# 운영 시간: {룸 또는 '*': {요일(0=월~6=일) 또는 '*': 'HH:MM-HH:MM' 또는 'closed'}}
+DEFAULT_OPERATING_HOURS = {'*': {'*': '00:00-24:00'}}
+
+DAY_MINUTES = 24 * 60
+
+CONFIG_TABLE = os.environ.get('STUDYROOM_CONFIG_TABLE', 'studyroom-config')
+CONFIG_ID = 'studyroom'
+
+# 컨테이너당 한 번만 로드되는 설정
+_config = None
+
+class StudyRoomConfig:
+    """스터디룸 설정 (제외 사용자, 룸 매핑, 운영 시간)"""
+
+    def __init__(self, excluded_users=None, room_mapping=None, operating_hours=None, source='default'):
+        self.excluded_users = frozenset(excluded_users if excluded_users is not None else DEFAULT_EXCLUDED_USERS)
+        self.room_mapping = dict(room_mapping if room_mapping is not None else DEFAULT_ROOM_MAPPING)
+        self.operating_hours = dict(operating_hours if operating_hours is not None else DEFAULT_OPERATING_HOURS)
+        self.source = source
+        self.version = self._compute_version()
+
+    def _compute_version(self):
+        """설정 내용 기반 버전 (내용이 같으면 버전도 같음)"""
+        # 운영 시간은 조회 시점에만 쓰이고 저장된 집계에 영향이 없으므로 버전에서 제외
+        content = json.dumps({
+            'excluded_users': sorted(self.excluded_users),
+            'room_mapping': self.room_mapping
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()[:12]
+
+    def operating_window(self, room, weekday):
+        """룸/요일의 운영 구간 (자정 기준 시작 분, 종료 분), 휴무면 None"""
+        for scope in (self.operating_hours.get(room), self.operating_hours.get('*')):
+            if not scope:
+                continue
+            for key in (str(weekday), '*'):
+                if key in scope:
+                    return parse_window(scope[key])
+        return (0, DAY_MINUTES)
+
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'source': self.source,
+            'excluded_users': sorted(self.excluded_users),
+            'room_mapping': self.room_mapping,
+            'operating_hours': self.operating_hours
+        }
+
+def parse_window(value):
+    """'HH:MM-HH:MM' → (시작 분, 종료 분), 종료가 시작보다 이르면 다음날 종료로 간주"""
+    if not value or value == 'closed':
+        return None
+    opening, closing = value.split('-')
+    open_hour, open_minute = opening.split(':')
+    close_hour, close_minute = closing.split(':')
+    start = int(open_hour) * 60 + int(open_minute)
+    end = int(close_hour) * 60 + int(close_minute)
+    if end <= start:
+        end += DAY_MINUTES
+    return (start, end)
+
+def _load_from_dynamodb(dynamodb):
+    """DynamoDB 설정 항목 조회"""
+    try:
+        table = dynamodb.Table(CONFIG_TABLE)
+        response = table.get_item(Key={'id': CONFIG_ID})
+        if 'Item' in response:
+            item = response['Item']
+            return StudyRoomConfig(
+                excluded_users=item.get('excluded_users'),
+                room_mapping=item.get('room_mapping'),
+                operating_hours=item.get('operating_hours'),
+                source='dynamodb'
+            )
+    except Exception as e:
+        print(f"Error loading config from DynamoDB: {e}")
+    return None
+
+def _load_from_env():
+    """환경변수(STUDYROOM_CONFIG, JSON) 설정 조회"""
+    raw = os.environ.get('STUDYROOM_CONFIG')
+    if not raw:
+        return None
+    try:
+        data = json.loads(raw)
+        return StudyRoomConfig(
+            excluded_users=data.get('excluded_users'),
+            room_mapping=data.get('room_mapping'),
+            operating_hours=data.get('operating_hours'),
+            source='env'
+        )
+    except Exception as e:
+        print(f"Error parsing STUDYROOM_CONFIG: {e}")
+    return None
+
+def get_config(dynamodb=None, refresh=False):
+    """설정 조회 (DynamoDB → 환경변수 → 기본값 순, 웜 컨테이너에서는 캐시 사용)"""
+    global _config
+    if _config is not None and not refresh:
+        return _config
+
+    config = None
+    if dynamodb is not None:
+        config = _load_from_dynamodb(dynamodb)
+    if config is None:
+        config = _load_from_env()
+    if config is None:
+        config = StudyRoomConfig()
+
+    if _config is None or _config.version != config.version:
+        print(f"Config loaded from {config.source} (version {config.version})")
+    _config = config
+    return _config
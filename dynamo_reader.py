@@ -0,0 +1,85 @@
+import threading
+
+# DynamoDB 배치 조회 (저수준 클라이언트 응답을 직접 변환, 숫자는 Decimal 대신 int/float)
+#   boto3 resource API는 모든 숫자를 Decimal로 만들고 집계 루프에서 다시 int()/float()로 바꾸므로,
+#   기간 조회(추이/매출/이용률/내보내기/히트맵)는 타입 표기({'N': '3000'})를 바로 파이썬 값으로 변환
+#   resource의 dynamodb.meta.client는 요청/응답을 다시 변환하므로 같은 리전/엔드포인트의 별도 저수준 클라이언트 사용
+#   쓰기(put_item/update_item)는 기존처럼 resource API 사용 (float 값을 다시 쓰지 않도록 읽기 전용)
+#   집합 타입(NS/SS/BS)은 JSON 응답에 그대로 쓸 수 있도록 정렬된 리스트로 변환
+
+# batch_get_item 한 번에 요청할 수 있는 최대 키 수
+MAX_BATCH_KEYS = 100
+
+# 리전/엔드포인트별 저수준 클라이언트 (컨테이너당 한 번 생성, 지점 스레드에서 공유)
+_clients = {}
+_clients_lock = threading.Lock()
+
+def low_level_client(dynamodb):
+    """resource와 같은 리전/엔드포인트의 저수준 클라이언트 (타입 표기 그대로 요청/응답)"""
+    meta = dynamodb.meta.client.meta
+    key = (meta.region_name, meta.endpoint_url)
+    with _clients_lock:
+        if key not in _clients:
+            import boto3
+            _clients[key] = boto3.client('dynamodb', region_name=meta.region_name, endpoint_url=meta.endpoint_url)
+        return _clients[key]
+
+def _number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+def from_attribute(value):
+    """타입 표기 값 → 파이썬 값 (자주 나오는 타입부터 dict.get으로 확인, 집합은 정렬된 리스트)"""
+    data = value.get('S')
+    if data is not None:
+        return data
+    data = value.get('N')
+    if data is not None:
+        return _number(data)
+    data = value.get('M')
+    if data is not None:
+        return {name: from_attribute(item) for name, item in data.items()}
+    data = value.get('L')
+    if data is not None:
+        return [from_attribute(item) for item in data]
+    for tag, data in value.items():
+        if tag == 'BOOL' or tag == 'B':
+            return data
+        if tag == 'NULL':
+            return None
+        if tag == 'NS':
+            return sorted(_number(item) for item in data)
+        if tag == 'SS' or tag == 'BS':
+            return sorted(data)
+    raise ValueError(f"알 수 없는 DynamoDB 타입: {value}")
+
+def from_item(item):
+    """저수준 응답 항목 → {속성: 파이썬 값}"""
+    return {name: from_attribute(value) for name, value in item.items()}
+
+def batch_get_pages(dynamodb, table_name, key_name, key_values, attributes, page_size=25):
+    """문자열 파티션 키 목록을 page_size개씩 배치 조회 → 페이지별 항목 목록 (요청 순서와 무관, 미처리 키는 재요청)
+
+    dynamodb: boto3 resource (조회는 low_level_client로 만든 저수준 클라이언트 사용)
+    attributes: 가져올 속성 목록 (키 속성은 항상 포함)
+    """
+    client = low_level_client(dynamodb)
+    names = {f"#a{i}": name for i, name in enumerate([key_name] + [a for a in attributes if a != key_name])}
+    projection = ', '.join(names)
+    page_size = min(page_size, MAX_BATCH_KEYS)
+    for i in range(0, len(key_values), page_size):
+        request_items = {
+            table_name: {
+                'Keys': [{key_name: {'S': value}} for value in key_values[i:i+page_size]],
+                'ProjectionExpression': projection,
+                'ExpressionAttributeNames': names
+            }
+        }
+        page = []
+        while request_items:
+            response = client.batch_get_item(RequestItems=request_items)
+            page.extend(from_item(item) for item in response.get('Responses', {}).get(table_name, []))
+            request_items = response.get('UnprocessedKeys') or None
+        yield page
@@ -0,0 +1,326 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+from rollups import HOURS, day_occupancy
+
+# 예약 변경 이벤트 로그 (날짜 키 + 순번, 추가만 함)
+EVENT_TABLE = 'studyroom-event-log'
+# 압축 스냅샷 (날짜 키 + 수집 시각, 해당 시점까지의 이벤트를 반영한 원본 예약 목록과 마지막 순번)
+SNAPSHOT_TABLE = 'studyroom-snapshots'
+# 마지막 스냅샷 이후 이벤트가 이만큼 쌓이면 새 스냅샷으로 압축 (복원 시 읽는 이벤트 수 상한)
+COMPACT_EVERY = 50
+EVENT_TYPES = ('created', 'cancelled', 'refunded', 'moved', 'updated', 'removed')
+
+# 응답에 예약 번호가 있으면 식별자로 우선 사용 (없으면 사용자/룸/시작 시간 조합)
+ID_FIELDS = ('s_idx', 'ord_idx', 'ord_no')
+# 이 필드가 바뀌면 이동(룸/시간 변경)으로 분류
+MOVE_FIELDS = ('sg_name', 's_s_time', 's_e_time', 's_use_time')
+
+# 순번 충돌(동시 추가) 시 재시도 횟수
+APPEND_RETRIES = 3
+# 저장본 순번 뒤에 이미 있는 이벤트가 이보다 오래됐으면 중단된 수집이 남긴 것으로 보고 그 뒤에 이어 씀 (Lambda 최대 실행 시간)
+ORPHAN_EVENT_AGE = timedelta(minutes=15)
+
+class EventLogConflict(Exception):
+    """다른 수집이 같은 저장본 순번 뒤에 이벤트를 먼저 추가함 (저장본을 다시 읽고 비교해야 함)"""
+
+def _has_id(record):
+    return any(record.get(field) for field in ID_FIELDS)
+
+def record_key(record):
+    """예약 식별자 (예약 번호 필드 → 사용자|룸|시작 시간)"""
+    for field in ID_FIELDS:
+        if record.get(field):
+            return f"{field}:{record[field]}"
+    return f"{record.get('m_nm', '')}|{record.get('sg_name', '')}|{record.get('s_s_time', '')}"
+
+def _plain(value):
+    # DynamoDB에서 읽은 Decimal은 수집 직후의 int/float와 같은 값으로 직렬화
+    if isinstance(value, Decimal):
+        return int(value) if value % 1 == 0 else float(value)
+    return str(value)
+
+def record_hash(record):
+    """원본 레코드 내용 해시 (필드 순서 무관, 저장 전후 숫자 타입 차이 무시)"""
+    encoded = json.dumps(record, sort_keys=True, ensure_ascii=False, default=_plain).encode('utf-8')
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+def content_hash(records):
+    """하루 예약 목록의 내용 해시 (레코드/필드 순서 무관, ETag와 변경 감지에 사용)"""
+    digest = hashlib.blake2b(digest_size=12)
+    for value in sorted(record_hash(record) for record in records or [] if isinstance(record, dict)):
+        digest.update(value.encode('ascii'))
+    return digest.hexdigest()
+
+def record_state(record):
+    """예약 상태 분류 (active / cancelled / refunded)"""
+    if record.get('s_state') == 'CANCEL' or record.get('s_status') in ('C', 'CANCEL'):
+        return 'cancelled'
+    if record.get('s_state') == 'REFUND' or record.get('ord_refund_step') == 'SUCCESS':
+        return 'refunded'
+    return 'active'
+
+def _index(records):
+    """{식별자: (해시, 레코드)} (같은 식별자가 반복되면 순서대로 #2, #3 …을 붙임)"""
+    index = {}
+    for record in records or []:
+        if not isinstance(record, dict):
+            continue
+        key = base = record_key(record)
+        count = 1
+        while key in index:
+            count += 1
+            key = f"{base}#{count}"
+        index[key] = (record_hash(record), record)
+    return index
+
+def _classify(old, new):
+    """같은 예약의 이전/현재 레코드 → 이벤트 종류"""
+    old_state, new_state = record_state(old), record_state(new)
+    if old_state != new_state:
+        return {'active': 'created', 'cancelled': 'cancelled', 'refunded': 'refunded'}[new_state]
+    if any(old.get(field) != new.get(field) for field in MOVE_FIELDS):
+        return 'moved'
+    return 'updated'
+
+def diff_snapshots(old_records, new_records, normalize):
+    """같은 날짜의 연속된 두 수집 결과 비교 → 변경 이벤트 목록 (O(n), 내용 해시가 같은 예약은 건너뜀)
+
+    normalize: 원본 레코드 → 정규화 예약 (집계 제외 대상이면 None), 이벤트의 before/after로 기록
+    """
+    old_index = _index(old_records)
+    new_index = _index(new_records)
+
+    changes = []
+    added = []
+    for key, (digest, record) in new_index.items():
+        previous = old_index.pop(key, None)
+        if previous is None:
+            added.append((key, record))
+        elif previous[0] != digest:
+            changes.append((_classify(previous[1], record), key, None, previous[1], record))
+
+    # 예약 번호가 없으면 식별자에 룸/시작 시간이 들어가므로,
+    # 사라진 식별자와 같은 사용자의 새 식별자는 룸/시간 이동으로 보고 짝지음
+    removed_by_user = {}
+    for key, (_, record) in old_index.items():
+        user = None if _has_id(record) else record.get('m_nm', '')
+        removed_by_user.setdefault(user, []).append((key, record))
+    for key, record in added:
+        candidates = None if _has_id(record) else removed_by_user.get(record.get('m_nm', ''))
+        if candidates:
+            previous_key, previous = candidates.pop(0)
+            event_type = _classify(previous, record)
+            changes.append(('moved' if event_type == 'updated' else event_type, key, previous_key, previous, record))
+        elif record_state(record) != 'cancelled':
+            changes.append(('created' if record_state(record) == 'active' else 'refunded', key, None, None, record))
+        else:
+            changes.append(('cancelled', key, None, None, record))
+    for candidates in removed_by_user.values():
+        for key, record in candidates:
+            # 목록에서 사라진 예약은 취소로 간주 (이미 취소/환불 상태였으면 종류만 'removed')
+            changes.append(('cancelled' if record_state(record) == 'active' else 'removed', key, None, record, None))
+
+    # 모든 변경을 이벤트로 남겨 원본 목록을 복원할 수 있게 하고,
+    # 정규화 대상이 아닌 예약(집계 제외 사용자 등)의 변경은 notify=False로 구분
+    events = []
+    for event_type, key, previous_key, before, after in changes:
+        before_normalized = normalize(before) if before else None
+        after_normalized = normalize(after) if after else None
+        event = {
+            'type': event_type,
+            'key': key,
+            'before': before_normalized,
+            'after': after_normalized,
+            'record': after,
+            'hash': record_hash(after) if after else None,
+            'notify': before_normalized is not None or after_normalized is not None
+        }
+        if previous_key:
+            event['previous_key'] = previous_key
+        events.append(event)
+    return events
+
+def occupancy_delta(events):
+    """이벤트 목록의 룸별 시간대 점유 변화량 {room: [24]} (변경된 예약만 계산)"""
+    delta = {}
+    for sign, side in ((-1, 'before'), (1, 'after')):
+        changed = [event[side] for event in events if event[side]]
+        for room, slots in day_occupancy(changed).items():
+            counters = delta.setdefault(room, [0] * HOURS)
+            for hour in range(HOURS):
+                counters[hour] += sign * slots[hour]
+    return {room: slots for room, slots in delta.items() if any(slots)}
+
+def _last_event(dynamodb, data_key):
+    response = dynamodb.Table(EVENT_TABLE).query(
+        KeyConditionExpression='#d = :d',
+        ExpressionAttributeNames={'#d': 'date'},
+        ExpressionAttributeValues={':d': data_key},
+        ScanIndexForward=False,
+        Limit=1
+    )
+    items = response.get('Items', [])
+    return items[0] if items else None
+
+def last_seq(dynamodb, data_key):
+    """날짜의 마지막 이벤트 순번 (없으면 0)"""
+    event = _last_event(dynamodb, data_key)
+    return int(event['seq']) if event else 0
+
+def _append_after(dynamodb, data_key, events, fetched_at, after_seq):
+    """저장본 순번 바로 뒤에 이벤트 추가 (그 자리에 다른 수집의 이벤트가 있으면 EventLogConflict)"""
+    table = dynamodb.Table(EVENT_TABLE)
+    last = _last_event(dynamodb, data_key)
+    if last and int(last['seq']) > after_seq:
+        if datetime.fromisoformat(last['fetched_at']) > datetime.now() - ORPHAN_EVENT_AGE:
+            raise EventLogConflict(f"{data_key} 이벤트 로그가 저장본 순번 {after_seq}보다 앞섬 ({last['seq']})")
+        print(f"Event log for {data_key} has orphaned events after seq {after_seq}, appending after {last['seq']}")
+        after_seq = int(last['seq'])
+
+    seq = after_seq
+    try:
+        for event in events:
+            seq += 1
+            table.put_item(
+                Item=dict(event, date=data_key, seq=seq, fetched_at=fetched_at),
+                ConditionExpression='attribute_not_exists(seq)'
+            )
+    except dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+        raise EventLogConflict(f"{data_key} 이벤트 순번 {seq}에 다른 수집이 먼저 기록함")
+    return seq
+
+def append_events(dynamodb, data_key, events, fetched_at=None, after_seq=None):
+    """이벤트를 순번을 이어 로그에 추가 → 마지막 순번
+
+    after_seq가 있으면 읽은 저장본의 순번 바로 뒤에만 추가 (다른 수집이 먼저 추가했으면 EventLogConflict),
+    없으면 마지막 순번 뒤에 추가 (같은 순번은 조건부 쓰기로 막고, 충돌하면 마지막 순번부터 다시)
+    """
+    if not events:
+        return None
+    fetched_at = fetched_at or datetime.now().isoformat()
+    if after_seq is not None:
+        return _append_after(dynamodb, data_key, events, fetched_at, after_seq)
+    table = dynamodb.Table(EVENT_TABLE)
+    written = 0
+    for attempt in range(APPEND_RETRIES):
+        seq = last_seq(dynamodb, data_key)
+        try:
+            for event in events[written:]:
+                seq += 1
+                table.put_item(
+                    Item=dict(event, date=data_key, seq=seq, fetched_at=fetched_at),
+                    ConditionExpression='attribute_not_exists(seq)'
+                )
+                written += 1
+            return seq
+        except dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+            print(f"Event log for {data_key} appended concurrently, retrying ({attempt + 1}/{APPEND_RETRIES})")
+    raise RuntimeError(f"{data_key} 이벤트 로그 추가 실패 ({written}/{len(events)}건 기록)")
+
+def latest_snapshot(dynamodb, data_key, at=None):
+    """at 시각(ISO, 수집 시각 기준) 이전의 가장 최근 스냅샷 (at이 없으면 마지막 스냅샷, 없으면 None)"""
+    condition = '#d = :d'
+    values = {':d': data_key}
+    if at:
+        condition += ' AND taken_at <= :at'
+        values[':at'] = at
+    response = dynamodb.Table(SNAPSHOT_TABLE).query(
+        KeyConditionExpression=condition,
+        ExpressionAttributeNames={'#d': 'date'},
+        ExpressionAttributeValues=values,
+        ScanIndexForward=False,
+        Limit=1
+    )
+    items = response.get('Items', [])
+    return items[0] if items else None
+
+def write_snapshot(dynamodb, data_key, seq, taken_at, records):
+    """seq 순번까지 반영된 원본 예약 목록을 스냅샷으로 저장"""
+    dynamodb.Table(SNAPSHOT_TABLE).put_item(Item={
+        'date': data_key,
+        'taken_at': taken_at,
+        'seq': seq,
+        'records': list(records or [])
+    })
+    print(f"Snapshot for {data_key} at seq {seq} ({len(records or [])} records)")
+
+def record_collection(dynamodb, data_key, old_response, old_at, new_response, new_at, normalize, old_seq=None):
+    """수집 1회를 이벤트 소싱 로그에 기록 → (이벤트 목록(첫 수집이면 None), 마지막 순번)
+
+    첫 수집은 기준 스냅샷만 저장하고, 이후에는 직전 수집본과 비교한 이벤트를 추가하며
+    마지막 스냅샷 이후 이벤트가 COMPACT_EVERY개 이상 쌓이면 현재 목록을 새 스냅샷으로 저장
+    old_seq: 직전 수집본과 함께 읽은 순번 (있으면 그 뒤에만 추가, 동시 수집과 겹치면 EventLogConflict)
+    """
+    new_records = (new_response or {}).get('list') or []
+    if old_response is None:
+        seq = last_seq(dynamodb, data_key)
+        write_snapshot(dynamodb, data_key, seq, new_at, new_records)
+        return None, seq
+
+    old_records = old_response.get('list') or []
+    snapshot = latest_snapshot(dynamodb, data_key)
+    if snapshot is None:
+        # 이벤트 로그 도입 전에 수집된 날짜는 직전 수집본을 기준 스냅샷으로 삼음
+        snapshot = {'seq': last_seq(dynamodb, data_key)}
+        write_snapshot(dynamodb, data_key, snapshot['seq'], old_at, old_records)
+
+    events = diff_snapshots(old_records, new_records, normalize)
+    seq = append_events(dynamodb, data_key, events, new_at, old_seq)
+    if seq is None:
+        return events, old_seq if old_seq is not None else last_seq(dynamodb, data_key)
+    if seq - int(snapshot['seq']) >= COMPACT_EVERY:
+        write_snapshot(dynamodb, data_key, seq, new_at, new_records)
+    return events, seq
+
+def apply_events(records, events):
+    """원본 예약 목록에 이벤트를 순서대로 적용한 목록"""
+    state = {key: record for key, (_, record) in _index(records).items()}
+    for event in events:
+        if event.get('previous_key'):
+            state.pop(event['previous_key'], None)
+        if event.get('record') is None:
+            state.pop(event['key'], None)
+        else:
+            state[event['key']] = event['record']
+    return list(state.values())
+
+def reconstruct(dynamodb, data_key, at=None):
+    """at 시각(없으면 현재)의 원본 예약 목록 복원 (가장 가까운 이전 스냅샷 + 그 이후 이벤트만 읽음)
+
+    → {'list', 'seq', 'snapshot_seq', 'events_applied', 'as_of'} (스냅샷이 없으면 None)
+    """
+    snapshot = latest_snapshot(dynamodb, data_key, at)
+    if snapshot is None:
+        return None
+    events = read_events(dynamodb, data_key, int(snapshot['seq']), until=at)
+    return {
+        'list': apply_events(snapshot.get('records'), events),
+        'seq': int(events[-1]['seq']) if events else int(snapshot['seq']),
+        'snapshot_seq': int(snapshot['seq']),
+        'events_applied': len(events),
+        'as_of': events[-1]['fetched_at'] if events else snapshot['taken_at']
+    }
+
+def read_events(dynamodb, data_key, after_seq=0, limit=None, until=None):
+    """after_seq 이후 이벤트 목록 (순번 순, until이 있으면 그 수집 시각까지만 읽고 멈춤)"""
+    table = dynamodb.Table(EVENT_TABLE)
+    kwargs = {
+        'KeyConditionExpression': '#d = :d AND seq > :s',
+        'ExpressionAttributeNames': {'#d': 'date'},
+        'ExpressionAttributeValues': {':d': data_key, ':s': after_seq}
+    }
+    if limit or until:
+        kwargs['Limit'] = limit or COMPACT_EVERY
+    events = []
+    while True:
+        response = table.query(**kwargs)
+        for event in response.get('Items', []):
+            if until and event['fetched_at'] > until:
+                return events
+            events.append(event)
+        if 'LastEvaluatedKey' not in response or (limit and len(events) >= limit):
+            break
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return events[:limit] if limit else events
@@ -0,0 +1,237 @@
+import csv
+import importlib.util
+import io
+import json
+import sys
+from rollups import PROXY_TABLE
+from dynamo_reader import batch_get_pages
+
+# 내보내기 컬럼 (정규화 예약 + 날짜/표시용 룸 이름)
+EXPORT_FIELDS = ('date', 'status', 'room', 'room_name', 'user', 'start_time', 'end_time', 'minutes', 'revenue', 'list_price', 'refund')
+INT_FIELDS = ('minutes', 'revenue', 'list_price', 'refund')
+FORMATS = ('csv', 'ndjson', 'parquet')
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+# 배치 조회 단위 (DynamoDB batch_get_item 최대 키 수)
+PAGE_DAYS = 25
+# parquet row group 최소 행 수 (하루 단위로 모으다가 이 행 수를 넘으면 기록)
+PARQUET_ROW_GROUP = 5000
+# parquet 마지막에 기록되는 footer(메타데이터)용 여유 바이트
+PARQUET_FOOTER_BYTES = 64 * 1024
+
+def iter_days(dynamodb, dates, page_days=PAGE_DAYS, prefix=''):
+    """날짜 순서대로 (날짜, 정규화 예약 목록) 생성 (한 번에 한 페이지만 메모리에 유지, 숫자는 int)"""
+    for i in range(0, len(dates), page_days):
+        page = dates[i:i+page_days]
+        items = {}
+        for batch in batch_get_pages(dynamodb, PROXY_TABLE, 'date', [prefix + date_str for date_str in page], ['reservations'], page_days):
+            for item in batch:
+                items[item['date'][len(prefix):]] = item.get('reservations') or []
+        for date_str in page:
+            if date_str in items:
+                yield date_str, items.pop(date_str)
+
+def day_rows(date_str, reservations, room_mapping):
+    """하루 정규화 예약 → 내보내기 행"""
+    for reservation in reservations:
+        room = reservation.get('room', '')
+        yield {
+            'date': date_str,
+            'status': reservation.get('status', ''),
+            'room': room,
+            'room_name': room_mapping.get(room, room),
+            'user': reservation.get('user', ''),
+            'start_time': reservation.get('start_time', ''),
+            'end_time': reservation.get('end_time', ''),
+            'minutes': int(reservation.get('hours', 0)),
+            'revenue': int(reservation.get('revenue', 0)),
+            'list_price': int(reservation.get('list_price', reservation.get('revenue', 0))),
+            'refund': int(reservation.get('refund', 0))
+        }
+
+# 형식별 인코더: stage(하루 행)는 그 날짜가 더할 최대 바이트, commit()은 지금 내보낼 바이트, close()는 마지막 바이트
+#   pending은 받았지만 아직 내보내지 않은 바이트 추정치 (flush()로 바로 기록), reserve는 close()가 더할 여유 바이트
+
+class _TextEncoder:
+    """CSV/NDJSON 인코더 (하루 단위로 바로 인코딩하므로 크기가 정확함)"""
+    pending = 0
+    reserve = 0
+
+    def __init__(self, encode_day, head=b''):
+        self.encode_day = encode_day
+        self.head = head
+        self.staged = b''
+
+    def stage(self, rows):
+        self.staged = self.head + self.encode_day(rows)
+        return len(self.staged)
+
+    def commit(self):
+        chunk, self.staged, self.head = self.staged, b'', b''
+        return chunk
+
+    def flush(self):
+        return b''
+
+    def close(self):
+        return self.head
+
+def _csv_day(rows):
+    buffer = io.StringIO()
+    csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, lineterminator='\n').writerows(rows)
+    return buffer.getvalue().encode('utf-8')
+
+def _ndjson_day(rows):
+    return ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows).encode('utf-8')
+
+def csv_encoder():
+    """CSV (엑셀에서 한글이 깨지지 않도록 BOM 포함)"""
+    return _TextEncoder(_csv_day, ('\ufeff' + ','.join(EXPORT_FIELDS) + '\n').encode('utf-8'))
+
+def ndjson_encoder():
+    """NDJSON (한 줄에 예약 하나)"""
+    return _TextEncoder(_ndjson_day)
+
+class _ChunkSink(io.RawIOBase):
+    """parquet 작성기의 출력을 청크로 모으는 파일 객체 (위치는 누적 바이트 수)"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+class ParquetEncoder:
+    """Parquet 인코더 (하루 단위 테이블을 모아 row group으로 기록, pyarrow가 있을 때만 사용 가능)
+
+    기록 전 크기는 Arrow 메모리 크기(압축 전)로 추정 → 실제 snappy 압축 row group보다 크게 잡힘
+    """
+    reserve = PARQUET_FOOTER_BYTES
+
+    def __init__(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.schema = pa.schema([(name, pa.int64() if name in INT_FIELDS else pa.string()) for name in EXPORT_FIELDS])
+        self.sink = _ChunkSink()
+        self.writer = pq.ParquetWriter(self.sink, self.schema, compression='snappy')
+        self.tables = []
+        self.staged = None
+        self.pending = 0
+
+    def stage(self, rows):
+        self.staged = self.pa.Table.from_pylist(rows, schema=self.schema)
+        return self.staged.nbytes
+
+    def commit(self):
+        self.tables.append(self.staged)
+        self.pending += self.staged.nbytes
+        self.staged = None
+        if sum(table.num_rows for table in self.tables) >= PARQUET_ROW_GROUP:
+            return self.flush()
+        return b''
+
+    def flush(self):
+        if self.tables:
+            self.writer.write_table(self.pa.concat_tables(self.tables))
+            self.tables = []
+            self.pending = 0
+        return self.sink.drain()
+
+    def close(self):
+        chunk = self.flush()
+        self.writer.close()
+        return chunk + self.sink.drain()
+
+def parquet_available():
+    return importlib.util.find_spec('pyarrow') is not None
+
+ENCODERS = {'csv': csv_encoder, 'ndjson': ndjson_encoder, 'parquet': ParquetEncoder}
+
+class ExportStream:
+    """기간 예약 내보내기 (조회 → 행 변환 → 형식별 인코딩 파이프라인)
+
+    하루씩 인코딩해 보고 max_bytes를 넘게 되면 그 날짜 앞에서 멈추고 next_start에 그 날짜를 남김
+    (아직 내보내지 않은 parquet row group과 footer 여유까지 포함, 첫 날짜는 항상 포함)
+    """
+
+    def __init__(self, dynamodb, dates, fmt='csv', room_mapping=None, max_bytes=None, prefix=''):
+        if fmt not in FORMATS:
+            raise ValueError(f"지원하지 않는 형식: {fmt} ({', '.join(FORMATS)})")
+        self.dynamodb = dynamodb
+        self.dates = list(dates)
+        self.format = fmt
+        self.room_mapping = room_mapping or {}
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.next_start = None
+        self.bytes = 0
+        self.rows = 0
+
+    def _emit(self, chunk):
+        if chunk:
+            self.bytes += len(chunk)
+            yield chunk
+
+    def _fits(self, encoder, size):
+        return self.bytes + encoder.pending + size + encoder.reserve <= self.max_bytes
+
+    def __iter__(self):
+        encoder = ENCODERS[self.format]()
+        first = True
+        for date_str, reservations in iter_days(self.dynamodb, self.dates, prefix=self.prefix):
+            rows = list(day_rows(date_str, reservations, self.room_mapping))
+            size = encoder.stage(rows)
+            if self.max_bytes and not first and not self._fits(encoder, size):
+                # 모아 둔 row group을 먼저 기록해 추정치를 실제 크기로 바꾼 뒤 다시 확인
+                yield from self._emit(encoder.flush())
+                if not self._fits(encoder, size):
+                    self.next_start = date_str
+                    break
+            first = False
+            self.rows += len(rows)
+            yield from self._emit(encoder.commit())
+        yield from self._emit(encoder.close())
+
+def main(argv):
+    """로컬 내보내기: python export.py 시작일 종료일 [csv|ndjson|parquet] [출력 파일]"""
+    import boto3
+    from calendar_dim import get_calendar
+    from config import get_config
+
+    if len(argv) < 3:
+        print(main.__doc__)
+        return 1
+    start_date, end_date = argv[1], argv[2]
+    fmt = argv[3] if len(argv) > 3 else 'csv'
+    output = argv[4] if len(argv) > 4 else f"studyroom_{start_date}_{end_date}.{fmt}"
+
+    dynamodb = boto3.resource('dynamodb', region_name='ap-northeast-2')
+    stream = ExportStream(dynamodb, get_calendar(start_date, end_date).dates, fmt, get_config(dynamodb).room_mapping)
+    with open(output, 'wb') as f:
+        for chunk in stream:
+            f.write(chunk)
+    print(f"Exported {stream.rows} rows ({stream.bytes} bytes) to {output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,198 @@
+import json
+from datetime import date, datetime, timedelta
+from rollups import ROLLUP_TABLE, HOURS, WEEKDAYS, fetch_occupancy
+
+FORECAST_ID = 'forecast#model'
+
+# 하루마다 과거 가중치에 곱하는 감쇠율 (반감기 약 3주)
+DECAY = 0.97
+# 최초 학습에 사용하는 과거 일수
+FIT_HISTORY_DAYS = 112
+MAX_HORIZON = 14
+# 추세 보정 배율 범위 (1 ± TREND_LIMIT)
+TREND_LIMIT = 0.5
+
+# 컨테이너 내 학습된 모델 캐시 {지점 접두어: 모델}
+_models = {}
+
+class ForecastModel:
+    """룸별 요일 × 시간 기준선(지수 감쇠 평균)과 일별 총 점유 분의 선형 추세
+
+    모든 통계는 감쇠 가중 합으로 보관하므로 새 날짜는 기존 통계에 더하기만 하면 됨
+    """
+
+    def __init__(self, version=None, params=None):
+        params = params or {}
+        self.version = version
+        self.fitted_through = params.get('fitted_through')
+        self.origin = params.get('origin')
+        self.last_day = params.get('last_day')
+        self.days = params.get('days', 0)
+        self.weights = params.get('weights', [0.0] * WEEKDAYS)
+        self.rooms = params.get('rooms', {})
+        self.trend = params.get('trend', {})
+
+    def add_day(self, date_str, occupancy):
+        """하루 점유 데이터 반영 (이미 반영된 날짜 이전이면 무시)"""
+        day = date.fromisoformat(date_str).toordinal()
+        if self.last_day is not None:
+            steps = day - self.last_day
+            if steps <= 0:
+                return False
+            self._decay(DECAY ** steps)
+        else:
+            self.origin = day
+
+        weekday = (day - 1) % 7
+        t = day - self.origin
+        base = weekday * HOURS
+        self.weights[weekday] += 1
+        for room in set(self.rooms) | set(occupancy):
+            slots = occupancy.get(room) or [0] * HOURS
+            sums = self.rooms.setdefault(room, [0.0] * (WEEKDAYS * HOURS))
+            for hour in range(HOURS):
+                sums[base + hour] += slots[hour]
+
+            # 추세 통계: 가중치, Σt, Σy, Σt², Σty
+            y = sum(slots)
+            stats = self.trend.setdefault(room, [0.0] * 5)
+            stats[0] += 1
+            stats[1] += t
+            stats[2] += y
+            stats[3] += t * t
+            stats[4] += t * y
+
+        self.last_day = day
+        self.days += 1
+        return True
+
+    def _decay(self, factor):
+        self.weights = [w * factor for w in self.weights]
+        for room, sums in self.rooms.items():
+            self.rooms[room] = [v * factor for v in sums]
+        for room, stats in self.trend.items():
+            self.trend[room] = [v * factor for v in stats]
+
+    def slope(self, room):
+        """룸의 일별 총 점유 분 추세 (하루당 증감 분, 평균 시점, 평균 값)"""
+        w, st, sy, stt, sty = self.trend.get(room, [0.0] * 5)
+        if w <= 0:
+            return 0.0, 0.0, 0.0
+        mean_t, mean_y = st / w, sy / w
+        variance = stt / w - mean_t * mean_t
+        if variance <= 1e-9:
+            return 0.0, mean_t, mean_y
+        return (sty / w - mean_t * mean_y) / variance, mean_t, mean_y
+
+    def predict(self, room, date_str):
+        """룸/날짜의 시간대별 예상 점유 분 [24]"""
+        day = date.fromisoformat(date_str).toordinal()
+        weekday = (day - 1) % 7
+        weight = self.weights[weekday]
+        sums = self.rooms.get(room)
+        if not weight or sums is None:
+            return [0.0] * HOURS
+
+        # 기준선은 가중 평균 시점 기준이므로 추세선 비율로 예측 날짜에 맞춤
+        slope, mean_t, mean_y = self.slope(room)
+        factor = 1 + slope * (day - self.origin - mean_t) / mean_y if mean_y else 1
+        factor = min(max(factor, 1 - TREND_LIMIT), 1 + TREND_LIMIT)
+
+        base = weekday * HOURS
+        return [min(sums[base + hour] / weight * factor, 60.0) for hour in range(HOURS)]
+
+    def to_params(self):
+        return {
+            'fitted_through': self.fitted_through,
+            'origin': self.origin,
+            'last_day': self.last_day,
+            'days': self.days,
+            'weights': [round(w, 6) for w in self.weights],
+            'rooms': {room: [round(v, 4) for v in sums] for room, sums in self.rooms.items()},
+            'trend': {room: [round(v, 4) for v in stats] for room, stats in self.trend.items()}
+        }
+
+def _load_model(dynamodb, version, prefix=''):
+    """저장된 모델 파라미터 조회 (데이터 버전이 다르면 None)"""
+    item = dynamodb.Table(ROLLUP_TABLE).get_item(Key={'id': prefix + FORECAST_ID}).get('Item')
+    if not item or item.get('config_version') != version:
+        return None
+    return ForecastModel(version, json.loads(item['params']))
+
+def _save_model(dynamodb, model, prefix=''):
+    dynamodb.Table(ROLLUP_TABLE).put_item(Item={
+        'id': prefix + FORECAST_ID,
+        'config_version': model.version,
+        'fitted_through': model.fitted_through,
+        'params': json.dumps(model.to_params(), ensure_ascii=False),
+        'updated_at': int(datetime.now().timestamp())
+    })
+
+def get_model(dynamodb, through_date, version, full=False, prefix=''):
+    """through_date까지 학습된 모델 (컨테이너 캐시 → 저장된 파라미터 → 새 날짜만 증분 학습)
+
+    prefix: 지점 키 접두어 (기본 지점은 '')
+    """
+    model = _models.get(prefix)
+    if full or (model and model.version != version):
+        model = None
+    if model is not None and model.fitted_through >= through_date:
+        return model
+
+    if not full:
+        stored = _load_model(dynamodb, version, prefix)
+        if stored and (model is None or stored.fitted_through > model.fitted_through):
+            model = stored
+    if model is None:
+        model = ForecastModel(version)
+
+    through = date.fromisoformat(through_date)
+    if model.fitted_through:
+        first = date.fromisoformat(model.fitted_through) + timedelta(days=1)
+    else:
+        first = through - timedelta(days=FIT_HISTORY_DAYS - 1)
+
+    if first <= through:
+        dates = [(first + timedelta(days=i)).isoformat() for i in range((through - first).days + 1)]
+        occupancy = fetch_occupancy(dynamodb, dates, prefix)
+        added = sum(model.add_day(date_str, occupancy[date_str]) for date_str in dates if date_str in occupancy)
+        model.fitted_through = through_date
+        _save_model(dynamodb, model, prefix)
+        print(f"Forecast model {prefix}fitted through {through_date} (+{added} days, total {model.days})")
+
+    _models[prefix] = model
+    return model
+
+def forecast(model, dates, room_mapping, booked=None):
+    """날짜별 룸별 시간대 예상 점유 (이미 예약된 분보다 작게 예측하지 않음)"""
+    booked = booked or {}
+    room_keys = list(room_mapping.keys()) + sorted(room for room in model.rooms if room not in room_mapping)
+
+    occupancy = {}
+    hours = {}
+    for room in room_keys:
+        name = room_mapping.get(room, room)
+        occupancy[name] = []
+        for date_str in dates:
+            reserved = booked.get(date_str, {}).get(room) or [0] * HOURS
+            predicted = [round(max(p, r)) for p, r in zip(model.predict(room, date_str), reserved)]
+            occupancy[name].append(predicted)
+        hours[name] = [round(sum(slots) / 60, 1) for slots in occupancy[name]]
+
+    trend = {}
+    for room in room_keys:
+        slope, _, mean_y = model.slope(room)
+        trend[room_mapping.get(room, room)] = round(slope * 7 / mean_y * 100, 1) if mean_y else 0
+
+    return {
+        'dates': list(dates),
+        'rooms': list(occupancy.keys()),
+        'occupancy': occupancy,
+        'occupied_hours': hours,
+        'model': {
+            'fitted_through': model.fitted_through,
+            'days': model.days,
+            'decay': DECAY,
+            'weekly_trend': trend
+        }
+    }
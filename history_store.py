@@ -0,0 +1,213 @@
+import json
+import mmap
+import os
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from columnar import INT_COLUMNS, ReservationColumns
+
+# 로컬 이력 저장소: 월별 디렉터리에 컬럼별 int32 배열 파일 + meta.json
+#   history/rooms.json, history/users.json   전체 월이 공유하는 룸/사용자 목록 (인덱스 = 코드)
+#   history/2025-12/meta.json                날짜 목록, 행 수, 동기화 시각
+#   history/2025-12/day.i32, room.i32 ...    컬럼 데이터 (읽을 때 mmap으로 복사 없이 사용)
+#   history/<p_code>/...                     기본 지점 외 지점은 p_code 하위 디렉터리에 같은 구조로 저장
+DEFAULT_ROOT = os.environ.get('STUDYROOM_HISTORY_DIR', 'history')
+# 월이 끝나고 이 일수가 지난 뒤 동기화한 월은 확정으로 보고 다시 받지 않음
+FINAL_AFTER_DAYS = 2
+
+class ChainedColumn:
+    """여러 월 파티션의 같은 컬럼을 복사 없이 이어서 읽는 시퀀스 (offset은 월별 day 인덱스 보정용)"""
+
+    def __init__(self, parts, offsets=None):
+        self.parts = parts
+        self.offsets = offsets or [0] * len(parts)
+
+    def __len__(self):
+        return sum(len(part) for part in self.parts)
+
+    def __iter__(self):
+        for part, offset in zip(self.parts, self.offsets):
+            if offset:
+                for value in part:
+                    yield value + offset
+            else:
+                yield from part
+
+class HistoryColumns:
+    """기간 이력의 컬럼 형식 (ReservationColumns와 같은 속성, 집계 엔진에 그대로 전달)"""
+
+    def __init__(self, dates, rooms, users, columns):
+        self.dates = dates
+        self.rooms = rooms
+        self.users = users
+        for name in INT_COLUMNS:
+            setattr(self, name, columns[name])
+
+    def __len__(self):
+        return len(self.day)
+
+def _month_dates(month):
+    first = date.fromisoformat(f"{month}-01")
+    following = (first + timedelta(days=32)).replace(day=1)
+    return [(first + timedelta(days=i)).isoformat() for i in range((following - first).days)]
+
+def _months(start_date, end_date):
+    months = []
+    current = date.fromisoformat(start_date).replace(day=1)
+    end = date.fromisoformat(end_date)
+    while current <= end:
+        months.append(current.strftime('%Y-%m'))
+        current = (current + timedelta(days=32)).replace(day=1)
+    return months
+
+class HistoryStore:
+    """월 단위로 분할된 로컬 컬럼 이력 저장소 (지점마다 디렉터리 분리)"""
+
+    def __init__(self, root=DEFAULT_ROOT, place=None):
+        self.prefix = place.prefix if place else ''
+        self.root = os.path.join(root, place.key) if place and not place.default else root
+        self._partitions = {}
+        self.rooms = self._read_json('rooms.json', [])
+        self.users = self._read_json('users.json', [])
+
+    def _read_json(self, name, default):
+        path = os.path.join(self.root, name)
+        if not os.path.exists(path):
+            return default
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_json(self, name, data):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+
+    def meta(self, month):
+        return self._read_json(os.path.join(month, 'meta.json'), None)
+
+    def write_month(self, month, days):
+        """한 달치 (날짜, 정규화 예약 목록)을 파티션으로 저장 (기존 파티션은 통째로 교체)"""
+        columns = ReservationColumns.from_days(days, self.rooms, self.users)
+        directory = os.path.join(self.root, month)
+        os.makedirs(directory, exist_ok=True)
+        for name in INT_COLUMNS:
+            path = os.path.join(directory, f"{name}.i32")
+            with open(path + '.tmp', 'wb') as f:
+                getattr(columns, name).tofile(f)
+            os.replace(path + '.tmp', path)
+
+        # 새로 나온 룸/사용자는 목록 뒤에 추가되므로 기존 파티션의 코드는 그대로 유효
+        self.rooms, self.users = columns.rooms, columns.users
+        self._write_json('rooms.json', self.rooms)
+        self._write_json('users.json', self.users)
+        self._write_json(os.path.join(month, 'meta.json'), {
+            'dates': columns.dates,
+            'rows': len(columns),
+            'byteorder': sys.byteorder,
+            'synced_at': datetime.now().isoformat()
+        })
+        self._partitions.pop(month, None)
+        return len(columns)
+
+    def _open_month(self, month):
+        """월 파티션 컬럼을 mmap으로 열기 {컬럼: memoryview}"""
+        if month in self._partitions:
+            return self._partitions[month]
+        meta = self.meta(month)
+        if meta is None:
+            return None
+        if meta['byteorder'] != sys.byteorder:
+            raise ValueError(f"{month} 파티션의 바이트 순서가 다릅니다 ({meta['byteorder']})")
+
+        columns = {}
+        for name in INT_COLUMNS:
+            with open(os.path.join(self.root, month, f"{name}.i32"), 'rb') as f:
+                if meta['rows'] == 0:
+                    columns[name] = memoryview(array('i'))
+                else:
+                    columns[name] = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast('i')
+        self._partitions[month] = (meta['dates'], columns)
+        return self._partitions[month]
+
+    def load(self, start_date, end_date):
+        """기간 이력 컬럼 (월 파티션의 행 범위만 잘라서 이어 붙임, 데이터 복사 없음)"""
+        dates = []
+        parts = {name: [] for name in INT_COLUMNS}
+        offsets = []
+        for month in _months(start_date, end_date):
+            partition = self._open_month(month)
+            if partition is None:
+                continue
+            month_dates, columns = partition
+
+            # 행은 날짜 순서로 저장되어 있으므로 day 컬럼 이진 탐색으로 기간 행 범위 계산
+            first = bisect_left(month_dates, start_date)
+            last = bisect_right(month_dates, end_date)
+            if first >= last:
+                continue
+            row_start = bisect_left(columns['day'], first)
+            row_end = bisect_left(columns['day'], last)
+
+            offsets.append(len(dates) - first)
+            dates.extend(month_dates[first:last])
+            for name in INT_COLUMNS:
+                parts[name].append(columns[name][row_start:row_end])
+
+        if len(offsets) == 1 and offsets[0] == 0:
+            merged = {name: parts[name][0] for name in INT_COLUMNS}
+        else:
+            merged = {name: ChainedColumn(parts[name], offsets if name == 'day' else None) for name in INT_COLUMNS}
+        return HistoryColumns(dates, self.rooms, self.users, merged)
+
+    def sync(self, dynamodb, start_date, end_date, full=False):
+        """Proxy DB에서 저장소 지점의 기간에 해당하는 월 파티션을 받아 저장 (확정된 월은 건너뜀) {월: 행 수 또는 'skip'}"""
+        from export import iter_days
+
+        today = date.today()
+        results = {}
+        for month in _months(start_date, end_date):
+            meta = self.meta(month)
+            month_dates = _month_dates(month)
+            month_end = date.fromisoformat(month_dates[-1])
+            if meta and not full and date.fromisoformat(meta['synced_at'][:10]) > month_end + timedelta(days=FINAL_AFTER_DAYS):
+                results[month] = 'skip'
+                continue
+            fetched = [day for day in month_dates if date.fromisoformat(day) <= today]
+            results[month] = self.write_month(month, iter_days(dynamodb, fetched, prefix=self.prefix))
+            print(f"Synced {month}: {results[month]} rows")
+        return results
+
+def main(argv):
+    """python history_store.py sync|report 시작일 종료일 [저장 디렉터리] [--place p_code]"""
+    from places import get_place
+
+    args = list(argv[1:])
+    place_key = None
+    if '--place' in args:
+        index = args.index('--place')
+        place_key = args[index + 1] if index + 1 < len(args) else None
+        del args[index:index + 2]
+        if not place_key:
+            print(main.__doc__)
+            return 1
+    if len(args) < 3 or args[0] not in ('sync', 'report'):
+        print(main.__doc__)
+        return 1
+    command, start_date, end_date = args[:3]
+    store = HistoryStore(args[3] if len(args) > 3 else DEFAULT_ROOT, get_place(place_key))
+
+    if command == 'sync':
+        import boto3
+        store.sync(boto3.resource('dynamodb', region_name='ap-northeast-2'), start_date, end_date)
+        return 0
+
+    from analytics import StudyRoomAnalytics, generate_report
+    columns = store.load(start_date, end_date)
+    print(generate_report(StudyRoomAnalytics().analyze_columns(columns)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,18 +1,81 @@
+import base64
 import json
-import urllib3
 import boto3
 import os
 import time
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from config import get_config
+from calendar_dim import get_calendar
+from rollups import day_occupancy, apply_day_update, apply_occupancy_delta, get_heatmap, fetch_occupancy
+from events import record_collection, occupancy_delta, read_events, reconstruct, content_hash, last_seq, EventLogConflict
+from forecast import get_model, forecast, MAX_HORIZON
+from export import ExportStream, CONTENT_TYPES, parquet_available
+from quality import (validate_schema, unknown_states, day_stats, history_dates, check_day, record_metrics,
+                     schedule_refetch, refetch_attempts, fail_refetch, clear_refetch, due_refetches, quality_report, MAX_REFETCH_ATTEMPTS)
+from columnar import ReservationColumns
+from revenue import revenue_report
+from utilization import utilization_report
+from series import DimensionSeries, fold_days, YOY_OFFSET_DAYS, group_ranges, grouped_series, rolling_series, change_rate
+from places import get_place, get_places, split_key, TOKEN_TABLE, LEGACY_TOKEN_TABLE, PLACE_CONCURRENCY, KEY_SEPARATOR
+from singleflight import Lease, coalesce
+from dynamo_reader import batch_get_pages
+from serialization import dumps, loads, extend_object
+from comepass_client import (login, fetch_studyroom, fetch_studyroom_dates, get_metrics,
+                             ComepassError, CircuitOpenError, REQUEST_DEADLINE)
 
 # 전역 변수로 재사용 가능한 리소스 초기화
 dynamodb = boto3.resource('dynamodb')
-http = urllib3.PoolManager()
+# 컨테이너 간 upstream 호출(로그인, 날짜 조회) 중복 방지용 임대
+upstream_lease = Lease(dynamodb)
+
+KST = timezone(timedelta(hours=9))
+
+# 스케줄 작업 설정 (EventBridge 5분 주기 기준)
+PRERENDER_MAX_AGE = int(os.environ.get('PRERENDER_MAX_AGE', '600'))
+PREWARM_TOKEN_MARGIN = int(os.environ.get('PREWARM_TOKEN_MARGIN', '1800'))
+# 화면용 응답을 미리 만들어 두는 날짜 수 (서울 기준 오늘부터, 지난 날짜는 원본만 저장)
+PRERENDER_DAYS = 2
+
+# 실시간 갱신(long-poll) 설정: 최대 대기 시간(API Gateway 29초 제한 이내), 저장본 재수집 간격, 저장본 확인 간격(점점 늘림)
+WATCH_MAX_WAIT = int(os.environ.get('WATCH_MAX_WAIT', '20'))
+WATCH_REFRESH_INTERVAL = int(os.environ.get('WATCH_REFRESH_INTERVAL', '60'))
+WATCH_POLL_MIN = 0.5
+WATCH_POLL_MAX = 4.0
+# 대기 중 재수집에 필요한 최소 남은 시간 (upstream 요청 deadline + 저장), 부족하면 재수집 없이 저장본만 확인
+WATCH_REFRESH_BUDGET = REQUEST_DEADLINE + 2
+
+# 정규화 예약 형식 버전 (형식 변경 시 /recompute-rollups로 저장된 원본에서 재계산)
+NORMALIZE_VERSION = 2
+
+# 같은 날짜를 동시에 수집해 저장본이 먼저 바뀌었을 때 다시 읽고 비교하는 횟수와 간격(초, 시도마다 증가)
+STORE_RETRIES = 3
+STORE_RETRY_DELAY = 0.2
+
+# 내보내기 응답 본문 최대 크기 (API Gateway 6MB 제한, parquet은 base64 인코딩 후 크기 기준)
+EXPORT_MAX_BYTES = int(os.environ.get('EXPORT_MAX_BYTES', str(4 * 1024 * 1024)))
+
+# 추이 이동 합계 최대 기간 (일)
+MAX_TREND_WINDOW = 366
+# 추이 집계 단위 (types로 여러 단위를 한 번에 요청 가능)
+TREND_TYPES = ('daily', 'weekly', 'monthly')
+# 한 번에 응답하는 추이 최대 기간 (일), 넘으면 월 단위 구간 페이지로 나눠 next_cursor로 이어서 요청
+TRENDS_MAX_DAYS = 366
+# 추이 페이지당 계산 시간 예산 (초, 다음 월 구간까지 예산 안에 끝나지 않을 것 같으면 중단)과 최대 월 구간 수
+TRENDS_PAGE_BUDGET = float(os.environ.get('TRENDS_PAGE_BUDGET', '5'))
+TRENDS_PAGE_MAX_MONTHS = 12
+
+# 예약 현황 변경분(since) 응답 최대 이벤트 수 (넘으면 전체 응답)
+MAX_DELTA_EVENTS = 200
 
 def lambda_handler(event, context):
     start_time = time.time()
     print(f"Lambda started at {datetime.now()}")
     
+    # 스케줄 이벤트 (EventBridge 또는 로컬 스케줄러)
+    if event.get('detail-type') == 'Scheduled Event' or event.get('path') == '/prewarm':
+        return prewarm_job()
+    
     # favicon.ico 요청 처리
     if event.get('path') == '/favicon.ico':
         return {
@@ -34,13 +97,67 @@ def lambda_handler(event, context):
     if event.get('path') == '/auto-collect':
         return auto_sync_data()
     
+    if event.get('path') == '/recompute-rollups':
+        return recompute_rollups()
+    
     # API 엔드포인트들
     if event.get('path') == '/api/trends':
         query_params = event.get('queryStringParameters') or {}
         start_date = query_params.get('start', '')
         end_date = query_params.get('end', '')
         analysis_type = query_params.get('type', 'weekly')
-        return get_trends_data(start_date, end_date, analysis_type)
+        return get_trends_data(start_date, end_date, analysis_type, query_params.get('window'), query_params.get('compare'), query_params.get('place'),
+                               query_params.get('types'), query_params.get('group_by'), query_params.get('cursor'), query_params.get('paged') == '1')
+    
+    if event.get('path') == '/api/places':
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'places': [place.to_dict() for place in get_places()]})
+        }
+    
+    if event.get('path') == '/api/events':
+        query_params = event.get('queryStringParameters') or {}
+        return get_events_data(query_params.get('date', ''), query_params.get('since', '0'), query_params.get('place'))
+    
+    if event.get('path') == '/api/watch':
+        query_params = event.get('queryStringParameters') or {}
+        return watch_reservations(query_params.get('date', ''), get_header(event, 'If-None-Match'), query_params.get('wait'), query_params.get('place'))
+    
+    if event.get('path') == '/api/history':
+        query_params = event.get('queryStringParameters') or {}
+        return get_history_data(query_params.get('date', ''), query_params.get('at'), query_params.get('place'))
+    
+    if event.get('path') == '/api/metrics':
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'upstream': get_metrics()})
+        }
+    
+    if event.get('path') == '/api/revenue':
+        query_params = event.get('queryStringParameters') or {}
+        return get_revenue_data(query_params.get('start', ''), query_params.get('end', ''), query_params.get('place'))
+    
+    if event.get('path') == '/api/utilization':
+        query_params = event.get('queryStringParameters') or {}
+        return get_utilization_data(query_params.get('start', ''), query_params.get('end', ''), query_params.get('place'))
+    
+    if event.get('path') == '/api/heatmap':
+        query_params = event.get('queryStringParameters') or {}
+        return get_heatmap_data(query_params.get('start', ''), query_params.get('end', ''), query_params.get('place'))
+    
+    if event.get('path') == '/api/export':
+        query_params = event.get('queryStringParameters') or {}
+        return get_export_data(query_params.get('start', ''), query_params.get('end', ''), query_params.get('format', 'csv'), query_params.get('place'))
+    
+    if event.get('path') == '/api/quality':
+        query_params = event.get('queryStringParameters') or {}
+        return get_quality_data(query_params.get('place'))
+    
+    if event.get('path') == '/api/forecast':
+        query_params = event.get('queryStringParameters') or {}
+        return get_forecast_data(query_params.get('days', '7'), query_params.get('refit') == 'full', query_params.get('place'))
     
     # 페이지 엔드포인트들
     if event.get('path') == '/trends':
@@ -55,17 +172,31 @@ def lambda_handler(event, context):
     # 그 외에는 API 응답
     query_params = event.get('queryStringParameters') or {}
     selected_date = query_params.get('date', datetime.now().strftime('%Y-%m-%d'))
-    result = get_reservations(selected_date)
+    result = get_reservations(selected_date, query_params.get('place'), get_header(event, 'If-None-Match'), query_params.get('since'))
     print(f"API response completed in {time.time() - start_time:.2f}s")
     return result
 
-def get_cached_token():
-    """DynamoDB에서 캐시된 토큰 가져오기"""
+def get_header(event, name):
+    """요청 헤더 조회 (API Gateway 헤더 이름 대소문자 무관)"""
+    name = name.lower()
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+def token_location(place):
+    """지점 토큰 저장 위치 (기본 지점은 기존 행 id=1, 나머지는 지점별 행이라 서로 경합하지 않음)"""
+    if place.default:
+        return dynamodb.Table(LEGACY_TOKEN_TABLE), {'id': 1}  # 숫자 키 사용
+    return dynamodb.Table(TOKEN_TABLE), {'place': place.key}
+
+def get_cached_token(min_validity=300, place=None):
+    """DynamoDB에서 캐시된 토큰 가져오기 (만료까지 min_validity초 이상 남은 경우만)"""
     start_time = time.time()
     try:
-        table = dynamodb.Table('aipm-backend-prod-stories')
+        table, key = token_location(place or get_place())
         
-        response = table.get_item(Key={'id': 1})  # 숫자 키 사용
+        response = table.get_item(Key=key)
         print(f"DynamoDB query took {time.time() - start_time:.2f}s")
         
         if 'Item' in response:
@@ -77,8 +208,8 @@ def get_cached_token():
             print(f"Current time: {datetime.fromtimestamp(current_time)}")
             print(f"Time until expiry: {expires_at - current_time} seconds")
             
-            # 토큰이 아직 유효한지 확인 (5분 여유)
-            if expires_at > current_time + 300:
+            # 토큰이 아직 유효한지 확인 (기본 5분 여유)
+            if expires_at > current_time + min_validity:
                 print("Using cached token (valid)")
                 return {
                     'access_token': token_data['access_token'],
@@ -94,11 +225,11 @@ def get_cached_token():
         print(f"Error getting cached token: {e}")
     return None
 
-def save_token(token_data):
+def save_token(token_data, place=None):
     """DynamoDB에 토큰 저장"""
     start_time = time.time()
     try:
-        table = dynamodb.Table('aipm-backend-prod-stories')
+        table, key = token_location(place or get_place())
         
         expires_at = int(token_data['access_token_expires_in'])
         current_time = int(datetime.now().timestamp())
@@ -106,43 +237,63 @@ def save_token(token_data):
         print(f"Saving token that expires at: {datetime.fromtimestamp(expires_at)}")
         print(f"Token valid for: {expires_at - current_time} seconds")
         
-        table.put_item(Item={
-            'id': 1,  # 숫자 키 사용
-            'access_token': token_data['access_token'],
-            'p_code': token_data['p_code'],
-            'p_name': token_data['p_name'],
-            'expires_at': expires_at,
-            'updated_at': current_time
-        })
+        table.put_item(Item=dict(
+            key,
+            access_token=token_data['access_token'],
+            p_code=token_data['p_code'],
+            p_name=token_data['p_name'],
+            expires_at=expires_at,
+            updated_at=current_time
+        ))
         print(f"Token saved in {time.time() - start_time:.2f}s")
     except Exception as e:
         print(f"Error saving token: {e}")
 
-def get_new_token():
+def get_token(min_validity=300, place=None):
+    """유효한 토큰 조회 (캐시된 토큰이 없거나 만료 임박이면 새로 발급 후 저장)"""
+    place = place or get_place()
+    cached_token = get_cached_token(min_validity, place)
+    if cached_token:
+        return dict(cached_token, cached=True)
+    
+    # 만료 시점에 동시에 들어온 요청이 각자 로그인하지 않도록 지점별로 한 곳에서만 발급, 나머지는 저장된 토큰 재사용
+    return coalesce(
+        f"login#{place.key}",
+        lambda: issue_token(place),
+        upstream_lease,
+        reuse=lambda item: reuse_token(min_validity, place)
+    )
+
+def reuse_token(min_validity, place):
+    """다른 요청이 방금 발급해 저장한 토큰 (없으면 None → 직접 발급)"""
+    cached_token = get_cached_token(min_validity, place)
+    return dict(cached_token, cached=True) if cached_token else None
+
+def issue_token(place):
+    """새 토큰 발급 후 저장"""
+    login_result = get_new_token(place)
+    save_token(login_result, place)
+    return {
+        'access_token': login_result['access_token'],
+        'p_code': login_result['p_code'],
+        'p_name': login_result['p_name'],
+        'expires_at': int(login_result['access_token_expires_in']),
+        'cached': False
+    }
+
+def get_new_token(place=None):
     """새 토큰 발급"""
     start_time = time.time()
-    print("Getting new token from Comepass API")
-    
-    # 환경변수에서 자격증명 가져오기
-    comepass_id = os.environ.get('COMEPASS_ID')
-    comepass_pwd = os.environ.get('COMEPASS_PWD')
-    
-    if not comepass_id or not comepass_pwd:
-        raise Exception('COMEPASS_ID 또는 COMEPASS_PWD 환경변수가 설정되지 않았습니다')
+    place = place or get_place()
+    print(f"Getting new token from Comepass API ({place.key})")
     
-    login_url = 'https://api.comepass.kr/login/admin'
-    login_headers = {
-        'Accept': 'application/json, text/plain, */*',
-        'Content-Type': 'application/json',
-        'Origin': 'https://place.comepass.kr',
-        'Referer': 'https://place.comepass.kr/',
-        'X-Dmon-Request-From': 'place_admin_web',
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-    }
+    # 지점 설정(환경변수)에서 자격증명 가져오기
+    if not place.login_id or not place.password:
+        raise Exception(f'{place.key} 지점의 Comepass 자격증명(COMEPASS_ID/COMEPASS_PWD 또는 COMEPASS_PLACES)이 설정되지 않았습니다')
     
-    login_data = {"id": comepass_id, "pwd": comepass_pwd}
-    login_response = http.request('POST', login_url, body=json.dumps(login_data), headers=login_headers)
-    result = json.loads(login_response.data.decode('utf-8'))
+    result = login(place.login_id, place.password)
+    if not place.default and str(result.get('p_code')) != place.key:
+        print(f"Warning: login p_code {result.get('p_code')} does not match place {place.key}")
     print(f"New token obtained in {time.time() - start_time:.2f}s")
     return result
 
@@ -251,6 +402,43 @@ def serve_html():
             }
         }
 
+        // 마지막으로 받은 예약 현황 (같은 날짜를 다시 불러올 때 ETag/버전을 보내 바뀐 부분만 받음)
+        const current = { key: null, etag: null, version: null, data: null, records: null };
+        
+        // 서버(events.py record_key)와 같은 예약 식별자
+        function recordKey(reservation) {
+            for (const field of ['s_idx', 'ord_idx', 'ord_no']) {
+                if (reservation[field]) return field + ':' + reservation[field];
+            }
+            return (reservation.m_nm || '') + '|' + (reservation.sg_name || '') + '|' + (reservation.s_s_time || '');
+        }
+        
+        function indexRecords(list) {
+            const records = new Map();
+            (list || []).forEach(reservation => {
+                const base = recordKey(reservation);
+                let key = base;
+                let count = 1;
+                while (records.has(key)) {
+                    count += 1;
+                    key = base + '#' + count;
+                }
+                records.set(key, reservation);
+            });
+            return records;
+        }
+        
+        function applyChanges(changes) {
+            changes.forEach(change => {
+                if (change.previous_key) current.records.delete(change.previous_key);
+                if (change.record) {
+                    current.records.set(change.key, change.record);
+                } else {
+                    current.records.delete(change.key);
+                }
+            });
+        }
+
         async function loadReservations() {
             const reservationDiv = document.getElementById('reservationDisplay');
             const selectedDate = document.getElementById('dateSelector').value;
@@ -258,16 +446,28 @@ def serve_html():
             try {
                 // Safari 호환성을 위해 URL 구성 방식 변경
                 const baseUrl = window.location.origin + window.location.pathname;
-                const url = baseUrl + '?date=' + encodeURIComponent(selectedDate) + '&_t=' + Date.now();
+                // 지점 선택은 페이지 주소의 ?place= 값을 그대로 전달
+                const place = new URLSearchParams(window.location.search).get('place');
+                const key = selectedDate + '|' + (place || '');
+                const sameDay = current.key === key && current.records !== null;
+                let url = baseUrl + '?date=' + encodeURIComponent(selectedDate) + (place ? '&place=' + encodeURIComponent(place) : '') + '&_t=' + Date.now();
+                
+                const headers = { 
+                    'Accept': 'application/json',
+                    'Cache-Control': 'no-cache'
+                };
+                if (sameDay && current.etag) headers['If-None-Match'] = current.etag;
+                if (sameDay && current.version !== null) url += '&since=' + current.version;
                 
                 const response = await fetch(url, {
                     method: 'GET',
-                    headers: { 
-                        'Accept': 'application/json',
-                        'Cache-Control': 'no-cache'
-                    }
+                    headers: headers
                 });
                 
+                // 바뀐 내용 없음
+                if (response.status === 304) {
+                    return;
+                }
                 if (!response.ok) {
                     throw new Error('HTTP ' + response.status);
                 }
@@ -275,7 +475,19 @@ def serve_html():
                 const data = await response.json();
                 
                 if (response.ok && !data.error) {
-                    displaySchedule(data);
+                    if (data.delta && sameDay) {
+                        applyChanges(data.changes);
+                    } else {
+                        current.data = data;
+                        current.records = indexRecords(data.reservations && data.reservations.list);
+                    }
+                    const version = response.headers.get('X-Content-Version');
+                    current.key = key;
+                    current.etag = response.headers.get('ETag');
+                    current.version = version === null ? null : parseInt(version, 10);
+                    displaySchedule(Object.assign({}, current.data, {
+                        reservations: Object.assign({}, current.data.reservations, { list: Array.from(current.records.values()) })
+                    }), sameDay);
                 } else {
                     throw new Error(data.error || '예약 현황 조회 실패');
                 }
@@ -284,15 +496,13 @@ def serve_html():
             }
         }
 
-        function displaySchedule(data) {
+        function displaySchedule(data, keepScroll) {
             const reservationDiv = document.getElementById('reservationDisplay');
+            const previousBody = document.querySelector('.schedule-table tbody');
+            const previousScroll = previousBody ? previousBody.scrollTop : 0;
             
-            // 룸 이름 매핑
-            const roomNames = {
-                '1번 스터디룸': '2인 오피스룸',
-                '2번 스터디룸': '4인 스터디룸', 
-                '3번 스터디룸': '2인 스터디룸'
-            };
+            // 룸 이름 매핑 (서버 설정에서 주입)
+            const roomNames = __ROOM_NAMES__;
             
             // 시간대별 예약 데이터 구성
             const timeSlots = [];
@@ -420,84 +630,365 @@ def serve_html():
             
             reservationDiv.innerHTML = html;
             
-            // Scroll to 09:00 row
+            // Scroll to 09:00 row (같은 날짜 갱신이면 보던 위치 유지)
             setTimeout(() => {
                 const tbody = document.querySelector('.schedule-table tbody');
                 if (tbody) {
                     const rowHeight = tbody.querySelector('tr')?.offsetHeight || 30;
-                    tbody.scrollTop = 9 * rowHeight;
+                    tbody.scrollTop = keepScroll ? previousScroll : 9 * rowHeight;
                 }
-            }, 100);
+            }, keepScroll ? 0 : 100);
+        }
+        
+        function sleep(ms) {
+            return new Promise(resolve => setTimeout(resolve, ms));
+        }
+        
+        // 실시간 갱신: 오늘 이후 날짜를 보는 동안 서버가 변경을 감지할 때까지 기다렸다가(long-poll) 변경분만 다시 불러옴
+        async function watchReservations() {
+            let watchKey = null;
+            let watchEtag = null;
+            let retryDelay = 1000;
+            while (true) {
+                const selectedDate = document.getElementById('dateSelector').value;
+                const today = formatDate(getTodayInSeoul());
+                if (document.hidden || !current.key || selectedDate < today) {
+                    await sleep(5000);
+                    continue;
+                }
+                if (watchKey !== current.key) {
+                    watchKey = current.key;
+                    watchEtag = current.etag;
+                }
+                
+                try {
+                    const place = new URLSearchParams(window.location.search).get('place');
+                    const url = '/prod/api/watch?date=' + encodeURIComponent(selectedDate) + (place ? '&place=' + encodeURIComponent(place) : '') + '&_t=' + Date.now();
+                    const response = await fetch(url, {
+                        method: 'GET',
+                        headers: watchEtag ? { 'Accept': 'application/json', 'If-None-Match': watchEtag } : { 'Accept': 'application/json' }
+                    });
+                    if (!response.ok) {
+                        throw new Error('HTTP ' + response.status);
+                    }
+                    const data = await response.json();
+                    retryDelay = 1000;
+                    // 기다리는 동안 다른 날짜로 바뀌었으면 이번 결과는 버림
+                    if (watchKey !== current.key) continue;
+                    if (data.changed) {
+                        // 다음 대기는 서버 저장본 기준 (직접 조회 결과와 해시가 달라도 반복 호출하지 않음)
+                        watchEtag = data.etag;
+                        await loadReservations();
+                    }
+                } catch (error) {
+                    // 오류가 계속되면 재시도 간격을 늘림 (최대 1분)
+                    console.error('Error watching reservations:', error);
+                    await sleep(retryDelay);
+                    retryDelay = Math.min(retryDelay * 2, 60000);
+                }
+            }
+        }
+        
+        function formatDate(date) {
+            const year = date.getFullYear();
+            const month = String(date.getMonth() + 1).padStart(2, '0');
+            const day = String(date.getDate()).padStart(2, '0');
+            return year + '-' + month + '-' + day;
         }
         
         window.onload = function() {
             loadReservations();
+            watchReservations();
         };
     </script>
 </body>
 </html>'''
     
+    room_names = json.dumps(get_config(dynamodb).room_mapping, ensure_ascii=False)
+    html_content = html_content.replace('__ROOM_NAMES__', room_names)
+    
     return {
         'statusCode': 200,
         'headers': {'Content-Type': 'text/html; charset=utf-8'},
         'body': html_content
     }
 
-def get_reservations(date):
+def get_cached_day(date, place=None):
+    """Proxy DB에 저장된 날짜 데이터 조회 (upstream 장애 시 대체 응답용)"""
+    try:
+        table = dynamodb.Table('studyroom-proxy-db')
+        response = table.get_item(Key={'date': (place or get_place()).data_key(date)}, ProjectionExpression='full_response, cached_at, payload')
+        item = response.get('Item')
+        if item and 'full_response' in item:
+            return item
+    except Exception as e:
+        print(f"Error reading cached day {date}: {e}")
+    return None
+
+def serve_cached_reservations(date, error, token, start_time, place=None):
+    """upstream 실패 시 Proxy DB의 마지막 수집 데이터로 응답"""
+    cached_day = get_cached_day(date, place)
+    if cached_day is None:
+        return None
+    print(f"Serving cached data for {date} (upstream error: {error})")
+    stale = {
+        'stale': True,
+        'cached_at': cached_day.get('cached_at'),
+        'upstream_error': str(error),
+        'circuit': get_metrics()['circuit'],
+        'processing_time': f"{time.time() - start_time:.2f}s"
+    }
+    if 'payload' in cached_day:
+        # 미리 만든 응답 본문이 있으면 예약 원본을 다시 직렬화하지 않고 대체 응답 필드만 덧붙임
+        body = extend_object(cached_day['payload'], stale)
+    else:
+        body = dumps(dict({
+            'place_name': token['p_name'] if token else None,
+            'date': date,
+            'reservations': cached_day['full_response']
+        }, **stale))
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': body
+    }
+
+def build_reservations_payload(date, token, studyroom_data):
+    """예약 현황 화면(그리드)용 응답 본문"""
+    return {
+        'place_name': token['p_name'],
+        'date': date,
+        'reservations': studyroom_data,
+        'token_expires': token['expires_at'],
+        'token_cached': token['cached']
+    }
+
+def get_stored_version(date, place=None):
+    """수집 작업이 저장한 응답 본문/내용 해시/버전 조회 → (본문(신선한 경우만), 저장 항목)"""
+    try:
+        table = dynamodb.Table('studyroom-proxy-db')
+        response = table.get_item(
+            Key={'date': (place or get_place()).data_key(date)},
+            ProjectionExpression='payload, payload_at, content_hash, event_seq'
+        )
+        item = response.get('Item') or {}
+        if 'payload' in item:
+            age = int(datetime.now().timestamp()) - int(item.get('payload_at', 0))
+            if age <= PRERENDER_MAX_AGE:
+                print(f"Serving prerendered payload for {date} (age {age}s)")
+                return item['payload'], item
+        return None, item
+    except Exception as e:
+        print(f"Error reading prerendered payload for {date}: {e}")
+    return None, {}
+
+def version_headers(etag, version):
+    """ETag/버전 응답 헤더"""
+    headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Expose-Headers': 'ETag, X-Content-Version',
+        'Cache-Control': 'no-cache'
+    }
+    if etag:
+        headers['ETag'] = etag
+    if version is not None:
+        headers['X-Content-Version'] = str(version)
+    return headers
+
+def valid_date(date_str):
+    """'YYYY-MM-DD' 형식의 실제 날짜인지"""
+    try:
+        return len(date_str) == 10 and datetime.strptime(date_str, '%Y-%m-%d') is not None
+    except (TypeError, ValueError):
+        return False
+
+def bad_request(message):
+    return {
+        'statusCode': 400,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps({'error': message})
+    }
+
+def etag_matches(etag, if_none_match):
+    """If-None-Match 헤더(쉼표 목록, 약한 비교 W/, *)에 etag가 포함되는지"""
+    if not etag or not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+
+def conditional_response(date, place, etag, version, if_none_match, since, body):
+    """If-None-Match가 같으면 304, since가 있으면 그 버전 이후 변경분, 아니면 전체 본문"""
+    headers = version_headers(etag, version)
+    if etag_matches(etag, if_none_match):
+        return {'statusCode': 304, 'headers': headers, 'body': ''}
+    
+    if since is not None and version is not None and since.isdigit() and int(since) <= version:
+        events = read_events(dynamodb, place.data_key(date), int(since), MAX_DELTA_EVENTS + 1)
+        if len(events) <= MAX_DELTA_EVENTS and all(int(event['seq']) <= version for event in events):
+            if not events:
+                return {'statusCode': 304, 'headers': headers, 'body': ''}
+            return {
+                'statusCode': 200,
+                'headers': headers,
+                'body': dumps({
+                    'date': date,
+                    'delta': True,
+                    'since': int(since),
+                    'version': version,
+                    'changes': [
+                        {'type': event['type'], 'key': event['key'], 'previous_key': event.get('previous_key'), 'record': event.get('record')}
+                        for event in events
+                    ]
+                })
+            }
+    return {'statusCode': 200, 'headers': headers, 'body': body() if callable(body) else body}
+
+def fetch_day_coalesced(date, token, place):
+    """같은 지점/날짜 예약 조회는 한 번에 한 곳에서만 upstream 호출, 동시에 들어온 요청은 그 결과를 재사용"""
+    return coalesce(
+        f"fetch#{place.key}#{date}",
+        lambda: fetch_studyroom(date, token['access_token'], token['p_code']),
+        upstream_lease,
+        share=dumps,
+        reuse=reuse_fetch
+    )
+
+def reuse_fetch(item):
+    """해제된 조회 임대 항목의 결과 (실패였으면 같은 오류로 처리해 캐시 응답으로 대체)"""
+    if 'error' in item:
+        status = item.get('error_status')
+        raise ComepassError(f"{item['error']} (동시 요청에서 발생)", int(status) if status is not None else None)
+    if 'result' in item:
+        return loads(item['result'])
+    return None
+
+def refresh_day_if_stale(date, place, cached_at):
+    """저장본이 재수집 간격보다 오래되었으면 한 요청만 다시 수집 (임대를 간격만큼 유지해 지점/날짜당 간격마다 1회로 제한)"""
+    if cached_at and (datetime.now() - datetime.fromisoformat(cached_at)).total_seconds() < WATCH_REFRESH_INTERVAL:
+        return False
+    try:
+        if upstream_lease.acquire(f"refresh#{place.key}#{date}", WATCH_REFRESH_INTERVAL) is None:
+            return False
+    except Exception as e:
+        print(f"Refresh lease error for {date}: {e}")
+        return False
+    result = collect_dates([date], place=place, prerender=prerender_dates(datetime.now(KST)))[date]
+    print(f"Refreshing {place.key} {date} for watchers: {result}")
+    return True
+
+def watch_reservations(date, etag=None, wait=None, place_key=None):
+    """예약 현황 변경 대기 (long-poll): 수집 작업이 저장한 내용 해시가 etag(If-None-Match)와 달라지면 바로 응답, 아니면 최대 wait초 대기
+
+    클라이언트마다 upstream을 호출하지 않고 저장본만 확인하며, 오늘 이후 날짜는 저장본이 오래되면 한 요청만 재수집
+    (재수집 시간도 wait에 포함, 남은 시간이 WATCH_REFRESH_BUDGET보다 적으면 재수집하지 않음)
+    """
     start_time = time.time()
+    if not valid_date(date):
+        return bad_request(f"날짜 형식 오류: {date} (YYYY-MM-DD)")
+    try:
+        place = get_place(place_key)
+    except ValueError as e:
+        return bad_request(str(e))
     
     try:
-        # 캐시된 토큰 확인
-        cached_token = get_cached_token()
-        
-        if cached_token:
-            # 캐시된 토큰 사용
-            access_token = cached_token['access_token']
-            p_code = cached_token['p_code']
-            p_name = cached_token['p_name']
-            token_expires = cached_token['expires_at']
-        else:
-            # 새 토큰 발급
-            login_result = get_new_token()
-            access_token = login_result['access_token']
-            p_code = login_result['p_code']
-            p_name = login_result['p_name']
-            token_expires = login_result['access_token_expires_in']
-            
-            # 토큰 저장
-            save_token(login_result)
-        
-        # 예약 현황 조회
-        api_start = time.time()
-        studyroom_url = f'https://api.comepass.kr/place/studyroom?date={date}'
-        
-        studyroom_headers = {
-            'Accept': 'application/json, text/plain, */*',
-            'Authorization': f'Bearer {access_token}',
-            'Origin': 'https://place.comepass.kr',
-            'Referer': 'https://place.comepass.kr/',
-            'X-Dmon-Place-Code': p_code,
-            'X-Dmon-Request-From': 'place_admin_web',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
+        wait = min(max(int(wait or WATCH_MAX_WAIT), 0), WATCH_MAX_WAIT)
+        live = date >= datetime.now(KST).strftime('%Y-%m-%d')
+        table = dynamodb.Table('studyroom-proxy-db')
         
-        studyroom_response = http.request('GET', studyroom_url, headers=studyroom_headers)
-        studyroom_data = json.loads(studyroom_response.data.decode('utf-8'))
-        print(f"Studyroom API call took {time.time() - api_start:.2f}s")
+        delay = WATCH_POLL_MIN
+        while True:
+            item = table.get_item(
+                Key={'date': place.data_key(date)},
+                ProjectionExpression='content_hash, event_seq, cached_at'
+            ).get('Item') or {}
+            current = f'"{item["content_hash"]}"' if 'content_hash' in item else None
+            if current and not etag_matches(current, etag):
+                break
+            
+            remaining = wait - (time.time() - start_time)
+            if live and remaining >= WATCH_REFRESH_BUDGET and refresh_day_if_stale(date, place, item.get('cached_at')):
+                # 방금 재수집했으면 바로 다시 확인
+                continue
+            
+            # 확인 간격을 점점 늘려 대기 중인 화면이 많아도 DB 조회 수를 제한
+            if time.time() - start_time + delay > wait:
+                break
+            time.sleep(delay)
+            delay = min(delay * 2, WATCH_POLL_MAX)
         
+        changed = current is not None and not etag_matches(current, etag)
         return {
             'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'headers': version_headers(current, int(item['event_seq']) if 'event_seq' in item else None),
             'body': json.dumps({
-                'place_name': p_name,
                 'date': date,
-                'reservations': studyroom_data,
-                'token_expires': token_expires,
-                'token_cached': cached_token is not None,
-                'processing_time': f"{time.time() - start_time:.2f}s"
+                'changed': changed,
+                'etag': current,
+                'version': int(item['event_seq']) if 'event_seq' in item else None,
+                'cached_at': item.get('cached_at'),
+                'waited': round(time.time() - start_time, 2)
             })
         }
+    except Exception as e:
+        print(f"Error in watch_reservations: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': str(e)})
+        }
+
+def get_reservations(date, place_key=None, if_none_match=None, since=None):
+    """예약 현황 조회 (내용 해시 ETag → 304, since=버전이면 이벤트 로그의 변경분만 응답)"""
+    start_time = time.time()
+    token = None
+    
+    if not valid_date(date):
+        return bad_request(f"날짜 형식 오류: {date} (YYYY-MM-DD)")
+    try:
+        place = get_place(place_key)
+    except ValueError as e:
+        return bad_request(str(e))
+    
+    # 미리 만들어 둔 응답이 있으면 로그인/upstream 호출 없이 반환
+    payload, stored = get_stored_version(date, place)
+    stored_hash = stored.get('content_hash')
+    stored_version = int(stored['event_seq']) if 'event_seq' in stored else None
+    if payload:
+        etag = f'"{stored_hash}"' if stored_hash else None
+        return conditional_response(date, place, etag, stored_version, if_none_match, since, payload)
+    
+    try:
+        # 캐시된 토큰 확인 (없으면 새 토큰 발급)
+        token = get_token(place=place)
+        
+        # 예약 현황 조회
+        api_start = time.time()
+        studyroom_data = fetch_day_coalesced(date, token, place)
+        print(f"Studyroom API call took {time.time() - api_start:.2f}s")
+        
+        # 직접 조회한 내용이 저장본과 같을 때만 저장본 버전(변경분 기준)을 사용
+        live_hash = content_hash((studyroom_data or {}).get('list'))
+        version = stored_version if live_hash == stored_hash else None
+        return conditional_response(
+            date, place, f'"{live_hash}"', version, if_none_match, since,
+            lambda: dumps(dict(
+                build_reservations_payload(date, token, studyroom_data),
+                processing_time=f"{time.time() - start_time:.2f}s"
+            ))
+        )
         
+    except ComepassError as e:
+        print(f"Upstream error in get_reservations: {e}")
+        fallback = serve_cached_reservations(date, e, token, start_time, place)
+        if fallback:
+            return fallback
+        return {
+            'statusCode': 503 if isinstance(e, CircuitOpenError) else 502,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': str(e), 'processing_time': f"{time.time() - start_time:.2f}s"})
+        }
+    
     except Exception as e:
         print(f"Error in get_reservations: {e}")
         return {
@@ -545,6 +1036,7 @@ def serve_trends_page():
         </div>
         
         <div class="controls">
+            <button id="dailyBtn" onclick="setTrendsType('daily')">일별</button>
             <button id="weeklyBtn" onclick="setTrendsType('weekly')" class="active">주별</button>
             <button id="monthlyBtn" onclick="setTrendsType('monthly')">월별</button>
         </div>
@@ -588,12 +1080,21 @@ def serve_trends_page():
         let reservationsChart = null;
         let hoursChart = null;
         let currentType = 'weekly';
+        // 기간별로 받아 둔 일별/주별/월별 추이 (탭 전환 시 재조회 없음, 페이지가 도착할 때마다 병합)
+        let trendsData = null;
+        // 기간을 바꾸면 이전 기간의 남은 페이지 응답은 무시
+        let trendsRequest = 0;
         
         function setTrendsType(type) {
             currentType = type;
-            document.getElementById('weeklyBtn').classList.toggle('active', type === 'weekly');
-            document.getElementById('monthlyBtn').classList.toggle('active', type === 'monthly');
-            loadTrends();
+            ['daily', 'weekly', 'monthly'].forEach(name => {
+                document.getElementById(name + 'Btn').classList.toggle('active', type === name);
+            });
+            if (trendsData) {
+                displayTrends(trendsData[type]);
+            } else {
+                loadTrends();
+            }
         }
         
         function setDefaultPeriod() {
@@ -633,14 +1134,35 @@ def serve_trends_page():
             document.getElementById('reservations-loading').style.display = 'block';
             document.getElementById('hours-loading').style.display = 'block';
             
-            // 기존 차트 제거
-            if (revenueChart) revenueChart.destroy();
-            if (reservationsChart) reservationsChart.destroy();
-            if (hoursChart) hoursChart.destroy();
-            
-            fetch(`/prod/api/trends?start=${startDate}&end=${endDate}&type=${currentType}`)
+            trendsData = null;
+            loadTrendsPage(startDate, endDate, null, ++trendsRequest);
+        }
+        
+        function loadTrendsPage(startDate, endDate, cursor, request) {
+            // 월 단위 구간 페이지를 받는 대로 병합해 그리고, next_cursor가 있으면 이어서 요청
+            const cursorParam = cursor ? `&cursor=${cursor}` : '';
+            fetch(`/prod/api/trends?start=${startDate}&end=${endDate}&types=daily,weekly,monthly&paged=1${cursorParam}`)
                 .then(response => response.json())
-                .then(data => displayTrends(data))
+                .then(data => {
+                    if (request !== trendsRequest) return;
+                    if (data.error) throw new Error(data.error);
+                    const first = trendsData === null;
+                    if (first) {
+                        trendsData = {};
+                        ['daily', 'weekly', 'monthly'].forEach(type => {
+                            trendsData[type] = {labels: [], reservations: [], hours: [], revenue: []};
+                        });
+                    }
+                    data.segments.forEach(segment => mergeTrends(segment.trends));
+                    if (first) {
+                        displayTrends(trendsData[currentType]);
+                    } else {
+                        updateTrends(trendsData[currentType]);
+                    }
+                    if (data.next_cursor) {
+                        loadTrendsPage(startDate, endDate, data.next_cursor, request);
+                    }
+                })
                 .catch(error => {
                     console.error('Error:', error);
                     document.getElementById('revenue-loading').innerHTML = '<p>데이터 로드 중 오류가 발생했습니다.</p>';
@@ -649,12 +1171,37 @@ def serve_trends_page():
                 });
         }
         
+        function mergeTrends(trends) {
+            // 구간은 날짜 순서로 도착하며, 주/월은 마지막 날짜가 속한 구간에 통째로 오므로 이어 붙이기만 함
+            Object.keys(trends).forEach(type => {
+                const merged = trendsData[type];
+                const part = trends[type];
+                ['labels', 'reservations', 'hours', 'revenue'].forEach(name => {
+                    merged[name].push(...part[name]);
+                });
+            });
+        }
+        
+        function updateTrends(data) {
+            // 이미 그린 차트에 이어서 받은 구간을 반영 (다시 만들지 않음)
+            [[revenueChart, 'revenue'], [reservationsChart, 'reservations'], [hoursChart, 'hours']].forEach(([chart, name]) => {
+                chart.data.labels = data.labels.slice();
+                chart.data.datasets[0].data = data[name].slice();
+                chart.update('none');
+            });
+        }
+        
         function displayTrends(data) {
             // 로딩 숨기기
             document.getElementById('revenue-loading').style.display = 'none';
             document.getElementById('reservations-loading').style.display = 'none';
             document.getElementById('hours-loading').style.display = 'none';
             
+            // 기존 차트 제거
+            if (revenueChart) revenueChart.destroy();
+            if (reservationsChart) reservationsChart.destroy();
+            if (hoursChart) hoursChart.destroy();
+            
             const chartOptions = {
                 responsive: true,
                 maintainAspectRatio: true,
@@ -676,10 +1223,10 @@ def serve_trends_page():
             revenueChart = new Chart(revenueCtx, {
                 type: 'bar',
                 data: {
-                    labels: data.labels || [],
+                    labels: (data.labels || []).slice(),
                     datasets: [{
                         label: '매출 (원)',
-                        data: data.revenue || [],
+                        data: (data.revenue || []).slice(),
                         backgroundColor: 'rgba(75, 192, 192, 0.8)',
                         borderColor: 'rgb(75, 192, 192)',
                         borderWidth: 1
@@ -693,10 +1240,10 @@ def serve_trends_page():
             reservationsChart = new Chart(reservationsCtx, {
                 type: 'bar',
                 data: {
-                    labels: data.labels || [],
+                    labels: (data.labels || []).slice(),
                     datasets: [{
                         label: '예약 건수',
-                        data: data.reservations || [],
+                        data: (data.reservations || []).slice(),
                         backgroundColor: 'rgba(255, 99, 132, 0.8)',
                         borderColor: 'rgb(255, 99, 132)',
                         borderWidth: 1
@@ -710,10 +1257,10 @@ def serve_trends_page():
             hoursChart = new Chart(hoursCtx, {
                 type: 'bar',
                 data: {
-                    labels: data.labels || [],
+                    labels: (data.labels || []).slice(),
                     datasets: [{
                         label: '사용 시간 (시간)',
-                        data: data.hours || [],
+                        data: (data.hours || []).slice(),
                         backgroundColor: 'rgba(54, 162, 235, 0.8)',
                         borderColor: 'rgb(54, 162, 235)',
                         borderWidth: 1
@@ -736,163 +1283,179 @@ def serve_trends_page():
         'body': html
     }
 
-def get_trends_data(start_date, end_date, analysis_type='weekly'):
-    """추이분석 데이터 조회 (배치 쿼리)"""
+def trend_groups(labels, ranges, series, offset, yoy=False, breakdowns=()):
+    """그룹 목록의 추이 (일별 누적합 배열의 그룹 구간 합, 날짜 재조회/재집계 없음)
+
+    ranges: 그룹별 [시작, 끝) 달력 위치, offset: 달력 위치 → 누적합 배열 위치 보정
+    """
+    current = grouped_series(series, ranges, offset)
+    result = {
+        'labels': labels,
+        'reservations': current['reservations'],
+        'hours': [round(h, 1) for h in current['hours']],
+        'revenue': current['revenue']
+    }
+    if yoy:
+        previous = grouped_series(series, ranges, offset, YOY_OFFSET_DAYS)
+        result['yoy'] = {
+            'offset_days': YOY_OFFSET_DAYS,
+            'reservations': previous['reservations'],
+            'hours': [round(h, 1) for h in previous['hours']],
+            'revenue': previous['revenue'],
+            'change': {name: [change_rate(c, p) for c, p in zip(current[name], previous[name])] for name in series}
+        }
+    if breakdowns:
+        result['breakdown'] = {breakdown.dimension: breakdown.grouped(ranges, offset) for breakdown in breakdowns}
+    return result
+
+def compute_trends(calendar, segments, analysis_type, window, yoy, place, config, granularities=None, dimensions=(), budget=None):
+    """조회 기간 달력의 위치 구간(segments)별 추이를 한 번의 순차 조회로 계산 → [(시작, 끝, 결과)]
+
+    집계 단위 그룹은 항상 조회 기간 전체 달력 기준이며 마지막 날짜가 속한 구간에 통째로 포함 (구간 경계에서 나뉘지 않음)
+    이동 합계/전년 비교 과거 구간과 앞 구간에 걸친 그룹의 날짜는 첫 구간 조회에서 한 번만 읽고 이후 구간은 자기 날짜만 읽음
+    budget: 구간별 조회 시간 예산 (초, 다음 구간까지 예산 안에 끝나지 않을 것 같으면 앞 구간까지만 계산)
+    """
+    started = time.time()
+    names = granularities or [analysis_type]
+    groupings = {}
+    for name in names:
+        labels, group_index = calendar.grouping(name)
+        groupings[name] = (labels, group_ranges(group_index))
+    
+    # 첫 구간에 끝나는 그룹의 시작 위치까지 포함해 이동 합계/전년 비교 과거 구간을 더한 달력
+    first = segments[0][0]
+    read_start = min([first] + [next(start for start, end in ranges if end > first) for _, ranges in groupings.values()])
+    lookback = max(window - 1, 0)
+    history_start = calendar.start + timedelta(days=read_start - lookback - (YOY_OFFSET_DAYS if yoy else 0))
+    history = get_calendar(history_start.isoformat(), calendar.dates[segments[-1][1] - 1])
+    offset = (calendar.start - history_start).days
+    
+    # 구간 순서대로 실제로 필요한 날짜만 배치 조회 (구간 + 이동 구간, 전년 동기 + 이동 구간), 예산을 넘기면 중단
+    done = []
+    requested = {'days': 0}
+    def day_items():
+        seen = set()
+        read_from = read_start + offset - lookback
+        for index, (segment_start, segment_end) in enumerate(segments):
+            if budget is not None and done:
+                elapsed = time.time() - started
+                if elapsed + elapsed / len(done) > budget:
+                    return
+            read_to = segment_end + offset
+            needed = history.dates[read_from:read_to]
+            if yoy:
+                needed = history.dates[read_from - YOY_OFFSET_DAYS:read_to - YOY_OFFSET_DAYS] + needed
+            needed = [date_str for date_str in dict.fromkeys(needed) if date_str not in seen]
+            seen.update(needed)
+            requested['days'] += len(needed)
+            yield from ((date_str, item.get('reservations')) for date_str, item in iter_day_items(needed, 'reservations', place))
+            read_from = read_to
+            done.append(segments[index])
+    
+    # 배치(25일) 단위로 받아 바로 일별 합계에 접어 넣고 예약 목록은 버림 (차원별 세부 지표도 같은 순회에서 채움)
+    breakdowns = [DimensionSeries(name, len(history.dates), config.room_mapping) for name in dimensions]
+    series, fetched = fold_days(day_items(), history, config.excluded_users, breakdowns)
+    print(f"Trends batch items: {fetched} / {requested['days']} ({len(done)}/{len(segments)} segments)")
+    
+    results = []
+    for segment_start, segment_end in done:
+        result = {}
+        # 일별 이동 합계/평균 (window일)
+        if window:
+            dates = calendar.dates[segment_start:segment_end]
+            rolling = rolling_series(series, segment_start + offset, segment_end + offset, window)
+            result['rolling'] = {
+                'window': window,
+                'dates': dates,
+                'reservations': rolling['reservations'],
+                'hours': [round(h, 1) for h in rolling['hours']],
+                'revenue': rolling['revenue'],
+                'average': {name: [round(v / window, 2) for v in values] for name, values in rolling.items()}
+            }
+            if yoy:
+                previous = rolling_series(series, segment_start + offset, segment_end + offset, window, YOY_OFFSET_DAYS)
+                result['rolling']['previous'] = {
+                    'reservations': previous['reservations'],
+                    'hours': [round(h, 1) for h in previous['hours']],
+                    'revenue': previous['revenue']
+                }
+                result['rolling']['change'] = {
+                    name: [change_rate(c, p) for c, p in zip(rolling[name], previous[name])] for name in series
+                }
+        
+        # 집계 단위별 결과 (마지막 날짜가 이 구간에 있는 그룹만, 일별 누적합 배열 하나로 모든 단위를 계산)
+        trends = {}
+        for name, (labels, ranges) in groupings.items():
+            selected = [i for i, (start, end) in enumerate(ranges) if segment_start < end <= segment_end]
+            trends[name] = trend_groups(
+                [labels[i] for i in selected], [ranges[i] for i in selected], series, offset, yoy, breakdowns
+            )
+        if granularities:
+            result.update(types=granularities, trends=trends)
+        else:
+            result.update(trends[analysis_type], type=analysis_type)
+        results.append((segment_start, segment_end, result))
+    return results
+
+def trends_page(calendar, cursor, compute):
+    """cursor(다음 시작 날짜, 없으면 시작일)부터 월 단위 구간을 시간 예산 안에서 계산 → (구간 목록, 다음 cursor 또는 None)"""
+    first = calendar.index_of(cursor) if cursor else 0
+    if first is None:
+        raise ValueError(f"cursor는 {calendar.dates[0]} ~ {calendar.dates[-1]} 범위의 날짜여야 합니다")
+    segments = [(max(start, first), end) for start, end in group_ranges(calendar.month_index) if end > first]
+    computed = compute(segments[:TRENDS_PAGE_MAX_MONTHS], TRENDS_PAGE_BUDGET)
+    
+    pages = [
+        dict(result, start=calendar.dates[start], end=calendar.dates[end - 1])
+        for start, end, result in computed
+    ]
+    last = computed[-1][1]
+    return pages, calendar.dates[last] if last < len(calendar) else None
+
+def get_trends_data(start_date, end_date, analysis_type='weekly', window=None, compare=None, place_key=None, types=None, group_by=None,
+                    cursor=None, paged=False):
+    """추이분석 데이터 조회 (배치 쿼리, 누적합 기반 이동 합계/전년 동기 비교)
+
+    types: 'daily,weekly,monthly'처럼 여러 집계 단위를 주면 기간을 한 번만 조회/집계해 단위별 결과를 함께 응답
+    group_by: 'room', 'hour', 'weekday' (쉼표로 여러 개) 차원별 세부 추이를 같은 조회/순회에서 함께 계산
+    paged/cursor: 월 단위 구간(segments) 페이지로 응답하고 남은 기간은 next_cursor로 이어서 요청 (TRENDS_MAX_DAYS를 넘는 기간은 항상 페이지 응답)
+        주/월 그룹은 마지막 날짜가 속한 구간에 통째로 들어가므로 구간을 순서대로 이어 붙이면 전체 응답과 같음
+    """
+    start_time = time.time()
     try:
-        # 날짜 범위 생성
-        dates = []
-        current = datetime.strptime(start_date, '%Y-%m-%d')
-        end = datetime.strptime(end_date, '%Y-%m-%d')
+        place = get_place(place_key)
+        config = get_config(dynamodb)
+        granularities = list(dict.fromkeys(name.strip() for name in types.split(',') if name.strip())) if types else None
+        if granularities is not None and (not granularities or any(name not in TREND_TYPES for name in granularities)):
+            raise ValueError(f"types는 {', '.join(TREND_TYPES)} 중에서 선택해야 합니다")
+        window = int(window) if window else 0
+        if window < 0 or window > MAX_TREND_WINDOW:
+            raise ValueError(f"window는 0~{MAX_TREND_WINDOW}일 범위여야 합니다")
+        yoy = compare == 'yoy'
+        dimensions = list(dict.fromkeys(name.strip() for name in (group_by or '').split(',') if name.strip()))
         
-        while current <= end:
-            dates.append(current.strftime('%Y-%m-%d'))
-            current += timedelta(days=1)
+        calendar = get_calendar(start_date, end_date)
         
-        # 배치 쿼리로 데이터 수집
-        daily_data = {}
+        def compute(segments, budget=None):
+            return compute_trends(calendar, segments, analysis_type, window, yoy, place, config, granularities, dimensions, budget)
         
-        # 25개씩 배치 처리
-        for i in range(0, len(dates), 25):
-            batch_dates = dates[i:i+25]
-            
-            # 배치 요청 구성
-            request_items = {
-                'studyroom-proxy-db': {
-                    'Keys': [{'date': date} for date in batch_dates],
-                    'ProjectionExpression': '#d, reservations',
-                    'ExpressionAttributeNames': {'#d': 'date'}
-                }
+        if not (paged or cursor) and len(calendar) <= TRENDS_MAX_DAYS:
+            body = dict(compute([(0, len(calendar))])[0][2], period=f"{start_date} ~ {end_date}")
+        else:
+            segments, next_cursor = trends_page(calendar, cursor, compute)
+            print(f"Trends page {segments[0]['start']} ~ {segments[-1]['end']} in {time.time() - start_time:.2f}s, next: {next_cursor}")
+            body = {
+                'period': f"{start_date} ~ {end_date}",
+                'paged': True,
+                'segments': segments,
+                'next_cursor': next_cursor,
+                'processing_time': f"{time.time() - start_time:.2f}s"
             }
-            
-            try:
-                response = dynamodb.batch_get_item(RequestItems=request_items)
-                
-                # 응답 처리 (Python 객체 형식)
-                if 'Responses' in response and 'studyroom-proxy-db' in response['Responses']:
-                    print(f"Batch response items: {len(response['Responses']['studyroom-proxy-db'])}")
-                    for item in response['Responses']['studyroom-proxy-db']:
-                        date = item['date']  # Python 문자열
-                        print(f"Processing date: {date}")
-                        reservations = 0
-                        hours = 0
-                        revenue = 0
-                        
-                        if 'reservations' in item and item['reservations']:
-                            print(f"Found {len(item['reservations'])} reservations for {date}")
-                            for reservation in item['reservations']:
-                                status = reservation.get('status', '')
-                                user = reservation.get('user', '')
-                                if status in ['USED', 'RESERVED'] and user not in ['최은숙', '배준기']:
-                                    reservations += 1
-                                    hours += float(reservation.get('hours', 0)) / 60
-                                    revenue += int(reservation.get('revenue', 0))
-                        
-                        print(f"Final counts for {date}: {reservations} reservations, {hours} hours, {revenue} revenue")
-                        daily_data[date] = {
-                            'reservations': reservations,
-                            'hours': hours,
-                            'revenue': revenue
-                        }
-                else:
-                    print(f"No batch response data found")
-                
-                # 누락된 날짜 처리
-                for date in batch_dates:
-                    if date not in daily_data:
-                        daily_data[date] = {'reservations': 0, 'hours': 0, 'revenue': 0}
-                        
-            except Exception as e:
-                print(f"Batch query error for dates {batch_dates}: {e}")
-                # 배치 실패시 개별 쿼리로 폴백
-                table = dynamodb.Table('studyroom-proxy-db')
-                for date in batch_dates:
-                    try:
-                        response = table.get_item(Key={'date': date}, ProjectionExpression='reservations')
-                        if 'Item' in response:
-                            item = response['Item']
-                            reservations = 0
-                            hours = 0
-                            revenue = 0
-                            
-                            if 'reservations' in item and item['reservations']:
-                                for reservation in item['reservations']:
-                                    status = reservation.get('status', '')
-                                    user = reservation.get('user', '')
-                                    if status in ['USED', 'RESERVED'] and user not in ['최은숙', '배준기']:
-                                        reservations += 1
-                                        hours += float(reservation.get('hours', 0)) / 60
-                                        revenue += int(reservation.get('revenue', 0))
-                            
-                            daily_data[date] = {'reservations': reservations, 'hours': hours, 'revenue': revenue}
-                        else:
-                            daily_data[date] = {'reservations': 0, 'hours': 0, 'revenue': 0}
-                    except Exception as e2:
-                        print(f"Individual query error for {date}: {e2}")
-                        daily_data[date] = {'reservations': 0, 'hours': 0, 'revenue': 0}
-        
-        # 주별/월별 집계
-        labels = []
-        reservations_data = []
-        hours_data = []
-        revenue_data = []
-        
-        if analysis_type == 'weekly':
-            # 주별 집계
-            week_data = {}
-            for date_str in dates:
-                date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-                year = date_obj.year
-                week = date_obj.isocalendar()[1]
-                week_key = f"{year}-W{week:02d}"
-                
-                if week_key not in week_data:
-                    week_data[week_key] = {'reservations': 0, 'hours': 0, 'revenue': 0}
-                
-                data = daily_data.get(date_str, {'reservations': 0, 'hours': 0, 'revenue': 0})
-                week_data[week_key]['reservations'] += data['reservations']
-                week_data[week_key]['hours'] += data['hours']
-                week_data[week_key]['revenue'] += data['revenue']
-            
-            # 정렬된 주차별 데이터
-            for week_key in sorted(week_data.keys()):
-                labels.append(week_key)
-                reservations_data.append(week_data[week_key]['reservations'])
-                hours_data.append(round(week_data[week_key]['hours'], 1))
-                revenue_data.append(week_data[week_key]['revenue'])
-                
-        elif analysis_type == 'monthly':
-            # 월별 집계
-            month_data = {}
-            for date_str in dates:
-                date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-                month_key = f"{date_obj.year}-{date_obj.month:02d}"
-                
-                if month_key not in month_data:
-                    month_data[month_key] = {'reservations': 0, 'hours': 0, 'revenue': 0}
-                
-                data = daily_data.get(date_str, {'reservations': 0, 'hours': 0, 'revenue': 0})
-                month_data[month_key]['reservations'] += data['reservations']
-                month_data[month_key]['hours'] += data['hours']
-                month_data[month_key]['revenue'] += data['revenue']
-            
-            # 정렬된 월별 데이터
-            for month_key in sorted(month_data.keys()):
-                labels.append(month_key)
-                reservations_data.append(month_data[month_key]['reservations'])
-                hours_data.append(round(month_data[month_key]['hours'], 1))
-                revenue_data.append(month_data[month_key]['revenue'])
         
         return {
             'statusCode': 200,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
-                'labels': labels,
-                'reservations': reservations_data,
-                'hours': hours_data,
-                'revenue': revenue_data,
-                'period': f"{start_date} ~ {end_date}",
-                'type': analysis_type
-            })
+            'body': dumps(body)
         }
         
     except Exception as e:
@@ -902,120 +1465,690 @@ def get_trends_data(start_date, end_date, analysis_type='weekly'):
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
             'body': json.dumps({'error': str(e)})
         }
+
+def get_heatmap_data(start_date, end_date, place_key=None):
+    """요일 × 시간 × 룸 점유 히트맵 조회 (평탄화된 배열)"""
+    try:
+        place = get_place(place_key)
+        result = get_heatmap(dynamodb, start_date, end_date, get_config(dynamodb).room_mapping, place.prefix)
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': dumps(result)
+        }
+    except Exception as e:
+        print(f"Error in get_heatmap_data: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': str(e)})
+        }
+
+def get_export_data(start_date, end_date, fmt='csv', place_key=None):
+    """기간 정규화 예약 내보내기 (응답 크기 제한을 넘으면 X-Next-Start 날짜부터 이어서 요청)"""
+    start_time = time.time()
+    try:
+        if fmt == 'parquet' and not parquet_available():
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': 'parquet 형식은 pyarrow 레이어가 필요합니다 (csv 또는 ndjson 사용)'})
+            }
+        
+        place = get_place(place_key)
+        calendar = get_calendar(start_date, end_date)
+        # base64는 3바이트마다 4바이트 → parquet 원본은 본문 한도의 3/4까지
+        max_bytes = EXPORT_MAX_BYTES // 4 * 3 if fmt == 'parquet' else EXPORT_MAX_BYTES
+        stream = ExportStream(dynamodb, calendar.dates, fmt, get_config(dynamodb).room_mapping, max_bytes, place.prefix)
+        body = b''.join(stream)
+        filename = f"studyroom_{start_date}_{end_date}.{fmt}" if place.default else f"studyroom_{place.key}_{start_date}_{end_date}.{fmt}"
+        
+        headers = {
+            'Content-Type': CONTENT_TYPES[fmt],
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Expose-Headers': 'X-Next-Start, X-Export-Rows',
+            'X-Export-Rows': str(stream.rows)
+        }
+        if stream.next_start:
+            headers['X-Next-Start'] = stream.next_start
+        print(f"Exported {stream.rows} rows ({stream.bytes} bytes) in {time.time() - start_time:.2f}s, next: {stream.next_start}")
+        
+        if fmt == 'parquet':
+            return {
+                'statusCode': 200,
+                'headers': headers,
+                'body': base64.b64encode(body).decode('ascii'),
+                'isBase64Encoded': True
+            }
+        return {
+            'statusCode': 200,
+            'headers': headers,
+            'body': body.decode('utf-8')
+        }
+        
+    except Exception as e:
+        print(f"Error in get_export_data: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': str(e)})
+        }
+
+def get_events_data(date, since='0', place_key=None):
+    """날짜의 예약 변경 이벤트 (since 순번 이후만, 알림은 마지막 순번을 기억해 이어서 조회)"""
+    try:
+        place = get_place(place_key)
+        events = read_events(dynamodb, place.data_key(date), int(since or 0))
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': dumps({
+                'date': date,
+                'events': [dict(event, date=date) for event in events],
+                'last_seq': int(events[-1]['seq']) if events else int(since or 0)
+            })
+        }
+    except Exception as e:
+        print(f"Error in get_events_data: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': str(e)})
+        }
+
+def get_history_data(date, at=None, place_key=None):
+    """날짜의 특정 시각(수집 시각 기준 ISO, 없으면 현재) 예약 원본 복원 (스냅샷 + 이후 이벤트)"""
+    try:
+        place = get_place(place_key)
+        state = reconstruct(dynamodb, place.data_key(date), at)
+        if state is None:
+            return {
+                'statusCode': 404,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': f"{date} 이력이 없습니다" + (f" ({at} 이전)" if at else '')})
+            }
+        records = state.pop('list')
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': dumps(dict(state, date=date, reservations={'list': records}))
+        }
+    except Exception as e:
+        print(f"Error in get_history_data: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': str(e)})
+        }
+
+def get_quality_data(place_key=None):
+    """수집 데이터 품질 지표와 재수집 대기 목록"""
+    try:
+        place = get_place(place_key)
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps(quality_report(dynamodb, place.prefix))
+        }
+    except Exception as e:
+        print(f"Error in get_quality_data: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': str(e)})
+        }
+
+def get_forecast_data(days='7', full_refit=False, place_key=None):
+    """다음 days일(최대 14일) 룸별 시간대 예상 점유 (어제까지 학습, 이미 수집된 예약 반영)"""
+    start_time = time.time()
+    try:
+        days = int(days)
+        if days < 1 or days > MAX_HORIZON:
+            raise ValueError(f"days는 1~{MAX_HORIZON} 범위여야 합니다")
+        
+        place = get_place(place_key)
+        config = get_config(dynamodb)
+        today = datetime.now(KST).date()
+        yesterday = (today - timedelta(days=1)).isoformat()
+        model = get_model(dynamodb, yesterday, data_version(config), full=full_refit, prefix=place.prefix)
+        
+        dates = [(today + timedelta(days=i)).isoformat() for i in range(days)]
+        result = forecast(model, dates, config.room_mapping, fetch_occupancy(dynamodb, dates, place.prefix))
+        result['processing_time'] = f"{time.time() - start_time:.2f}s"
+        
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': dumps(result)
+        }
+        
+    except Exception as e:
+        print(f"Error in get_forecast_data: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': str(e)})
+        }
+
+def iter_day_items(dates, projection, place=None):
+    """Proxy DB에서 날짜 목록을 25개씩 배치 조회하며 (날짜, 항목) 생성 (지점 접두어는 제거, 숫자는 int/float, 한 번에 한 배치만 메모리에 유지)"""
+    prefix = (place or get_place()).prefix
+    attributes = [name.strip() for name in projection.split(',')]
+    for page in batch_get_pages(dynamodb, 'studyroom-proxy-db', 'date', [prefix + date for date in dates], attributes):
+        for item in page:
+            yield item['date'][len(prefix):], item
+
+def batch_get_days(dates, projection, place=None):
+    """Proxy DB에서 날짜 목록을 25개씩 배치 조회 {date: item}"""
+    return dict(iter_day_items(dates, projection, place))
+
+def get_revenue_data(start_date, end_date, place_key=None):
+    """기간 매출 분석 (점유 시간당 매출, 룸별, 시간대별, 할인/환불)"""
+    start_time = time.time()
+    try:
+        calendar = get_calendar(start_date, end_date)
+        items = batch_get_days(calendar.dates, 'reservations', get_place(place_key))
+        
+        config = get_config(dynamodb)
+        columns = ReservationColumns.from_days(
+            ((date_str, items[date_str].get('reservations')) for date_str in calendar.dates if date_str in items),
+            rooms=config.room_mapping.keys()
+        )
+        result = revenue_report(columns, config.room_mapping)
+        result['period'] = f"{start_date} ~ {end_date}"
+        result['processing_time'] = f"{time.time() - start_time:.2f}s"
+        
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': dumps(result)
+        }
+        
+    except Exception as e:
+        print(f"Error in get_revenue_data: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': str(e)})
+        }
+
+def get_utilization_data(start_date, end_date, place_key=None):
+    """기간 이용률 (운영 시간 기준, 자정 넘는 예약은 날짜 경계에서 분할)"""
+    start_time = time.time()
+    try:
+        calendar = get_calendar(start_date, end_date)
+        
+        # 전날부터 시작된 예약 판별을 위해 시작일 전날도 조회
+        previous_date = (datetime.strptime(start_date, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
+        dates = [previous_date] + calendar.dates
+        items = batch_get_days(dates, 'reservations', get_place(place_key))
+        
+        days = [(date_str, items[date_str].get('reservations')) for date_str in dates if date_str in items]
+        result = utilization_report(days, calendar.dates, get_config(dynamodb))
+        result['period'] = f"{start_date} ~ {end_date}"
+        result['processing_time'] = f"{time.time() - start_time:.2f}s"
+        
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': dumps(result)
+        }
+        
+    except Exception as e:
+        print(f"Error in get_utilization_data: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': str(e)})
+        }
+
+def sync_place(place, last_date):
+    """지점 하나를 마지막 날부터 오늘까지 수집 (마지막 날 포함, 기존 데이터 덮어쓰기)"""
+    start_date = datetime.strptime(last_date, '%Y-%m-%d')
+    today = datetime.now()
+    
+    dates = []
+    current = start_date
+    
+    while current <= today:
+        dates.append(current.strftime('%Y-%m-%d'))
+        current += timedelta(days=1)
+    
+    results = collect_dates(dates, place=place)
+    collected = [f"{date_str}: {results[date_str]}" for date_str in dates]
+    failed = [date_str for date_str in dates if not results[date_str].startswith('성공')]
+    return {
+        'synced': len(collected) - len(failed),
+        'failed': failed,
+        'results': collected,
+        'last_date': last_date
+    }
+
 def auto_sync_data():
-    """Proxy DB 마지막 날부터 오늘까지 자동 데이터 동기화"""
+    """Proxy DB 마지막 날부터 오늘까지 자동 데이터 동기화 (지점별 마지막 날짜 기준, 지점은 동시에 진행)"""
     try:
         table = dynamodb.Table('studyroom-proxy-db')
         
-        # 마지막 데이터 날짜 확인
-        response = table.scan(
-            ProjectionExpression='#d',
-            ExpressionAttributeNames={'#d': 'date'}
-        )
+        # 지점별 마지막 데이터 날짜 확인 (기본 지점은 접두어 없는 키)
+        scan_kwargs = {
+            'ProjectionExpression': '#d',
+            'ExpressionAttributeNames': {'#d': 'date'}
+        }
+        default_key = get_place().key
+        last_dates = {}
+        while True:
+            response = table.scan(**scan_kwargs)
+            for item in response['Items']:
+                place_key, date_str = split_key(item['date'])
+                place_key = place_key or default_key
+                last_dates[place_key] = max(last_dates.get(place_key, date_str), date_str)
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
         
-        if not response['Items']:
-            # 데이터가 없으면 최근 7일 수집
-            last_date = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-        else:
-            # 가장 최근 날짜 찾기
-            dates = [item['date'] for item in response['Items']]
-            last_date = max(dates)
+        # 데이터가 없는 지점은 최근 7일 수집
+        initial_date = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+        places = run_places(lambda place: sync_place(place, last_dates.get(place.key, initial_date)))
         
-        # 마지막 날부터 오늘까지 수집 (마지막 날 포함)
-        start_date = datetime.strptime(last_date, '%Y-%m-%d')
-        today = datetime.now()
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({
+                'places': places,
+                'upstream': get_metrics()
+            })
+        }
         
-        collected = []
-        current = start_date
+    except Exception as e:
+        print(f"Auto sync error: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({'error': str(e)})
+        }
+
+def normalize_reservation(reservation, excluded_users):
+    """Comepass 원본 예약 1건 → 저장용 정규화 예약 (집계 대상이 아니면 None)"""
+    status = reservation.get('s_state')
+    if status not in ('USED', 'RESERVED', 'REFUND'):
+        return None
+    user_name = reservation.get('m_nm', '')
+    if user_name in excluded_users:
+        return None
+    pay_price = int(reservation.get('ord_pay_price') or 0)
+    normalized = {
+        'status': status,
+        'hours': int(reservation.get('s_use_time') or 0),
+        'revenue': pay_price,
+        'list_price': int(reservation.get('ord_price') or pay_price),
+        'room': reservation.get('sg_name', ''),
+        'user': user_name,
+        'start_time': reservation.get('s_s_time', ''),
+        'end_time': reservation.get('s_e_time', '')
+    }
+    if status == 'REFUND':
+        normalized['refund'] = int(reservation.get('ord_refund_price') or pay_price)
+    return normalized
+
+def normalize_reservations(raw_data, excluded_users):
+    """Comepass 원본 응답을 저장용 정규화 예약 목록으로 변환 (환불 건은 금액 집계용으로 보관)"""
+    reservations = []
+    for reservation in raw_data.get('list', []):
+        normalized = normalize_reservation(reservation, excluded_users)
+        if normalized is not None:
+            reservations.append(normalized)
+    return reservations
+
+def data_version(config):
+    """저장된 정규화 데이터의 버전 (설정 버전 + 정규화 형식 버전)"""
+    return f"{config.version}-n{NORMALIZE_VERSION}"
+
+def update_heatmap_rollup(date_str, old_item, occupancy, prefix=''):
+    """이전 저장 항목 대비 변경분을 월 히트맵 카운터에 반영"""
+    try:
+        old_occupancy = None
+        if old_item and 'reservations' in old_item:
+            old_occupancy = day_occupancy(old_item['reservations'])
+        apply_day_update(dynamodb, date_str, old_occupancy, occupancy, prefix)
+    except Exception as e:
+        print(f"Heatmap rollup update error for {date_str}: {e}")
+
+def recompute_rollups():
+    """설정 변경 시 저장된 원본(full_response)으로 정규화 데이터 재계산 (Comepass 재호출 없음)"""
+    try:
+        config = get_config(dynamodb, refresh=True)
+        table = dynamodb.Table('studyroom-proxy-db')
+        
+        scan_kwargs = {
+            'ProjectionExpression': '#d, full_response, reservations, config_version',
+            'FilterExpression': 'attribute_not_exists(config_version) OR config_version <> :v',
+            'ExpressionAttributeNames': {'#d': 'date'},
+            'ExpressionAttributeValues': {':v': data_version(config)}
+        }
         
-        while current <= today:
-            date_str = current.strftime('%Y-%m-%d')
+        checked = 0
+        updated = []
+        while True:
+            response = table.scan(**scan_kwargs)
+            for item in response.get('Items', []):
+                checked += 1
+                reservations = normalize_reservations(item.get('full_response') or {}, config.excluded_users)
+                
+                # 결과가 달라진 날짜만 정규화 데이터 갱신, 나머지는 버전만 갱신
+                if reservations != item.get('reservations'):
+                    occupancy = day_occupancy(reservations)
+                    table.update_item(
+                        Key={'date': item['date']},
+                        UpdateExpression='SET reservations = :r, occupancy = :o, config_version = :v',
+                        ExpressionAttributeValues={':r': reservations, ':o': occupancy, ':v': data_version(config)}
+                    )
+                    place_key, date_str = split_key(item['date'])
+                    update_heatmap_rollup(date_str, item, occupancy, place_key + KEY_SEPARATOR if place_key else '')
+                    updated.append(item['date'])
+                else:
+                    table.update_item(
+                        Key={'date': item['date']},
+                        UpdateExpression='SET config_version = :v',
+                        ExpressionAttributeValues={':v': data_version(config)}
+                    )
             
-            # 새 데이터 수집 (기존 데이터 덮어쓰기)
-            result = collect_data_for_date(date_str)
-            collected.append(f"{date_str}: {result}")
-            current += timedelta(days=1)
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
         
         return {
             'statusCode': 200,
             'headers': {'Content-Type': 'application/json'},
             'body': json.dumps({
-                'synced': len(collected),
-                'results': collected,
-                'last_date': last_date
+                'config_version': data_version(config),
+                'checked': checked,
+                'updated': sorted(updated)
             })
         }
         
     except Exception as e:
-        print(f"Auto sync error: {e}")
+        print(f"Recompute rollups error: {e}")
         return {
             'statusCode': 500,
             'headers': {'Content-Type': 'application/json'},
             'body': json.dumps({'error': str(e)})
         }
 
+def store_day(target_date, raw_data, token=None, issues=None, place=None, prerender=False):
+    """Comepass 원본 응답을 정규화하여 Proxy DB에 저장 (prerender면 화면용 응답도 미리 생성, 토큰 필요)"""
+    place = place or get_place()
+    # 예약 데이터 변환 (중복 방지를 위한 정규화)
+    config = get_config(dynamodb)
+    reservations = normalize_reservations(raw_data, config.excluded_users)
+    
+    occupancy = day_occupancy(reservations)
+    
+    # DynamoDB 저장 (중복 데이터 덮어쓰기)
+    item = {
+        'date': place.data_key(target_date),
+        'cached_at': datetime.now().isoformat(),
+        'full_response': raw_data,
+        'reservations': reservations,
+        'occupancy': occupancy,
+        'quality': dict(day_stats(reservations), status='flagged' if issues else 'ok', issues=issues or []),
+        'config_version': data_version(config),
+        'content_hash': content_hash(raw_data.get('list'))
+    }
+    if prerender and token:
+        item['payload'] = dumps(build_reservations_payload(target_date, token, raw_data))
+        item['payload_at'] = int(datetime.now().timestamp())
+    
+    table = dynamodb.Table('studyroom-proxy-db')
+    for attempt in range(STORE_RETRIES):
+        old_item = table.get_item(Key={'date': item['date']}, ConsistentRead=True).get('Item')
+        
+        # 이전 수집본과 비교한 변경 이벤트를 로그에 추가하고 주기적으로 스냅샷 압축 (첫 수집은 기준 스냅샷만 저장)
+        events = None
+        item.pop('event_seq', None)
+        old_response = old_item.get('full_response') if old_item else None
+        try:
+            # 읽은 저장본의 이벤트 순번 바로 뒤에만 추가 (순번 없이 저장된 항목은 지금 로그의 마지막 순번)
+            old_seq = None
+            if old_item:
+                old_seq = int(old_item['event_seq']) if 'event_seq' in old_item else last_seq(dynamodb, item['date'])
+            events, seq = record_collection(
+                dynamodb, item['date'],
+                old_response, old_item.get('cached_at') if old_item else None,
+                raw_data, item['cached_at'],
+                lambda record: normalize_reservation(record, config.excluded_users),
+                old_seq
+            )
+            # 이벤트 로그 순번 = 예약 현황 버전 (since 변경분 응답 기준, 내용과 같은 저장에 기록)
+            item['event_seq'] = seq
+        except EventLogConflict as e:
+            # 같은 저장본을 읽은 다른 수집이 먼저 이벤트를 추가함 → 그 수집이 저장한 뒤 다시 읽고 비교
+            print(f"Concurrent collection for {item['date']}, retrying ({attempt + 1}/{STORE_RETRIES}): {e}")
+            time.sleep(STORE_RETRY_DELAY * (attempt + 1))
+            continue
+        except Exception as e:
+            print(f"Event log error for {item['date']}: {e}")
+            # 내용이 그대로면 이전 버전 유지 (바뀌었으면 버전 없이 저장해 변경분 대신 전체 응답)
+            if old_item and 'event_seq' in old_item and old_item.get('content_hash') == item['content_hash']:
+                item['event_seq'] = old_item['event_seq']
+        
+        # 읽은 저장본이 그대로일 때만 저장 (동시 수집이 먼저 저장했으면 다시 읽어 변경분을 이중으로 반영하지 않음)
+        if old_item is None:
+            condition = {'ConditionExpression': 'attribute_not_exists(#d)', 'ExpressionAttributeNames': {'#d': 'date'}}
+        elif 'event_seq' in old_item:
+            condition = {'ConditionExpression': 'event_seq = :seq', 'ExpressionAttributeValues': {':seq': old_item['event_seq']}}
+        else:
+            condition = {'ConditionExpression': 'attribute_not_exists(event_seq) AND cached_at = :at', 'ExpressionAttributeValues': {':at': old_item['cached_at']}}
+        try:
+            # 이벤트 기록 후 저장하므로 저장본의 내용 해시와 버전이 항상 함께 바뀜
+            table.put_item(Item=item, **condition)
+            break
+        except dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+            print(f"Proxy DB item for {item['date']} changed concurrently, retrying ({attempt + 1}/{STORE_RETRIES})")
+            time.sleep(STORE_RETRY_DELAY * (attempt + 1))
+    else:
+        raise RuntimeError(f"{item['date']} 동시 수집과 충돌해 저장하지 못함 ({STORE_RETRIES}회)")
+    
+    # 히트맵 카운터에 변경분 반영 (같은 설정으로 저장된 날짜는 변경 이벤트의 변화량만, 그 외에는 전체 비교)
+    if events is not None and old_response is not None and old_item.get('config_version') == item['config_version'] and 'reservations' in old_item:
+        try:
+            apply_occupancy_delta(dynamodb, target_date, occupancy_delta(events), place.prefix)
+        except Exception as e:
+            print(f"Heatmap rollup update error for {target_date}: {e}")
+    else:
+        update_heatmap_rollup(target_date, old_item, occupancy, place.prefix)
+    
+    if issues:
+        return f"성공 ({len(reservations)}건, 품질 경고)"
+    return f"성공 ({len(reservations)}건)"
+
+def load_quality_baseline(dates, place=None):
+    """품질 검사 기준 지표 {date: 지표} (수집 날짜 + 같은 요일 이력, 경고 상태로 저장된 날짜 제외)"""
+    needed = set(dates)
+    for date_str in dates:
+        needed.update(history_dates(date_str))
+    needed = sorted(needed)
+    
+    baseline = {}
+    missing = []
+    items = batch_get_days(needed, 'quality', place)
+    for date_str in needed:
+        quality = items.get(date_str, {}).get('quality')
+        if quality is None:
+            missing.append(date_str)
+        elif quality.get('status') != 'flagged':
+            baseline[date_str] = {name: int(quality.get(name, 0)) for name in ('records', 'reservations', 'minutes')}
+    
+    # 품질 지표가 없는 이전 형식 항목은 정규화 예약으로 계산
+    if missing:
+        for date_str, item in batch_get_days(missing, 'reservations', place).items():
+            baseline[date_str] = day_stats(item.get('reservations'))
+    return baseline
+
+def collect_dates(dates, token=None, place=None, prerender=()):
+    """여러 날짜 데이터 수집 (토큰 1회 확보, 날짜별 API 호출은 동시에 진행, 저장 전 품질 검사, prerender 날짜만 화면용 응답 생성)"""
+    place = place or get_place()
+    try:
+        if token is None:
+            token = get_token(place=place)
+    except Exception as e:
+        return {date: f"오류: {str(e)}" for date in dates}
+    
+    fetch_start = time.time()
+    fetched = fetch_studyroom_dates(dates, token['access_token'], token['p_code'], PLACE_CONCURRENCY)
+    print(f"Fetched {len(dates)} dates for {place.key} in {time.time() - fetch_start:.2f}s")
+    
+    config = get_config(dynamodb)
+    today = datetime.now(KST).strftime('%Y-%m-%d')
+    try:
+        baseline = load_quality_baseline(dates, place)
+        attempts = refetch_attempts(dynamodb, dates, place.prefix)
+    except Exception as e:
+        print(f"Quality baseline error: {e}")
+        baseline, attempts = {}, {}
+    
+    counts = {'checked': 0, 'passed': 0, 'schema_errors': 0, 'anomalies': 0, 'refetched': 0, 'accepted': 0, 'abandoned': 0, 'unknown_states': 0}
+    flagged = {}
+    stored = []
+    failed = {}
+    results = {}
+    for date in dates:
+        raw_data = fetched[date]
+        if isinstance(raw_data, ComepassError):
+            print(f"API 호출 실패 ({date}): {raw_data}")
+            results[date] = f"API 호출 실패: {raw_data.status}"
+            continue
+        if isinstance(raw_data, Exception):
+            results[date] = f"오류: {str(raw_data)}"
+            continue
+        
+        # 스키마 검증 → 같은 날짜 저장본/같은 요일 이력 대비 이상 검사 (이력 검사는 지난 날짜만)
+        counts['checked'] += 1
+        counts['refetched'] += date in attempts
+        schema_issues = validate_schema(raw_data)
+        issues = schema_issues
+        if schema_issues:
+            counts['schema_errors'] += 1
+        else:
+            # 새 예약 상태는 형식 오류가 아니므로 저장은 계속하고 건수만 집계
+            states = unknown_states(raw_data)
+            if states:
+                print(f"Unknown reservation states for {date}: {states}")
+                counts['unknown_states'] += sum(states.values())
+            stats = day_stats(normalize_reservations(raw_data, config.excluded_users))
+            history = [baseline[d] for d in history_dates(date) if d in baseline] if date < today else None
+            issues = check_day(stats, baseline.get(date), history)
+            counts['anomalies'] += bool(issues)
+        
+        # 형식 오류가 재수집 후에도 계속되면 저장하지 않고 실패로 표시 (다시 예약하지 않음, 지표로 집계)
+        if schema_issues and attempts.get(date, 0) >= MAX_REFETCH_ATTEMPTS:
+            print(f"Giving up refetch for {date} after {attempts[date]} attempts: {schema_issues}")
+            failed[date] = schema_issues
+            counts['abandoned'] += 1
+            results[date] = f"형식 오류 (재수집 중단): {'; '.join(schema_issues)}"
+            continue
+        
+        # 의심 데이터는 저장하지 않고 재수집 예약 (이상치는 재시도 후에도 계속되면 경고와 함께 저장)
+        if schema_issues or (issues and attempts.get(date, 0) < MAX_REFETCH_ATTEMPTS):
+            print(f"Suspicious data for {date}: {issues}")
+            flagged[date] = issues
+            results[date] = f"의심 (재수집 예약): {'; '.join(issues)}"
+            continue
+        
+        try:
+            results[date] = store_day(date, raw_data, token, issues, place, prerender=date in prerender)
+            stored.append(date)
+            counts['accepted' if issues else 'passed'] += 1
+        except Exception as e:
+            results[date] = f"오류: {str(e)}"
+    
+    try:
+        if flagged:
+            schedule_refetch(dynamodb, flagged, place.prefix)
+        if failed:
+            fail_refetch(dynamodb, failed, place.prefix)
+        if attempts:
+            clear_refetch(dynamodb, stored, place.prefix)
+        record_metrics(dynamodb, counts, place.prefix)
+    except Exception as e:
+        print(f"Quality metrics error: {e}")
+    return results
+
 def collect_data_for_date(target_date):
     """특정 날짜의 데이터 수집"""
+    return collect_dates([target_date])[target_date]
+
+def prerender_dates(today):
+    """화면용 응답을 미리 만드는 날짜 (서울 기준 오늘/내일)"""
+    return [(today + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(PRERENDER_DAYS)]
+
+def prewarm_place(place, today):
+    """지점 하나의 스케줄 작업 (토큰 선갱신 → 오늘/내일 + 재수집 대상 수집 → 예측 모델 갱신)"""
+    # 다음 실행 전에 만료되지 않도록 여유 있게 토큰 갱신
+    token = get_token(min_validity=PREWARM_TOKEN_MARGIN, place=place)
+    
+    # 서울 기준 오늘/내일
+    dates = prerender_dates(today)
+    
+    # 품질 검사에서 재수집 예약된 날짜 중 시점이 된 날짜도 함께 수집
     try:
-        # 토큰 획득
-        token_result = get_new_token()
-        if not token_result:
-            return "토큰 획득 실패"
-        
-        token = token_result['access_token']
-        p_code = token_result['p_code']
-        
-        # API 호출 (메인 엔드포인트와 동일한 헤더 사용)
-        response = http.request(
-            'GET',
-            f'https://api.comepass.kr/place/studyroom?date={target_date}',
-            headers={
-                'Accept': 'application/json, text/plain, */*',
-                'Authorization': f'Bearer {token}',
-                'Origin': 'https://place.comepass.kr',
-                'Referer': 'https://place.comepass.kr/',
-                'X-Dmon-Place-Code': p_code,
-                'X-Dmon-Request-From': 'place_admin_web',
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-        )
-        
-        if response.status != 200:
-            print(f"API 호출 실패 - Status: {response.status}")
-            print(f"Response headers: {response.headers}")
-            print(f"Response data: {response.data.decode('utf-8')}")
-            return f"API 호출 실패: {response.status}"
-        
-        raw_data = json.loads(response.data.decode('utf-8'))
-        
-        # 예약 데이터 변환 (중복 방지를 위한 정규화)
-        reservations = []
-        for reservation in raw_data.get('list', []):
-            if reservation.get('s_state') in ['USED', 'RESERVED']:
-                user_name = reservation.get('m_nm', '')
-                if user_name not in ['최은숙', '배준기']:
-                    reservations.append({
-                        'status': reservation.get('s_state'),
-                        'hours': int(reservation.get('s_use_time', 0)),
-                        'revenue': int(reservation.get('ord_pay_price', 0)),
-                        'room': reservation.get('sg_name', ''),
-                        'user': user_name,
-                        'start_time': reservation.get('s_s_time', '')
-                    })
-        
-        # DynamoDB 저장 (중복 데이터 덮어쓰기)
-        table = dynamodb.Table('studyroom-proxy-db')
-        table.put_item(Item={
-            'date': target_date,
-            'cached_at': datetime.now().isoformat(),
-            'full_response': raw_data,
-            'reservations': reservations
-        })
+        dates += [date_str for date_str in due_refetches(dynamodb, prefix=place.prefix) if date_str not in dates]
+    except Exception as e:
+        print(f"Refetch queue error ({place.key}): {e}")
+    results = collect_dates(dates, token, place, prerender=prerender_dates(today))
+    
+    # 새로 완료된 날짜(어제까지)를 예측 모델에 증분 반영
+    try:
+        yesterday = (today - timedelta(days=1)).strftime('%Y-%m-%d')
+        get_model(dynamodb, yesterday, data_version(get_config(dynamodb)), prefix=place.prefix)
+    except Exception as e:
+        print(f"Forecast model update error ({place.key}): {e}")
+    
+    return {
+        'results': results,
+        'token_refreshed': not token['cached'],
+        'token_expires': token['expires_at']
+    }
+
+def run_places(job):
+    """모든 지점에 작업을 동시에 실행 {지점 키: 결과} (한 지점의 실패가 다른 지점에 영향 없음)"""
+    places = get_places()
+    with ThreadPoolExecutor(max_workers=len(places)) as executor:
+        futures = {place.key: executor.submit(job, place) for place in places}
+    results = {}
+    for key, future in futures.items():
+        try:
+            results[key] = future.result()
+        except Exception as e:
+            print(f"Place job error ({key}): {e}")
+            results[key] = {'error': str(e)}
+    return results
+
+def prewarm_job():
+    """예약 스케줄 작업: 지점별 토큰 선갱신, 오늘/내일 데이터 수집, 집계 갱신, 화면용 응답 미리 생성"""
+    start_time = time.time()
+    try:
+        today = datetime.now(KST)
+        places = run_places(lambda place: prewarm_place(place, today))
         
-        return f"성공 ({len(reservations)}건)"
+        print(f"Prewarm completed in {time.time() - start_time:.2f}s: {places}")
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({
+                'message': 'Prewarm completed',
+                'places': places,
+                'processing_time': f"{time.time() - start_time:.2f}s"
+            })
+        }
         
     except Exception as e:
-        return f"오류: {str(e)}"
+        print(f"Prewarm error: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({'error': str(e)})
+        }
 
 def collect_and_store_reservation_data():
     """수동 데이터 수집"""
@@ -1034,13 +2167,10 @@ def collect_and_store_reservation_data():
 
 def collect_past_data():
     """과거 데이터 수집 (12월 전체)"""
-    results = []
-    
     # 2025년 12월 전체 수집
-    for day in range(1, 32):
-        date_str = f"2025-12-{day:02d}"
-        result = collect_data_for_date(date_str)
-        results.append(f"{date_str}: {result}")
+    dates = [f"2025-12-{day:02d}" for day in range(1, 32)]
+    collected = collect_dates(dates)
+    results = [f"{date_str}: {collected[date_str]}" for date_str in dates]
     
     return {
         'statusCode': 200,
@@ -1053,31 +2183,22 @@ def collect_past_data():
 
 def collect_three_months_data():
     """최근 3달간 모든 데이터 수집"""
-    results = []
+    dates = []
     
     # 2025년 10월 (31일)
-    for day in range(1, 32):
-        date_str = f"2025-10-{day:02d}"
-        result = collect_data_for_date(date_str)
-        results.append(f"{date_str}: {result}")
+    dates += [f"2025-10-{day:02d}" for day in range(1, 32)]
     
     # 2025년 11월 (30일)
-    for day in range(1, 31):
-        date_str = f"2025-11-{day:02d}"
-        result = collect_data_for_date(date_str)
-        results.append(f"{date_str}: {result}")
+    dates += [f"2025-11-{day:02d}" for day in range(1, 31)]
     
     # 2025년 12월 (31일)
-    for day in range(1, 32):
-        date_str = f"2025-12-{day:02d}"
-        result = collect_data_for_date(date_str)
-        results.append(f"{date_str}: {result}")
+    dates += [f"2025-12-{day:02d}" for day in range(1, 32)]
     
     # 2026년 1월 (현재까지)
-    for day in range(1, 9):  # 1월 1일~8일
-        date_str = f"2026-01-{day:02d}"
-        result = collect_data_for_date(date_str)
-        results.append(f"{date_str}: {result}")
+    dates += [f"2026-01-{day:02d}" for day in range(1, 9)]  # 1월 1일~8일
+    
+    collected = collect_dates(dates)
+    results = [f"{date_str}: {collected[date_str]}" for date_str in dates]
     
     return {
         'statusCode': 200,
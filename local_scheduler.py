@@ -0,0 +1,22 @@
+import sys
+import time
+from datetime import datetime
+from lambda_function import lambda_handler
+
+# EventBridge 스케줄 규칙 대신 로컬에서 주기적으로 사전 수집 작업 실행
+SCHEDULED_EVENT = {
+    'source': 'local.scheduler',
+    'detail-type': 'Scheduled Event',
+    'detail': {}
+}
+
+def run(interval_seconds=300):
+    """interval_seconds 간격으로 사전 수집 작업 실행"""
+    while True:
+        print(f"[{datetime.now()}] Running prewarm job")
+        result = lambda_handler(dict(SCHEDULED_EVENT, time=datetime.now().isoformat()), None)
+        print(f"Result: {result['statusCode']} {result['body']}")
+        time.sleep(interval_seconds)
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
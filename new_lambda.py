@@ -1,13 +1,15 @@
 import json
-import urllib3
 import boto3
 import os
 import time
 from datetime import datetime, timedelta
+from config import get_config
+from calendar_dim import get_calendar, group_sum, iso_week_dates
+from rollups import get_heatmap
+from comepass_client import login, fetch_studyroom_dates
 
 # 전역 변수
 dynamodb = boto3.resource('dynamodb')
-http = urllib3.PoolManager()
 
 def lambda_handler(event, context):
     start_time = time.time()
@@ -35,6 +37,11 @@ def lambda_handler(event, context):
         period = query_params.get('period', '')
         return get_analytics_from_proxy(analysis_type, period)
     
+    # 요일 × 시간 × 룸 히트맵 API
+    if event.get('path') == '/api/heatmap':
+        query_params = event.get('queryStringParameters') or {}
+        return get_heatmap_from_proxy(query_params.get('start', ''), query_params.get('end', ''))
+    
     # 추이 분석 페이지
     if event.get('path') == '/trends':
         return serve_trends_page()
@@ -58,18 +65,7 @@ def get_comepass_token():
     if not comepass_id or not comepass_pwd:
         raise Exception('COMEPASS_ID 또는 COMEPASS_PWD 환경변수가 설정되지 않았습니다')
     
-    login_url = 'https://api.comepass.kr/login/admin'
-    login_headers = {
-        'Accept': 'application/json, text/plain, */*',
-        'Content-Type': 'application/json',
-        'Origin': 'https://place.comepass.kr',
-        'Referer': 'https://place.comepass.kr/',
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-    }
-    
-    login_data = {"id": comepass_id, "pwd": comepass_pwd}
-    login_response = http.request('POST', login_url, body=json.dumps(login_data), headers=login_headers)
-    result = json.loads(login_response.data.decode('utf-8'))
+    result = login(comepass_id, comepass_pwd)
     
     if result.get('result') == 'success':
         return result['access_token'], result['p_code']
@@ -84,26 +80,16 @@ def bulk_collect_data():
         
         success_count = 0
         end_date = datetime.now()
+        dates = [(end_date - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(60)]
         
-        for i in range(60):
-            current_date = end_date - timedelta(days=i)
-            date_str = current_date.strftime('%Y-%m-%d')
-            
+        # Comepass API 동시 호출 (호스트별 동시 요청 수 제한)
+        fetched = fetch_studyroom_dates(dates, access_token, p_code)
+        
+        for date_str in dates:
             try:
-                # Comepass API 호출
-                url = f'https://api.comepass.kr/place/studyroom?date={date_str}'
-                headers = {
-                    'Accept': 'application/json, text/plain, */*',
-                    'Authorization': f'Bearer {access_token}',
-                    'Origin': 'https://place.comepass.kr',
-                    'Referer': 'https://place.comepass.kr/',
-                    'X-Dmon-Place-Code': p_code,
-                    'X-Dmon-Request-From': 'place_admin_web',
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                }
-                
-                response = http.request('GET', url, headers=headers)
-                data = json.loads(response.data.decode('utf-8'))
+                data = fetched[date_str]
+                if isinstance(data, Exception):
+                    raise data
                 
                 # 전체 응답을 저장
                 table.put_item(Item={
@@ -137,15 +123,11 @@ def get_trends_from_proxy(analysis_type, start_date, end_date):
     try:
         table = dynamodb.Table('studyroom-proxy-db')
         
-        start = datetime.strptime(start_date, '%Y-%m-%d')
-        end = datetime.strptime(end_date, '%Y-%m-%d')
+        calendar = get_calendar(start_date, end_date)
         
         # 일별 데이터 수집
         daily_data = {}
-        current_date = start
-        while current_date <= end:
-            date_str = current_date.strftime('%Y-%m-%d')
-            
+        for date_str in calendar.dates:
             try:
                 response = table.get_item(Key={'date': date_str})
                 if 'Item' in response and 'full_response' in response['Item']:
@@ -165,60 +147,22 @@ def get_trends_from_proxy(analysis_type, start_date, end_date):
             except Exception as e:
                 print(f"Error getting data for {date_str}: {e}")
                 daily_data[date_str] = {'reservations': 0, 'revenue': 0, 'hours': 0.0}
-            
-            current_date += timedelta(days=1)
         
-        # 분석 타입에 따라 집계
-        trends = []
-        if analysis_type == 'daily':
-            for date_str, data in daily_data.items():
-                trends.append({
-                    'period': date_str,
-                    'reservations': data['reservations'],
-                    'revenue': data['revenue'],
-                    'hours': round(data['hours'], 1)
-                })
-        elif analysis_type == 'weekly':
-            weekly_data = {}
-            for date_str, data in daily_data.items():
-                date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-                year, week, _ = date_obj.isocalendar()
-                week_key = f"{year}-W{week:02d}"
-                
-                if week_key not in weekly_data:
-                    weekly_data[week_key] = {'reservations': 0, 'revenue': 0, 'hours': 0.0}
-                
-                weekly_data[week_key]['reservations'] += data['reservations']
-                weekly_data[week_key]['revenue'] += data['revenue']
-                weekly_data[week_key]['hours'] += data['hours']
-            
-            for week_key, data in sorted(weekly_data.items()):
-                trends.append({
-                    'period': week_key,
-                    'reservations': data['reservations'],
-                    'revenue': data['revenue'],
-                    'hours': round(data['hours'], 1)
-                })
-        else:  # monthly
-            monthly_data = {}
-            for date_str, data in daily_data.items():
-                date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-                month_key = date_obj.strftime('%Y-%m')
-                
-                if month_key not in monthly_data:
-                    monthly_data[month_key] = {'reservations': 0, 'revenue': 0, 'hours': 0.0}
-                
-                monthly_data[month_key]['reservations'] += data['reservations']
-                monthly_data[month_key]['revenue'] += data['revenue']
-                monthly_data[month_key]['hours'] += data['hours']
-            
-            for month_key, data in sorted(monthly_data.items()):
-                trends.append({
-                    'period': month_key,
-                    'reservations': data['reservations'],
-                    'revenue': data['revenue'],
-                    'hours': round(data['hours'], 1)
-                })
+        # 분석 타입에 따라 집계 (달력 차원의 그룹 인덱스로 배열 합산)
+        granularity = analysis_type if analysis_type in ('daily', 'weekly') else 'monthly'
+        keys, group_index = calendar.grouping(granularity)
+        days = [daily_data[date_str] for date_str in calendar.dates]
+        
+        reservations = group_sum([d['reservations'] for d in days], group_index, len(keys))
+        revenue = group_sum([d['revenue'] for d in days], group_index, len(keys))
+        hours = group_sum([d['hours'] for d in days], group_index, len(keys))
+        
+        trends = [{
+            'period': key,
+            'reservations': reservations[i],
+            'revenue': revenue[i],
+            'hours': round(hours[i], 1)
+        } for i, key in enumerate(keys)]
         
         return {
             'statusCode': 200,
@@ -258,10 +202,8 @@ def get_analytics_from_proxy(analysis_type, period):
             if 'Item' in response and 'full_response' in response['Item']:
                 all_reservations = response['Item']['full_response'].get('list', [])
         elif analysis_type == 'weekly':
-            year, week = period.split('-W')
-            week_start = datetime.strptime(f'{year}-W{week}-1', '%Y-W%W-%w')
-            for i in range(7):
-                date_str = (week_start + timedelta(days=i)).strftime('%Y-%m-%d')
+            # 추이분석과 동일한 ISO 주 기준
+            for date_str in iso_week_dates(period):
                 response = table.get_item(Key={'date': date_str})
                 if 'Item' in response and 'full_response' in response['Item']:
                     all_reservations.extend(response['Item']['full_response'].get('list', []))
@@ -333,6 +275,24 @@ def get_analytics_from_proxy(analysis_type, period):
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
             'body': json.dumps({'error': str(e)})
         }
+def get_heatmap_from_proxy(start_date, end_date):
+    """월 카운터 기반 요일 × 시간 × 룸 점유 히트맵 조회"""
+    try:
+        result = get_heatmap(dynamodb, start_date, end_date, get_config(dynamodb).room_mapping)
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps(result, separators=(',', ':'))
+        }
+        
+    except Exception as e:
+        print(f"Error in get_heatmap_from_proxy: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': str(e)})
+        }
+
 def serve_trends_page():
     """추이 분석 페이지"""
     html = '''<!DOCTYPE html>
@@ -571,6 +531,8 @@ def serve_analytics_page():
         table { width: 100%; border-collapse: collapse; margin-top: 15px; }
         th, td { padding: 8px; text-align: left; border-bottom: 1px solid #ddd; }
         th { background-color: #f8f9fa; }
+        .heatmap td, .heatmap th { padding: 4px; text-align: center; font-size: 12px; border: 1px solid #eee; }
+        .heatmap-controls { margin-bottom: 10px; }
     </style>
 </head>
 <body>
@@ -605,6 +567,18 @@ def serve_analytics_page():
         <div id="analytics-content" class="loading">
             <p>통계 데이터를 불러오는 중...</p>
         </div>
+        
+        <div class="chart-container">
+            <h3>요일 × 시간대 점유율</h3>
+            <div class="heatmap-controls">
+                <input type="date" id="heatmapStart" onchange="loadHeatmap()">
+                <input type="date" id="heatmapEnd" onchange="loadHeatmap()">
+                <select id="heatmapRoom" onchange="renderHeatmap()">
+                    <option value="-1">전체 룸</option>
+                </select>
+            </div>
+            <div id="heatmap-content" class="loading"><p>히트맵을 불러오는 중...</p></div>
+        </div>
     </div>
 
     <script>
@@ -630,7 +604,7 @@ def serve_analytics_page():
             } else if (type === 'weekly') {
                 populateWeekOptions();
                 const today = new Date();
-                const weekStr = `${today.getFullYear()}-W${getWeekNumber(today)}`;
+                const weekStr = getIsoWeekKey(today);
                 document.getElementById('weekSelector').value = weekStr;
                 setTimeout(() => loadAnalytics('weekly'), 100);
             } else {
@@ -664,7 +638,7 @@ def serve_analytics_page():
             for (let i = 0; i < 12; i++) {
                 const date = new Date();
                 date.setDate(date.getDate() - (i * 7));
-                const weekStr = `${date.getFullYear()}-W${getWeekNumber(date)}`;
+                const weekStr = getIsoWeekKey(date);
                 const option = document.createElement('option');
                 option.value = weekStr;
                 option.textContent = `${weekStr} (${date.toISOString().split('T')[0]})`;
@@ -687,12 +661,14 @@ def serve_analytics_page():
             }
         }
         
-        function getWeekNumber(date) {
+        // ISO 주 키 (YYYY-Www, 서버 추이분석과 동일한 형식)
+        function getIsoWeekKey(date) {
             const d = new Date(Date.UTC(date.getFullYear(), date.getMonth(), date.getDate()));
             const dayNum = d.getUTCDay() || 7;
             d.setUTCDate(d.getUTCDate() + 4 - dayNum);
             const yearStart = new Date(Date.UTC(d.getUTCFullYear(),0,1));
-            return Math.ceil((((d - yearStart) / 86400000) + 1)/7);
+            const week = Math.ceil((((d - yearStart) / 86400000) + 1)/7);
+            return `${d.getUTCFullYear()}-W${String(week).padStart(2, '0')}`;
         }
         
         function loadAnalytics(type) {
@@ -781,8 +757,74 @@ def serve_analytics_page():
             content.innerHTML = html;
         }
         
+        let heatmapData = null;
+        
+        function loadHeatmap() {
+            const start = document.getElementById('heatmapStart').value;
+            const end = document.getElementById('heatmapEnd').value;
+            if (!start || !end) return;
+            
+            fetch(`/prod/api/heatmap?start=${start}&end=${end}`)
+                .then(response => response.json())
+                .then(data => {
+                    heatmapData = data;
+                    const select = document.getElementById('heatmapRoom');
+                    const selected = select.value;
+                    select.innerHTML = '<option value="-1">전체 룸</option>';
+                    data.rooms.forEach((room, index) => {
+                        select.innerHTML += `<option value="${index}">${room}</option>`;
+                    });
+                    select.value = selected < data.rooms.length ? selected : '-1';
+                    renderHeatmap();
+                })
+                .catch(error => {
+                    console.error('Error:', error);
+                    document.getElementById('heatmap-content').innerHTML = '<p>데이터 로드 중 오류가 발생했습니다.</p>';
+                });
+        }
+        
+        function renderHeatmap() {
+            if (!heatmapData) return;
+            const [weekdays, hours, rooms] = heatmapData.shape;
+            const roomIndex = parseInt(document.getElementById('heatmapRoom').value);
+            const weekdayNames = ['월', '화', '수', '목', '금', '토', '일'];
+            
+            let html = '<table class="heatmap"><thead><tr><th></th>';
+            for (let h = 0; h < hours; h++) html += `<th>${h}</th>`;
+            html += '</tr></thead><tbody>';
+            
+            for (let w = 0; w < weekdays; w++) {
+                html += `<tr><th>${weekdayNames[w]}</th>`;
+                for (let h = 0; h < hours; h++) {
+                    // minutes는 [요일][시간][룸] 순서로 평탄화된 배열
+                    const base = (w * hours + h) * rooms;
+                    let minutes = 0;
+                    let roomCount = 0;
+                    for (let r = 0; r < rooms; r++) {
+                        if (roomIndex >= 0 && r !== roomIndex) continue;
+                        minutes += heatmapData.minutes[base + r];
+                        roomCount++;
+                    }
+                    const capacity = heatmapData.days[w] * 60 * roomCount;
+                    const rate = capacity > 0 ? minutes / capacity : 0;
+                    html += `<td style="background: rgba(0, 123, 255, ${rate.toFixed(2)})">${Math.round(rate * 100)}</td>`;
+                }
+                html += '</tr>';
+            }
+            html += '</tbody></table>';
+            document.getElementById('heatmap-content').innerHTML = html;
+        }
+        
         window.onload = () => {
             switchType('daily');
+            
+            // 히트맵 기본 기간: 최근 8주
+            const end = new Date();
+            const start = new Date();
+            start.setDate(end.getDate() - 55);
+            document.getElementById('heatmapStart').value = start.toISOString().split('T')[0];
+            document.getElementById('heatmapEnd').value = end.toISOString().split('T')[0];
+            loadHeatmap();
         };
     </script>
 </body>
@@ -0,0 +1,78 @@
+import json
+import os
+
+# 지점(Comepass place) 목록
+#   COMEPASS_PLACES 환경변수(JSON): [{"p_code": "...", "id": "...", "pwd": "...", "name": "..."}]
+#   없으면 COMEPASS_ID/COMEPASS_PWD로 단일 기본 지점
+# 기본 지점은 기존 키(날짜, 토큰 id=1, 'heatmap#YYYY-MM' 등)를 그대로 쓰고,
+# 나머지 지점은 모든 키 앞에 'p_code#'를 붙여 지점별로 분리
+DEFAULT_PLACE = 'default'
+KEY_SEPARATOR = '#'
+
+# 지점별 토큰 테이블 (기본 지점은 기존 aipm-backend-prod-stories id=1 유지)
+TOKEN_TABLE = os.environ.get('STUDYROOM_TOKEN_TABLE', 'studyroom-tokens')
+LEGACY_TOKEN_TABLE = 'aipm-backend-prod-stories'
+
+# 지점당 동시 Comepass 요청 수
+PLACE_CONCURRENCY = int(os.environ.get('PLACE_CONCURRENCY', '4'))
+
+_places = None
+
+class Place:
+    """지점 (p_code 기준으로 토큰/데이터/집계 키를 분리)"""
+
+    def __init__(self, key, login_id=None, password=None, name=None, default=False):
+        self.key = key
+        self.login_id = login_id
+        self.password = password
+        self.name = name
+        self.default = default
+
+    @property
+    def prefix(self):
+        return '' if self.default else f"{self.key}{KEY_SEPARATOR}"
+
+    def data_key(self, date_str):
+        """Proxy DB 키 (기본 지점은 날짜 그대로)"""
+        return self.prefix + date_str
+
+    def scoped_id(self, item_id):
+        """집계/설정 항목 id (기본 지점은 그대로)"""
+        return self.prefix + item_id
+
+    def to_dict(self):
+        return {'key': self.key, 'name': self.name, 'default': self.default}
+
+def split_key(data_key):
+    """Proxy DB 키 → (지점 키 또는 None(기본 지점), 날짜)"""
+    if KEY_SEPARATOR in data_key:
+        place_key, date_str = data_key.split(KEY_SEPARATOR, 1)
+        return place_key, date_str
+    return None, data_key
+
+def _load_places():
+    raw = os.environ.get('COMEPASS_PLACES')
+    if raw:
+        places = []
+        for i, entry in enumerate(json.loads(raw)):
+            # 첫 번째 지점은 기존 키를 그대로 쓰는 기본 지점
+            places.append(Place(str(entry['p_code']), entry.get('id'), entry.get('pwd'), entry.get('name'), default=i == 0))
+        return places
+    return [Place(DEFAULT_PLACE, os.environ.get('COMEPASS_ID'), os.environ.get('COMEPASS_PWD'), default=True)]
+
+def get_places():
+    """설정된 지점 목록 (컨테이너당 한 번 로드)"""
+    global _places
+    if _places is None:
+        _places = _load_places()
+    return _places
+
+def get_place(key=None):
+    """지점 키(p_code)로 지점 조회 (없으면 기본 지점)"""
+    places = get_places()
+    if not key or key == DEFAULT_PLACE:
+        return places[0]
+    for place in places:
+        if place.key == key:
+            return place
+    raise ValueError(f"등록되지 않은 지점: {key}")
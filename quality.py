@@ -0,0 +1,210 @@
+from datetime import date, datetime, timedelta
+from statistics import median
+from rollups import ROLLUP_TABLE, parse_minutes
+
+# 수집 데이터 품질 검사 (스키마 검증 + 같은 요일 이력 대비 이상치)
+REQUIRED_FIELDS = ('s_state', 'sg_name', 's_s_time', 's_use_time')
+# 알려진 예약 상태 (그 밖의 상태는 형식 오류로 보지 않고 unknown_states 지표로만 집계)
+KNOWN_STATES = ('USED', 'RESERVED', 'REFUND', 'CANCEL')
+# 필수 필드가 없거나 해석할 수 없는 레코드 비율이 이 값을 넘으면 응답 전체를 의심
+MAX_INVALID_RATIO = 0.2
+
+# 같은 요일 이력 (최근 8주, 최소 4일 있어야 검사)
+HISTORY_WEEKS = 8
+MIN_HISTORY = 4
+# 중앙값/MAD 기반 로버스트 z 점수 기준, 너무 작은 차이는 무시
+Z_THRESHOLD = 3.5
+MIN_ABS_DIFF = 3
+# 이미 저장된 같은 날짜 대비 건수가 이 비율 미만으로 줄면 부분 응답으로 간주
+MIN_KEEP_RATIO = 0.5
+MIN_STORED_FOR_DROP = 4
+
+# 재수집 예약 (시도마다 간격 증가, 최대 횟수 초과 시 이상치는 플래그와 함께 저장, 형식 오류는 실패로 표시하고 재수집 중단)
+REFETCH_ID = 'quality#refetch'
+METRICS_ID = 'quality#metrics'
+REFETCH_DELAYS = (300, 1800, 7200)
+MAX_REFETCH_ATTEMPTS = len(REFETCH_DELAYS)
+# 재수집 목록 동시 수정 시 재시도 횟수 (revision 조건부 저장)
+REFETCH_WRITE_RETRIES = 5
+
+def validate_schema(raw_data):
+    """Comepass 응답 형식 검증 → 문제 목록 (비어 있으면 정상)"""
+    if not isinstance(raw_data, dict):
+        return [f"응답 형식 오류: {type(raw_data).__name__}"]
+    if 'result' in raw_data and raw_data['result'] != 'success':
+        return [f"API 결과 실패: {raw_data.get('result')} {str(raw_data.get('message', ''))[:100]}"]
+    records = raw_data.get('list')
+    if not isinstance(records, list):
+        return ["예약 목록(list) 없음"]
+
+    invalid = 0
+    for record in records:
+        if not isinstance(record, dict) or any(field not in record for field in REQUIRED_FIELDS):
+            invalid += 1
+        elif not isinstance(record['s_state'], str) or not record['s_state'] or parse_minutes(record['s_s_time']) is None:
+            invalid += 1
+        elif not str(record['s_use_time'] or 0).isdigit():
+            invalid += 1
+    if records and invalid / len(records) > MAX_INVALID_RATIO:
+        return [f"형식 오류 레코드 {invalid}/{len(records)}건"]
+    return []
+
+def unknown_states(raw_data):
+    """형식 검증을 통과한 응답의 알 수 없는 예약 상태별 레코드 수 {상태: 건수}"""
+    counts = {}
+    for record in raw_data.get('list') or []:
+        if isinstance(record, dict) and record.get('s_state') and record['s_state'] not in KNOWN_STATES:
+            counts[record['s_state']] = counts.get(record['s_state'], 0) + 1
+    return counts
+
+def day_stats(reservations):
+    """정규화 예약 목록의 품질 지표 (전체 건수, 이용 건수, 이용 분)"""
+    active = [r for r in reservations or [] if r.get('status') in ('USED', 'RESERVED')]
+    return {
+        'records': len(reservations or []),
+        'reservations': len(active),
+        'minutes': sum(int(r.get('hours', 0)) for r in active)
+    }
+
+def history_dates(date_str):
+    """같은 요일 과거 날짜 목록 (최근 HISTORY_WEEKS주)"""
+    day = date.fromisoformat(date_str)
+    return [(day - timedelta(weeks=week)).isoformat() for week in range(1, HISTORY_WEEKS + 1)]
+
+def robust_z(value, values):
+    """중앙값/MAD 기반 로버스트 z 점수 (MAD가 0이면 중앙값의 10%를 척도로 사용)"""
+    center = median(values)
+    mad = median(abs(v - center) for v in values)
+    scale = mad / 0.6745 if mad else max(1.0, center * 0.1)
+    return (value - center) / scale, center
+
+def check_day(stats, previous=None, history=None):
+    """하루 수집 결과 이상 여부 → 문제 목록
+
+    previous: 이미 저장된 같은 날짜 지표, history: 같은 요일 과거 지표 목록 (완료된 날짜만 검사)
+    """
+    issues = []
+    if previous and previous['records'] >= MIN_STORED_FOR_DROP and stats['records'] < previous['records'] * MIN_KEEP_RATIO:
+        issues.append(f"저장된 데이터 대비 급감: {previous['records']} → {stats['records']}건")
+
+    if history and len(history) >= MIN_HISTORY:
+        for metric in ('reservations', 'minutes'):
+            values = [h[metric] for h in history]
+            z, center = robust_z(stats[metric], values)
+            threshold = MIN_ABS_DIFF if metric == 'reservations' else MIN_ABS_DIFF * 60
+            if abs(z) > Z_THRESHOLD and abs(stats[metric] - center) >= threshold:
+                issues.append(f"같은 요일 대비 이상치 ({metric}: {stats[metric]}, 중앙값 {center:g}, z={z:.1f})")
+    return issues
+
+def record_metrics(dynamodb, counts, prefix=''):
+    """품질 지표 누적 (검사/통과/형식 오류/이상치/재수집/강제 저장/재수집 중단 건수, 알 수 없는 상태 레코드 수)"""
+    counts = {name: value for name, value in counts.items() if value}
+    if not counts:
+        return
+    names = {f"#{name}": name for name in counts}
+    values = {f":{name}": value for name, value in counts.items()}
+    values[':now'] = int(datetime.now().timestamp())
+    dynamodb.Table(ROLLUP_TABLE).update_item(
+        Key={'id': prefix + METRICS_ID},
+        UpdateExpression='ADD ' + ', '.join(f"#{name} :{name}" for name in counts) + ' SET updated_at = :now',
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values
+    )
+
+def _load_refetch(dynamodb, prefix):
+    item = dynamodb.Table(ROLLUP_TABLE).get_item(Key={'id': prefix + REFETCH_ID}).get('Item') or {}
+    return item.get('dates', {})
+
+def _update_refetch(dynamodb, prefix, change):
+    """재수집 목록 수정 (읽은 revision 조건부 저장, 다른 실행과 경합하면 다시 읽고 적용) → change의 반환값
+
+    change(pending): 목록을 직접 수정하고 (저장 여부, 결과) 반환
+    """
+    table = dynamodb.Table(ROLLUP_TABLE)
+    key = prefix + REFETCH_ID
+    for attempt in range(REFETCH_WRITE_RETRIES):
+        item = table.get_item(Key={'id': key}, ConsistentRead=True).get('Item')
+        pending = item.get('dates', {}) if item else {}
+        changed, result = change(pending)
+        if not changed:
+            return result
+        if item is None:
+            revision = 0
+            condition = {'ConditionExpression': 'attribute_not_exists(id)'}
+        else:
+            revision = int(item.get('revision', 0))
+            condition = {'ConditionExpression': 'revision = :r', 'ExpressionAttributeValues': {':r': revision}}
+        try:
+            table.put_item(Item={
+                'id': key,
+                'dates': pending,
+                'revision': revision + 1,
+                'updated_at': int(datetime.now().timestamp())
+            }, **condition)
+            return result
+        except dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+            print(f"Refetch queue changed concurrently, retrying ({attempt + 1}/{REFETCH_WRITE_RETRIES})")
+    raise RuntimeError(f"재수집 목록 저장 실패 (동시 수정 {REFETCH_WRITE_RETRIES}회)")
+
+def schedule_refetch(dynamodb, flagged, prefix=''):
+    """의심 날짜 재수집 예약 {date: 문제 목록} → {date: 시도 횟수}"""
+    def change(pending):
+        now = int(datetime.now().timestamp())
+        attempts = {}
+        for date_str, issues in flagged.items():
+            attempt = int(pending.get(date_str, {}).get('attempts', 0)) + 1
+            pending[date_str] = {
+                'attempts': attempt,
+                'due_at': now + REFETCH_DELAYS[min(attempt, MAX_REFETCH_ATTEMPTS) - 1],
+                'issues': issues
+            }
+            attempts[date_str] = attempt
+        return bool(attempts), attempts
+    return _update_refetch(dynamodb, prefix, change)
+
+def refetch_attempts(dynamodb, dates, prefix=''):
+    """날짜별 지금까지의 재수집 시도 횟수"""
+    pending = _load_refetch(dynamodb, prefix)
+    return {date_str: int(pending[date_str].get('attempts', 0)) for date_str in dates if date_str in pending}
+
+def fail_refetch(dynamodb, failures, prefix=''):
+    """재수집 후에도 형식 오류인 날짜를 실패로 표시 {date: 문제 목록} (목록에 남지만 다시 예약하지 않음)"""
+    def change(pending):
+        for date_str, issues in failures.items():
+            attempts = int(pending.get(date_str, {}).get('attempts', MAX_REFETCH_ATTEMPTS))
+            pending[date_str] = {'attempts': attempts, 'failed': True, 'issues': issues}
+        return bool(failures), sorted(failures)
+    return _update_refetch(dynamodb, prefix, change)
+
+def clear_refetch(dynamodb, dates, prefix=''):
+    """정상 저장된 날짜를 재수집 목록에서 제거"""
+    def change(pending):
+        removed = [date_str for date_str in dates if pending.pop(date_str, None) is not None]
+        return bool(removed), removed
+    return _update_refetch(dynamodb, prefix, change)
+
+def due_refetches(dynamodb, limit=5, prefix=''):
+    """재수집 시점이 된 날짜 목록 (오래된 순)"""
+    now = int(datetime.now().timestamp())
+    pending = _load_refetch(dynamodb, prefix)
+    return sorted(
+        date_str for date_str, entry in pending.items()
+        if not entry.get('failed') and int(entry.get('due_at', 0)) <= now
+    )[:limit]
+
+def quality_report(dynamodb, prefix=''):
+    """누적 품질 지표와 재수집 대기 목록"""
+    item = dynamodb.Table(ROLLUP_TABLE).get_item(Key={'id': prefix + METRICS_ID}).get('Item') or {}
+    metrics = {name: int(value) for name, value in item.items() if name not in ('id', 'updated_at')}
+    pending = _load_refetch(dynamodb, prefix)
+    return {
+        'metrics': metrics,
+        'pending_refetch': {
+            date_str: {'attempts': int(entry['attempts']), 'due_at': int(entry['due_at']), 'issues': list(entry['issues'])}
+            for date_str, entry in sorted(pending.items()) if not entry.get('failed')
+        },
+        'failed_refetch': {
+            date_str: {'attempts': int(entry['attempts']), 'issues': list(entry['issues'])}
+            for date_str, entry in sorted(pending.items()) if entry.get('failed')
+        }
+    }
@@ -0,0 +1,111 @@
+from array import array
+from bisect import bisect_left
+from itertools import compress, repeat
+from operator import add, and_, gt, mul, sub, truediv
+from columnar import ACTIVE_STATUSES, REFUND_STATUS
+
+DAY_MINUTES = 24 * 60
+
+# 시간대 구간 (시작 시, 끝 시)
+TIME_BANDS = (('새벽', 0, 6), ('오전', 6, 12), ('오후', 12, 18), ('저녁', 18, 24))
+
+# 집계는 레코드마다 파이썬 분기를 두지 않고 compress/map/sum으로 컬럼 단위 처리 (반복은 C 수준)
+
+def _indexable(column):
+    """인덱스 접근이 가능한 컬럼 (array/memoryview는 그대로, 월 파티션을 이은 컬럼은 한 번 복사)"""
+    return column if isinstance(column, (array, memoryview)) else array('i', column)
+
+def _group_rows(rows, groups, group_count):
+    """행 번호를 그룹 순으로 정렬 → (정렬된 행 번호, 그룹별 [시작, 끝) 경계)"""
+    rows = sorted(rows, key=groups.__getitem__)
+    ordered = array('i', map(groups.__getitem__, rows))
+    return rows, [bisect_left(ordered, group) for group in range(group_count + 1)]
+
+def _grouped_sum(values, rows, bounds):
+    """그룹별 행 구간의 값 합산"""
+    return [sum(map(values.__getitem__, rows[low:high])) for low, high in zip(bounds, bounds[1:])]
+
+def _band_table(first_hour, last_hour):
+    """시각(분)까지 누적된 시간대 분 (이틀치, 자정을 넘긴 부분은 다음 날 같은 시간대로 이어짐)"""
+    low, high = first_hour * 60, last_hour * 60
+    table = [0]
+    for minute in range(2 * DAY_MINUTES):
+        table.append(table[-1] + (low <= minute % DAY_MINUTES < high))
+    return table
+
+# 예약 [시작, 끝) 의 시간대 겹친 분 = table[끝] - table[시작] (끝은 이틀째 자정에서 자름)
+BAND_TABLES = [_band_table(first_hour, last_hour) for _, first_hour, last_hour in TIME_BANDS]
+
+def _summary(count, gross, revenue, refund_count, refund, minutes):
+    hours = minutes / 60
+    return {
+        'reservations': count,
+        'gross_revenue': gross,
+        'discount': gross - revenue,
+        'revenue': revenue,
+        'refund_count': refund_count,
+        'refund': refund,
+        'occupied_hours': round(hours, 1),
+        'revenue_per_occupied_hour': round(revenue / hours) if hours else 0
+    }
+
+def revenue_report(columns, room_mapping=None):
+    """기간 매출 분석 (전체 / 룸별 / 시간대별, 할인·환불 포함)"""
+    room_mapping = room_mapping or {}
+    room_count = len(columns.rooms)
+    status = _indexable(columns.status)
+    rows = range(len(status))
+    active = bytes(map(ACTIVE_STATUSES.__contains__, status))
+    refunded = bytes(map(REFUND_STATUS.__eq__, status))
+
+    # 룸별 합계: 활성/환불 행 번호를 룸 순으로 한 번 정렬하고 룸 구간별로 합산
+    room_codes = _indexable(columns.room)
+    active_rows, active_bounds = _group_rows(compress(rows, active), room_codes, room_count)
+    refund_rows, refund_bounds = _group_rows(compress(rows, refunded), room_codes, room_count)
+    room_totals = {
+        'count': list(map(sub, active_bounds[1:], active_bounds)),
+        'gross': _grouped_sum(_indexable(columns.list_price), active_rows, active_bounds),
+        'revenue': _grouped_sum(_indexable(columns.revenue), active_rows, active_bounds),
+        'refund_count': list(map(sub, refund_bounds[1:], refund_bounds)),
+        'refund': _grouped_sum(_indexable(columns.refund), refund_rows, refund_bounds),
+        'minutes': _grouped_sum(_indexable(columns.minutes), active_rows, active_bounds)
+    }
+
+    by_room = {}
+    for room_index, room in enumerate(columns.rooms):
+        by_room[room_mapping.get(room, room)] = _summary(
+            *(room_totals[key][room_index] for key in ('count', 'gross', 'revenue', 'refund_count', 'refund', 'minutes'))
+        )
+
+    total = _summary(*(sum(room_totals[key]) for key in ('count', 'gross', 'revenue', 'refund_count', 'refund', 'minutes')))
+
+    # 시간대별: 사용 시간 비율로 매출 배분 (사용 시간이 있는 활성 예약만, 겹친 분은 누적표 두 번 조회)
+    selected = bytes(map(and_, active, map(gt, columns.minutes, repeat(0))))
+    starts = list(compress(columns.start, selected))
+    durations = list(compress(columns.minutes, selected))
+    revenues = list(compress(columns.revenue, selected))
+    ends = list(map(min, map(add, starts, durations), repeat(2 * DAY_MINUTES)))
+    band_minutes = []
+    band_revenue = []
+    for table in BAND_TABLES:
+        overlap = list(map(sub, map(table.__getitem__, ends), map(table.__getitem__, starts)))
+        band_minutes.append(sum(overlap))
+        band_revenue.append(sum(map(truediv, map(mul, revenues, overlap), durations)))
+
+    by_band = []
+    for band, (name, first_hour, last_hour) in enumerate(TIME_BANDS):
+        hours = band_minutes[band] / 60
+        by_band.append({
+            'band': name,
+            'hours': f"{first_hour:02d}:00-{last_hour:02d}:00",
+            'revenue': round(band_revenue[band]),
+            'occupied_hours': round(hours, 1),
+            'revenue_per_occupied_hour': round(band_revenue[band] / hours) if hours else 0
+        })
+
+    return {
+        'days': len(columns.dates),
+        'total': total,
+        'by_room': by_room,
+        'by_band': by_band
+    }
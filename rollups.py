@@ -0,0 +1,245 @@
+from datetime import datetime, timedelta
+from dynamo_reader import batch_get_pages
+
+# 집계(롤업) 저장 테이블
+ROLLUP_TABLE = 'studyroom-rollups'
+PROXY_TABLE = 'studyroom-proxy-db'
+
+HOURS = 24
+WEEKDAYS = 7
+DAY_MINUTES = 24 * 60
+
+def parse_minutes(time_str):
+    """'HH:MM' 또는 'HH:MM:SS' 문자열을 자정 기준 분으로 변환"""
+    parts = str(time_str or '').split(':')
+    try:
+        return int(parts[0]) * 60 + (int(parts[1]) if len(parts) > 1 else 0)
+    except ValueError:
+        return None
+
+def day_occupancy(reservations):
+    """정규화된 하루 예약 목록 → 룸별 시간대(24칸) 점유 분 {sg_name: [24]}"""
+    occupancy = {}
+    for reservation in reservations or []:
+        if reservation.get('status') not in ('USED', 'RESERVED'):
+            continue
+        start = parse_minutes(reservation.get('start_time'))
+        if start is None:
+            continue
+        end = min(start + int(reservation.get('hours', 0)), DAY_MINUTES)
+        slots = occupancy.setdefault(reservation.get('room', ''), [0] * HOURS)
+
+        # 시간대별 겹치는 분만큼 누적 (자정 이후 부분은 당일 범위 밖이므로 제외)
+        minute = start
+        while minute < end:
+            hour = minute // 60
+            next_minute = min((hour + 1) * 60, end)
+            slots[hour] += next_minute - minute
+            minute = next_minute
+    return occupancy
+
+def _to_int_map(occupancy, size):
+    """DynamoDB Decimal 리스트 맵을 int 리스트 맵으로 변환"""
+    return {room: [int(v) for v in values] for room, values in (occupancy or {}).items() if len(values) == size}
+
+def _month_key(month, prefix=''):
+    return f"{prefix}heatmap#{month}"
+
+def _empty_month():
+    return {'rooms': {}, 'days': [0] * WEEKDAYS}
+
+def _add_day(month_data, weekday, occupancy, sign=1, count_day=True):
+    """월 누적 카운터에 하루 점유 데이터를 더하거나(sign=1) 뺌(sign=-1) (count_day=False면 일수는 그대로)"""
+    for room, slots in occupancy.items():
+        counters = month_data['rooms'].setdefault(room, [0] * (WEEKDAYS * HOURS))
+        base = weekday * HOURS
+        for hour in range(HOURS):
+            counters[base + hour] += sign * slots[hour]
+    if count_day:
+        month_data['days'][weekday] += sign
+
+def fetch_occupancy(dynamodb, dates, prefix=''):
+    """날짜 목록의 점유 데이터 조회 (없으면 정규화 예약으로 계산) {date: occupancy}
+
+    prefix: 지점 키 접두어 (기본 지점은 '')
+    """
+    result = {}
+    for page in batch_get_pages(dynamodb, PROXY_TABLE, 'date', [prefix + date for date in dates], ['reservations', 'occupancy']):
+        for item in page:
+            date_str = item['date'][len(prefix):]
+            if 'occupancy' in item:
+                result[date_str] = _to_int_map(item['occupancy'], HOURS)
+            else:
+                result[date_str] = day_occupancy(item.get('reservations'))
+    return result
+
+def _month_dates(month):
+    start = datetime.strptime(f"{month}-01", '%Y-%m-%d')
+    dates = []
+    current = start
+    while current.month == start.month:
+        dates.append(current.strftime('%Y-%m-%d'))
+        current += timedelta(days=1)
+    return dates
+
+def rebuild_month(dynamodb, month, prefix=''):
+    """일별 점유 데이터로 월 히트맵 카운터 재생성 후 저장
+
+    읽은 revision에 조건부로 저장하고 revision은 계속 증가시킴 (1로 되돌리면 이전 revision을 읽은 쓰기가
+    재생성된 카운터에 그대로 성공해 날짜가 중복/누락될 수 있음), 경합 시 일별 데이터부터 다시 계산
+    """
+    table = dynamodb.Table(ROLLUP_TABLE)
+    key = _month_key(month, prefix)
+    for attempt in range(3):
+        item = table.get_item(Key={'id': key}, ConsistentRead=True).get('Item')
+        month_data = _empty_month()
+        for date_str, occupancy in fetch_occupancy(dynamodb, _month_dates(month), prefix).items():
+            weekday = datetime.strptime(date_str, '%Y-%m-%d').weekday()
+            _add_day(month_data, weekday, occupancy)
+
+        if item is None:
+            condition = {'ConditionExpression': 'attribute_not_exists(id)'}
+            revision = 0
+        else:
+            revision = int(item.get('revision', 0))
+            condition = {'ConditionExpression': 'revision = :r', 'ExpressionAttributeValues': {':r': revision}}
+        try:
+            table.put_item(Item={
+                'id': key,
+                'rooms': month_data['rooms'],
+                'days': month_data['days'],
+                'revision': revision + 1,
+                'updated_at': int(datetime.now().timestamp())
+            }, **condition)
+            print(f"Heatmap rollup rebuilt for {prefix}{month}")
+            return month_data
+        except dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+            print(f"Heatmap rollup rebuild for {prefix}{month} raced with an update, retrying ({attempt + 1}/3)")
+
+    # 경합이 계속되면 저장은 다른 쓰기에 맡기고 계산 결과만 반환
+    print(f"Heatmap rollup rebuild for {prefix}{month} gave up after concurrent updates")
+    return month_data
+
+def apply_day_update(dynamodb, date_str, old_occupancy, new_occupancy, prefix=''):
+    """하루 데이터 변경분(신규-기존)만 월 히트맵 카운터에 반영"""
+    def change(month_data, weekday):
+        if old_occupancy is not None:
+            _add_day(month_data, weekday, old_occupancy, sign=-1)
+        _add_day(month_data, weekday, new_occupancy)
+    _update_month(dynamodb, date_str, change, prefix)
+
+def apply_occupancy_delta(dynamodb, date_str, delta, prefix=''):
+    """이미 집계된 날짜의 점유 변화량(변경 이벤트에서 계산)만 월 히트맵 카운터에 반영"""
+    if not delta:
+        return
+    _update_month(dynamodb, date_str, lambda month_data, weekday: _add_day(month_data, weekday, delta, count_day=False), prefix)
+
+def _update_month(dynamodb, date_str, change, prefix=''):
+    """월 히트맵 카운터를 읽어 change(month_data, weekday)를 적용 후 revision 조건부 저장 (경합 시 재시도)"""
+    month = date_str[:7]
+    weekday = datetime.strptime(date_str, '%Y-%m-%d').weekday()
+    table = dynamodb.Table(ROLLUP_TABLE)
+
+    for attempt in range(3):
+        item = table.get_item(Key={'id': _month_key(month, prefix)}).get('Item')
+        if item is None:
+            # 카운터가 없으면 저장된 일별 데이터로 생성 (이번 날짜 포함)
+            rebuild_month(dynamodb, month, prefix)
+            return
+
+        month_data = {
+            'rooms': _to_int_map(item.get('rooms'), WEEKDAYS * HOURS),
+            'days': [int(v) for v in item.get('days', [0] * WEEKDAYS)]
+        }
+        change(month_data, weekday)
+
+        revision = int(item.get('revision', 0))
+        try:
+            table.put_item(
+                Item={
+                    'id': _month_key(month, prefix),
+                    'rooms': month_data['rooms'],
+                    'days': month_data['days'],
+                    'revision': revision + 1,
+                    'updated_at': int(datetime.now().timestamp())
+                },
+                ConditionExpression='revision = :r',
+                ExpressionAttributeValues={':r': revision}
+            )
+            return
+        except dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+            print(f"Heatmap rollup for {month} changed concurrently, retrying ({attempt + 1}/3)")
+
+    # 경합이 계속되면 전체 재생성
+    rebuild_month(dynamodb, month, prefix)
+
+def _load_months(dynamodb, months, prefix=''):
+    """월 히트맵 카운터 일괄 조회 (없는 월은 재생성)"""
+    result = {}
+    key_length = len(_month_key('', prefix))
+    for i in range(0, len(months), 100):
+        request_items = {
+            ROLLUP_TABLE: {'Keys': [{'id': _month_key(month, prefix)} for month in months[i:i+100]]}
+        }
+        while request_items:
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            for item in response.get('Responses', {}).get(ROLLUP_TABLE, []):
+                result[item['id'][key_length:]] = {
+                    'rooms': _to_int_map(item.get('rooms'), WEEKDAYS * HOURS),
+                    'days': [int(v) for v in item.get('days', [0] * WEEKDAYS)]
+                }
+            request_items = response.get('UnprocessedKeys') or None
+
+    for month in months:
+        if month not in result:
+            result[month] = rebuild_month(dynamodb, month, prefix)
+    return result
+
+def get_heatmap(dynamodb, start_date, end_date, room_mapping, prefix=''):
+    """요일 × 시간 × 룸 점유 행렬 (완전한 월은 월 카운터, 경계 월은 일별 데이터 사용)"""
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    end = datetime.strptime(end_date, '%Y-%m-%d')
+    if start > end:
+        raise ValueError('start는 end보다 늦을 수 없습니다')
+
+    full_months = []
+    edge_dates = []
+    current = start
+    while current <= end:
+        month_start = current.replace(day=1)
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+        month_end = next_month - timedelta(days=1)
+        if current == month_start and month_end <= end:
+            full_months.append(current.strftime('%Y-%m'))
+            current = next_month
+        else:
+            edge_dates.append(current.strftime('%Y-%m-%d'))
+            current += timedelta(days=1)
+
+    total = _empty_month()
+    for month_data in _load_months(dynamodb, full_months, prefix).values():
+        for room, counters in month_data['rooms'].items():
+            target = total['rooms'].setdefault(room, [0] * (WEEKDAYS * HOURS))
+            for i, value in enumerate(counters):
+                target[i] += value
+        for weekday in range(WEEKDAYS):
+            total['days'][weekday] += month_data['days'][weekday]
+
+    for date_str, occupancy in fetch_occupancy(dynamodb, edge_dates, prefix).items():
+        _add_day(total, datetime.strptime(date_str, '%Y-%m-%d').weekday(), occupancy)
+
+    # 설정된 룸 순서대로 [요일][시간][룸] 평탄화
+    room_keys = list(room_mapping.keys())
+    room_keys += sorted(room for room in total['rooms'] if room not in room_mapping)
+    zeros = [0] * (WEEKDAYS * HOURS)
+    columns = [total['rooms'].get(room, zeros) for room in room_keys]
+    minutes = [column[i] for i in range(WEEKDAYS * HOURS) for column in columns]
+
+    return {
+        'start': start_date,
+        'end': end_date,
+        'shape': [WEEKDAYS, HOURS, len(room_keys)],
+        'rooms': [room_mapping.get(room, room) for room in room_keys],
+        'minutes': minutes,
+        'days': total['days']
+    }
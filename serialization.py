@@ -0,0 +1,48 @@
+import json
+from decimal import Decimal
+from functools import lru_cache
+
+# 응답 본문 JSON 직렬화 (orjson이 있으면 사용, 없으면 표준 json)
+#   DynamoDB Decimal은 int/float로 변환, 공백 없는 형식으로 출력 (한글은 orjson이면 그대로, 표준 json이면 \u 이스케이프)
+#   이미 직렬화된 본문(미리 만든 응답 등)은 다시 파싱하지 않고 필드만 덧붙여 그대로 사용
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DECIMAL_CACHE_SIZE = 4096
+
+# 예약 데이터는 같은 금액/시간 값이 반복되므로 변환 결과를 캐시 (typed: Decimal 이외 타입과 섞이지 않게)
+@lru_cache(maxsize=DECIMAL_CACHE_SIZE, typed=True)
+def _default(value):
+    """DynamoDB Decimal 값 변환"""
+    if isinstance(value, Decimal):
+        return int(value) if value % 1 == 0 else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+# 표준 json은 ensure_ascii=False 경로가 이스케이프 경로보다 느리므로 이스케이프 유지
+_encoder = json.JSONEncoder(default=_default, separators=(',', ':'))
+
+def stdlib_dumps(obj):
+    return _encoder.encode(obj)
+
+def orjson_dumps(obj):
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+def backend():
+    return 'orjson' if orjson is not None else 'json'
+
+# 객체 → JSON 문자열 (Lambda 응답 본문용), 문자열 → 객체
+dumps = orjson_dumps if orjson is not None else stdlib_dumps
+loads = orjson.loads if orjson is not None else json.loads
+
+def extend_object(serialized, fields):
+    """직렬화된 JSON 객체 문자열 뒤에 필드 추가 (원본 본문은 파싱/재직렬화하지 않음, 기존 키와 겹치지 않는 필드만 전달)"""
+    if not fields:
+        return serialized
+    body = serialized.rstrip()
+    if not body.endswith('}'):
+        raise ValueError('JSON 객체 문자열이 아닙니다')
+    head = body[:-1].rstrip()
+    extra = dumps(fields)[1:]
+    return head + extra if head.endswith('{') else head + ',' + extra
@@ -0,0 +1,172 @@
+from array import array
+from itertools import accumulate
+from rollups import parse_minutes
+
+# 전년 동기 비교 간격 (52주, 요일이 맞도록 364일)
+YOY_OFFSET_DAYS = 364
+
+# 추이 지표
+METRICS = ('reservations', 'hours', 'revenue')
+
+# 추이 세부 분류 차원 (룸, 시작 시간대, 요일)
+GROUP_DIMENSIONS = ('room', 'hour', 'weekday')
+WEEKDAY_LABELS = ('월', '화', '수', '목', '금', '토', '일')
+
+class PrefixSeries:
+    """일별 값의 누적합 배열 (임의 구간 합을 O(1)로 계산)"""
+
+    def __init__(self, values):
+        self.prefix = [0] + list(accumulate(values))
+
+    def __len__(self):
+        return len(self.prefix) - 1
+
+    def range_sum(self, start, end):
+        """[start, end) 구간 합 (배열 범위 밖은 0으로 간주)"""
+        start = max(start, 0)
+        end = min(end, len(self))
+        return self.prefix[end] - self.prefix[start] if end > start else 0
+
+    def rolling_sum(self, first, last, window):
+        """first~last-1 위치별 직전 window일 합"""
+        return [self.range_sum(i - window + 1, i + 1) for i in range(first, last)]
+
+def group_ranges(group_index):
+    """연속된 그룹 인덱스 배열 → 그룹별 [시작, 끝) 위치"""
+    ranges = []
+    for position, group in enumerate(group_index):
+        if group == len(ranges):
+            ranges.append([position, position + 1])
+        else:
+            ranges[group][1] = position + 1
+    return ranges
+
+def change_rate(current, previous):
+    """증감률(%) (비교값이 0이면 None)"""
+    return round((current - previous) / previous * 100, 1) if previous else None
+
+def rolling_series(series, first, last, window, shift=0):
+    """지표별 이동 합계 {지표: [값]} (shift만큼 과거 위치 기준)"""
+    return {name: prefix.rolling_sum(first - shift, last - shift, window) for name, prefix in series.items()}
+
+def grouped_series(series, ranges, offset, shift=0):
+    """지표별 그룹 합계 {지표: [값]} (ranges는 offset 기준 위치, shift만큼 과거로 이동)"""
+    return {
+        name: [prefix.range_sum(start + offset - shift, end + offset - shift) for start, end in ranges]
+        for name, prefix in series.items()
+    }
+
+def summarize_day(reservations, excluded_users, breakdowns=(), position=0, weekday=0):
+    """정규화된 하루 예약 목록 집계 (건수, 사용시간, 매출), dynamo_reader로 읽은 숫자(int) 기준
+
+    breakdowns: 같은 순회에서 함께 채울 차원별 일별 지표 (DimensionSeries, position은 날짜 위치)
+    """
+    count = 0
+    hours = 0
+    revenue = 0
+    for reservation in reservations or []:
+        if reservation.get('status', '') in ('USED', 'RESERVED') and reservation.get('user', '') not in excluded_users:
+            minutes = reservation.get('hours', 0)
+            amount = reservation.get('revenue', 0)
+            count += 1
+            hours += minutes / 60
+            revenue += amount
+            for breakdown in breakdowns:
+                breakdown.add(position, reservation, weekday, minutes, amount)
+    return {'reservations': count, 'hours': hours, 'revenue': revenue}
+
+def fold_days(day_items, calendar, excluded_users, breakdowns=()):
+    """(날짜, 정규화 예약 목록) 스트림을 일별 합계에 접어 넣음 → ({지표: PrefixSeries}, 처리한 날짜 수)
+
+    예약 목록은 하루씩 집계 후 바로 버리므로 메모리는 조회 배치 크기 + 날짜당 지표 값만 사용
+    calendar: 위치 기준 달력 차원 (범위 밖 날짜는 무시)
+    """
+    daily = {name: [0] * len(calendar) for name in METRICS}
+    count = 0
+    for date_str, reservations in day_items:
+        position = calendar.index_of(date_str)
+        if position is None:
+            continue
+        summary = summarize_day(reservations, excluded_users, breakdowns, position, calendar.weekday[position])
+        for name in METRICS:
+            daily[name][position] = summary[name]
+        count += 1
+    return {name: PrefixSeries(daily[name]) for name in METRICS}, count
+
+class DimensionSeries:
+    """차원별 일별 지표 (그룹 인덱스 × 날짜 위치의 평탄한 정수 배열, 추이 일별 집계와 같은 순회에서 채움)
+
+    룸은 처음 나온 순서로 인덱스를 붙이고, 시간대(0~23)와 요일(월=0)은 값이 곧 인덱스
+    """
+
+    def __init__(self, dimension, days, room_names=None):
+        if dimension not in GROUP_DIMENSIONS:
+            raise ValueError(f"group_by는 {', '.join(GROUP_DIMENSIONS)} 중에서 선택해야 합니다")
+        self.dimension = dimension
+        self.days = days
+        self.room_names = room_names or {}
+        self.keys = []
+        self._index = {}
+        self.counts = array('q')
+        self.minutes = array('q')
+        self.revenue = array('q')
+        if dimension == 'hour':
+            self.keys = list(range(24))
+        elif dimension == 'weekday':
+            self.keys = list(range(7))
+        self._grow(len(self.keys))
+
+    def _grow(self, groups):
+        size = groups * self.days - len(self.counts)
+        if size > 0:
+            empty = array('q', bytes(8 * size))
+            for column in (self.counts, self.minutes, self.revenue):
+                column.extend(empty)
+
+    def group_of(self, reservation, weekday):
+        """예약의 그룹 인덱스 (시작 시간이 없어 시간대를 알 수 없으면 None)"""
+        if self.dimension == 'weekday':
+            return weekday
+        if self.dimension == 'hour':
+            start = parse_minutes(reservation.get('start_time'))
+            return None if start is None else start // 60 % 24
+        room = reservation.get('room', '')
+        group = self._index.get(room)
+        if group is None:
+            group = self._index[room] = len(self.keys)
+            self.keys.append(room)
+            self._grow(len(self.keys))
+        return group
+
+    def add(self, position, reservation, weekday, minutes, revenue):
+        group = self.group_of(reservation, weekday)
+        if group is None:
+            return
+        cell = group * self.days + position
+        self.counts[cell] += 1
+        self.minutes[cell] += minutes
+        self.revenue[cell] += revenue
+
+    def labels(self):
+        if self.dimension == 'hour':
+            return [f"{hour:02d}:00" for hour in self.keys]
+        if self.dimension == 'weekday':
+            return list(WEEKDAY_LABELS)
+        return [self.room_names.get(room, room) for room in self.keys]
+
+    def grouped(self, ranges, offset):
+        """그룹별 기간 합계 {'dimension', 'keys', 'labels', 지표: [그룹별 [기간별 값]]}"""
+        result = {'dimension': self.dimension, 'keys': self.keys, 'labels': self.labels(),
+                  'reservations': [], 'hours': [], 'revenue': []}
+        for group in range(len(self.keys)):
+            row = slice(group * self.days, (group + 1) * self.days)
+            series = {
+                'reservations': PrefixSeries(self.counts[row]),
+                'hours': PrefixSeries(self.minutes[row]),
+                'revenue': PrefixSeries(self.revenue[row])
+            }
+            totals = grouped_series(series, ranges, offset)
+            result['reservations'].append(totals['reservations'])
+            result['hours'].append([round(m / 60, 1) for m in totals['hours']])
+            result['revenue'].append(totals['revenue'])
+        return result
@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+import uuid
+
+# 동일한 upstream 호출(로그인, 날짜 조회) 합치기
+#   컨테이너 안: 같은 키의 동시 호출은 첫 호출만 실행하고 나머지는 결과를 기다려 공유
+#   컨테이너 간: DynamoDB 조건부 쓰기로 짧은 임대(lease)를 잡은 한 곳만 실행,
+#                나머지는 임대가 풀릴 때까지 기다렸다가 임대 항목에 남긴 결과를 재사용
+LEASE_TABLE = os.environ.get('STUDYROOM_LEASE_TABLE', 'studyroom-leases')
+# 임대 유지 시간 (보유자가 비정상 종료해도 이 시간이 지나면 다른 곳에서 다시 잡을 수 있음)
+LEASE_SECONDS = 15
+# 다른 컨테이너의 결과를 기다리는 최대 시간 (넘으면 직접 호출)
+WAIT_SECONDS = 10
+POLL_INTERVAL = 0.2
+# 임대 항목에 남길 결과 최대 크기 (DynamoDB 항목 400KB 제한 여유)
+MAX_RESULT_BYTES = 300 * 1024
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """같은 키의 동시 호출을 하나로 합침 (첫 호출만 실행, 나머지는 같은 결과/예외를 받음)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+class Lease:
+    """DynamoDB 조건부 쓰기 기반 단기 임대 (만료 시각이 지난 임대는 누구나 다시 잡을 수 있음)"""
+
+    def __init__(self, dynamodb, table_name=LEASE_TABLE):
+        self.table = dynamodb.Table(table_name)
+
+    def acquire(self, key, seconds=LEASE_SECONDS):
+        """임대 획득 → 보유자 id (다른 곳이 보유 중이면 None)"""
+        owner = uuid.uuid4().hex
+        now = int(time.time())
+        try:
+            self.table.put_item(
+                Item={'id': key, 'owner': owner, 'expires_at': now + seconds},
+                ConditionExpression='attribute_not_exists(id) OR expires_at <= :now',
+                ExpressionAttributeValues={':now': now}
+            )
+            return owner
+        except self.table.meta.client.exceptions.ConditionalCheckFailedException:
+            return None
+
+    def release(self, key, owner, result=None, error=None):
+        """임대 해제 (결과 또는 오류를 남겨 기다리던 곳이 재사용), 이미 만료되어 다른 곳이 잡았으면 무시
+
+        error: 실패한 호출의 예외 (메시지와 HTTP 상태를 남김)
+        """
+        expression = 'SET expires_at = :now, released = :released'
+        names = {'#owner': 'owner'}
+        values = {':owner': owner, ':now': int(time.time()), ':released': True}
+        if result is not None and len(result.encode('utf-8')) <= MAX_RESULT_BYTES:
+            expression += ', #result = :result'
+            names['#result'] = 'result'
+            values[':result'] = result
+        if error is not None:
+            expression += ', #error = :error, error_status = :status'
+            names['#error'] = 'error'
+            values[':error'] = str(error)
+            values[':status'] = getattr(error, 'status', None)
+        try:
+            self.table.update_item(
+                Key={'id': key},
+                UpdateExpression=expression,
+                ConditionExpression='#owner = :owner',
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values
+            )
+        except self.table.meta.client.exceptions.ConditionalCheckFailedException:
+            print(f"Lease {key} was taken over before release")
+
+    def wait(self, key, timeout=WAIT_SECONDS):
+        """임대가 풀릴 때까지 대기 → 해제된 임대 항목 (만료/삭제되었거나 시간 초과면 None)"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            time.sleep(POLL_INTERVAL)
+            item = self.table.get_item(Key={'id': key}, ConsistentRead=True).get('Item')
+            if item is None:
+                return None
+            if item.get('released'):
+                return item
+            if int(item['expires_at']) <= int(time.time()):
+                return None
+        print(f"Lease wait for {key} timed out after {timeout}s")
+        return None
+
+_flight = SingleFlight()
+
+def coalesce(key, fn, lease=None, share=None, reuse=None):
+    """key 단위로 fn 호출을 합쳐 결과 반환
+
+    lease: 컨테이너 간 임대 (없으면 컨테이너 안에서만 합침)
+    share: 결과 → 임대 항목에 남길 문자열 (없으면 남기지 않음)
+    reuse: 해제된 임대 항목 → 재사용할 결과 (None이면 직접 호출, 예외를 던지면 그대로 전달)
+    """
+    if lease is None:
+        return _flight.do(key, fn)
+    return _flight.do(key, lambda: _leased_call(key, fn, lease, share, reuse))
+
+def _leased_call(key, fn, lease, share, reuse):
+    try:
+        owner = lease.acquire(key)
+    except Exception as e:
+        # 임대 테이블 장애는 호출 합치기만 포기하고 그대로 진행
+        print(f"Lease acquire error for {key}: {e}")
+        return fn()
+
+    if owner is None:
+        print(f"Waiting for in-flight {key} in another container")
+        item = lease.wait(key)
+        if item is not None and reuse is not None:
+            result = reuse(item)
+            if result is not None:
+                return result
+        return fn()
+
+    result = None
+    error = None
+    try:
+        result = fn()
+        return result
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        try:
+            lease.release(key, owner, share(result) if share and result is not None else None, error)
+        except Exception as e:
+            print(f"Lease release error for {key}: {e}")
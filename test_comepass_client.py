@@ -0,0 +1,97 @@
+import sys
+import threading
+import time
+import unittest
+import comepass_client
+from comepass_client import CircuitBreaker
+
+# 서킷 브레이커 동시 사용 검사 (네트워크 호출 없음)
+#   python -m unittest test_comepass_client
+THREADS = 32
+
+class _SlowTimeout(float):
+    """비교할 때 잠시 멈춰 상태 확인 → 변경 사이에 다른 스레드가 끼어들게 하는 reset_timeout"""
+
+    def __le__(self, other):
+        time.sleep(0.001)
+        return float(self) <= other
+
+class _SlowCount(int):
+    """더할 때 잠시 멈추는 실패 횟수 (읽기 → 쓰기 사이 경합 유도)"""
+
+    def __add__(self, other):
+        time.sleep(0.0001)
+        return _SlowCount(int(self) + other)
+
+def _run_together(target, threads=THREADS):
+    """스레드를 동시에 출발시켜 target 실행 → 결과 목록"""
+    barrier = threading.Barrier(threads)
+    results = []
+    results_lock = threading.Lock()
+
+    def run():
+        barrier.wait()
+        result = target()
+        with results_lock:
+            results.append(result)
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results
+
+class CircuitBreakerConcurrencyTest(unittest.TestCase):
+
+    def setUp(self):
+        # 스레드 전환을 자주 일으켜 경합이 드러나도록 함
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        sys.setswitchinterval(self.switch_interval)
+
+    def test_only_one_half_open_probe(self):
+        for _ in range(20):
+            breaker = CircuitBreaker(failure_threshold=1, reset_timeout=_SlowTimeout(0))
+            breaker.record_failure()
+            breaker.opened_at = time.time() - 1
+
+            allowed = _run_together(breaker.allow)
+            self.assertEqual(allowed.count(True), 1)
+            self.assertEqual(breaker.state, 'half_open')
+
+    def test_concurrent_failures_are_all_counted(self):
+        breaker = CircuitBreaker(failure_threshold=10 ** 9)
+        breaker.failures = _SlowCount(0)
+
+        def fail():
+            for _ in range(20):
+                breaker.record_failure()
+
+        _run_together(fail)
+        self.assertEqual(breaker.failures, THREADS * 20)
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_probe_failure_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        breaker.opened_at = time.time() - 1
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+
+    def test_concurrent_metric_counts(self):
+        before = comepass_client.get_metrics()['retries']
+
+        def count():
+            for _ in range(200):
+                comepass_client._count('retries')
+
+        _run_together(count)
+        self.assertEqual(comepass_client.get_metrics()['retries'] - before, THREADS * 200)
+
+if __name__ == '__main__':
+    unittest.main()
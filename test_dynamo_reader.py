@@ -0,0 +1,93 @@
+import json
+import os
+import unittest
+from unittest import mock
+import dynamo_reader
+from dynamo_reader import batch_get_pages, from_item
+
+try:
+    import boto3
+    from botocore.awsrequest import AWSResponse
+except ImportError:
+    boto3 = None
+
+# batch_get_pages 전송 형식/응답 변환 검사 (botocore before-send 훅으로 HTTP 응답 대체, 네트워크 호출 없음)
+#   python -m unittest test_dynamo_reader
+TABLE = 'studyroom-proxy-db'
+CREDENTIALS = {'AWS_ACCESS_KEY_ID': 'test', 'AWS_SECRET_ACCESS_KEY': 'test'}
+
+class _Raw:
+    def __init__(self, body):
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+@unittest.skipIf(boto3 is None, 'boto3 필요')
+class BatchGetPagesTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, CREDENTIALS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        dynamo_reader._clients.clear()
+        self.addCleanup(dynamo_reader._clients.clear)
+
+        self.resource = boto3.resource('dynamodb', region_name='ap-northeast-2')
+        self.client = dynamo_reader.low_level_client(self.resource)
+        self.requests = []
+        self.responses = []
+        self.client.meta.events.register('before-send.dynamodb.BatchGetItem', self._send)
+
+    def _send(self, request, **kwargs):
+        """실제로 전송될 요청 본문 기록 후 준비한 DynamoDB JSON 응답 반환"""
+        self.requests.append(json.loads(request.body))
+        body = json.dumps(self.responses.pop(0)).encode('utf-8')
+        return AWSResponse(request.url, 200, {'Content-Type': 'application/x-amz-json-1.0'}, _Raw(body))
+
+    def test_low_level_client_is_not_resource_client(self):
+        self.assertIsNot(self.client, self.resource.meta.client)
+        self.assertIs(dynamo_reader.low_level_client(self.resource), self.client)
+        self.assertEqual(self.client.meta.region_name, 'ap-northeast-2')
+
+    def test_keys_are_sent_once_typed_and_response_is_decoded(self):
+        self.responses.append({
+            'Responses': {TABLE: [{
+                'date': {'S': '2026-01-01'},
+                'reservations': {'L': [{'M': {
+                    'room': {'S': '1번 스터디룸'},
+                    'hours': {'N': '90'},
+                    'rate': {'N': '0.5'},
+                    'tags': {'SS': ['b', 'a']},
+                    'memo': {'NULL': True}
+                }}]}
+            }]},
+            'UnprocessedKeys': {}
+        })
+        pages = list(batch_get_pages(self.resource, TABLE, 'date', ['2026-01-01'], ['reservations']))
+
+        request = self.requests[0]['RequestItems'][TABLE]
+        self.assertEqual(request['Keys'], [{'date': {'S': '2026-01-01'}}])
+        self.assertEqual(request['ExpressionAttributeNames'], {'#a0': 'date', '#a1': 'reservations'})
+        self.assertEqual(pages, [[{
+            'date': '2026-01-01',
+            'reservations': [{'room': '1번 스터디룸', 'hours': 90, 'rate': 0.5, 'tags': ['a', 'b'], 'memo': None}]
+        }]])
+
+    def test_unprocessed_keys_are_requested_again(self):
+        unprocessed = {TABLE: {'Keys': [{'date': {'S': '2026-01-02'}}]}}
+        self.responses.append({'Responses': {TABLE: [{'date': {'S': '2026-01-01'}}]}, 'UnprocessedKeys': unprocessed})
+        self.responses.append({'Responses': {TABLE: [{'date': {'S': '2026-01-02'}}]}, 'UnprocessedKeys': {}})
+        pages = list(batch_get_pages(self.resource, TABLE, 'date', ['2026-01-01', '2026-01-02'], []))
+
+        self.assertEqual(sorted(item['date'] for item in pages[0]), ['2026-01-01', '2026-01-02'])
+        self.assertEqual(self.requests[1]['RequestItems'], unprocessed)
+
+class FromItemTest(unittest.TestCase):
+
+    def test_numbers_and_sets(self):
+        self.assertEqual(from_item({'n': {'N': '3'}, 'f': {'N': '1.5'}, 'ns': {'NS': ['2', '1']}}),
+                         {'n': 3, 'f': 1.5, 'ns': [1, 2]})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+from datetime import date
+from rollups import parse_minutes, DAY_MINUTES
+from columnar import ACTIVE_STATUSES as COLUMN_ACTIVE_STATUSES
+
+ACTIVE_STATUSES = ('USED', 'RESERVED')
+
+def reservation_intervals(days):
+    """(날짜, 정규화 예약 목록)을 날짜순으로 받아 룸별 절대 분 구간 목록으로 변환
+
+    자정을 넘는 예약이 전날/당일 목록에 모두 있으면 전날 시작 예약으로 한 번만 집계
+    """
+    seen = set()
+    by_room = {}
+    for date_str, reservations in days:
+        day_start = date.fromisoformat(date_str).toordinal() * DAY_MINUTES
+        for reservation in reservations or []:
+            if reservation.get('status') not in ACTIVE_STATUSES:
+                continue
+            start = parse_minutes(reservation.get('start_time'))
+            minutes = int(reservation.get('hours', 0))
+            if start is None or minutes <= 0:
+                continue
+
+            end = parse_minutes(reservation.get('end_time'))
+            crosses_midnight = start + minutes > DAY_MINUTES or (end is not None and end < start)
+            _add_interval(by_room, seen, reservation.get('room', ''), reservation.get('user', ''),
+                          day_start, start, minutes, crosses_midnight)
+    return merge_intervals(by_room)
+
+def column_intervals(columns):
+    """컬럼 형식 예약(ReservationColumns 또는 같은 속성의 객체)을 룸별 절대 분 구간 목록으로 변환"""
+    day_starts = [date.fromisoformat(date_str).toordinal() * DAY_MINUTES for date_str in columns.dates]
+    seen = set()
+    by_room = {}
+    for day, room, user, status, start, minutes in zip(columns.day, columns.room, columns.user,
+                                                        columns.status, columns.start, columns.minutes):
+        if status not in COLUMN_ACTIVE_STATUSES or minutes <= 0:
+            continue
+        _add_interval(by_room, seen, columns.rooms[room], columns.users[user],
+                      day_starts[day], start, minutes, start + minutes > DAY_MINUTES)
+    return merge_intervals(by_room)
+
+def _add_interval(by_room, seen, room, user, day_start, start, minutes, crosses_midnight):
+    """예약 구간 추가 (전날 목록에서 이미 추가된 자정 넘는 예약과 같은 예약 중복은 제외)"""
+    if crosses_midnight and (room, user, day_start - DAY_MINUTES + start) in seen:
+        return
+    key = (room, user, day_start + start)
+    if key in seen:
+        return
+    seen.add(key)
+    by_room.setdefault(room, []).append((day_start + start, day_start + start + minutes))
+
+def merge_intervals(by_room):
+    """같은 룸의 겹치는 구간 병합 (중복 예약이 100%를 넘지 않도록)"""
+    merged = {}
+    for room, intervals in by_room.items():
+        intervals.sort()
+        result = [list(intervals[0])]
+        for interval_start, interval_end in intervals[1:]:
+            if interval_start <= result[-1][1]:
+                result[-1][1] = max(result[-1][1], interval_end)
+            else:
+                result.append([interval_start, interval_end])
+        merged[room] = result
+    return merged
+
+def _overlap_by_window(intervals, windows):
+    """정렬된 구간 목록과 정렬된 운영 구간 목록의 운영 구간별 겹침 분 (두 포인터 스윕)"""
+    result = [0] * len(windows)
+    i = 0
+    for w, (window_start, window_end) in enumerate(windows):
+        while i < len(intervals) and intervals[i][1] <= window_start:
+            i += 1
+        j = i
+        while j < len(intervals) and intervals[j][0] < window_end:
+            result[w] += min(intervals[j][1], window_end) - max(intervals[j][0], window_start)
+            j += 1
+    return result
+
+def utilization_report(days, dates, config, intervals=None):
+    """기간 이용률 (운영 시간 기준, 분 단위, 날짜 경계에서 자름)
+
+    days에는 자정을 넘는 예약 판별을 위해 dates 전날 데이터도 포함할 수 있음
+    (이미 구간으로 변환했으면 intervals로 전달하고 days는 None)
+    """
+    if intervals is None:
+        intervals = reservation_intervals(days)
+    rooms = list(config.room_mapping.keys()) + sorted(room for room in intervals if room not in config.room_mapping)
+
+    daily_occupied = [0] * len(dates)
+    daily_open = [0] * len(dates)
+    room_results = {}
+
+    for room in rooms:
+        windows = []
+        window_days = []
+        for index, date_str in enumerate(dates):
+            day = date.fromisoformat(date_str)
+            window = config.operating_window(room, day.weekday())
+            if window is None:
+                continue
+            day_start = day.toordinal() * DAY_MINUTES
+            windows.append((day_start + window[0], day_start + window[1]))
+            window_days.append(index)
+
+        occupied = _overlap_by_window(intervals.get(room, []), windows)
+        for index, (window_start, window_end), minutes in zip(window_days, windows, occupied):
+            daily_occupied[index] += minutes
+            daily_open[index] += window_end - window_start
+
+        open_minutes = sum(end - start for start, end in windows)
+        room_results[config.room_mapping.get(room, room)] = _summary(sum(occupied), open_minutes)
+
+    return {
+        'total': _summary(sum(daily_occupied), sum(daily_open)),
+        'rooms': room_results,
+        'daily': {
+            'dates': list(dates),
+            'utilization': [round(o / c * 100, 2) if c else 0 for o, c in zip(daily_occupied, daily_open)]
+        }
+    }
+
+def _summary(occupied_minutes, open_minutes):
+    return {
+        'occupied_hours': round(occupied_minutes / 60, 2),
+        'open_hours': round(open_minutes / 60, 2),
+        'utilization': round(occupied_minutes / open_minutes * 100, 2) if open_minutes else 0
+    }